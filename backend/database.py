@@ -1,29 +1,110 @@
 """
 Gestion de la base de données SQLite pour tracker les jobs
+
+Un backend PostgreSQL partageant ces requêtes est disponible
+(database_postgres.py, sélectionné par DATABASE_URL).
 """
 import sqlite3
+import asyncio
+import json
+import logging
+import os
+import re
 import aiosqlite
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any, AsyncIterator
+from datetime import datetime, timedelta
 from pathlib import Path
 import uuid
 
 from models import JobStatus, InputType, ProkkaMode
 
+logger = logging.getLogger(__name__)
+
+
+# Version minimale de SQLite (INSERT ... ON CONFLICT, upsert)
+MIN_SQLITE_VERSION = (3, 24, 0)
+
+# Colonnes renvoyées par get_jobs (couvertes par idx_jobs_list / idx_jobs_status_list)
+JOB_LIST_COLUMNS = "id, sample_id, status, input_type, created_at, completed_at"
+
 
 class Database:
-    """Gestionnaire de base de données SQLite"""
+    """
+    Gestionnaire de base de données SQLite
 
-    def __init__(self, db_path: str = "jobs.db"):
+    Les connexions sont ouvertes une fois puis réutilisées via un pool
+    (cache de requêtes préparées par connexion), en mode WAL pour que les
+    écritures de statut ne bloquent pas les lectures concurrentes.
+    """
+
+    def __init__(self, db_path: str = "jobs.db", pool_size: int = 4):
         self.db_path = db_path
+        self.pool_size = pool_size
         self._initialized = False
+        self._pool: Optional[asyncio.Queue] = None
+        self._connections: List[aiosqlite.Connection] = []
+        self._pool_lock = asyncio.Lock()
+
+    async def _open_connection(self) -> aiosqlite.Connection:
+        """Ouvre une connexion configurée (WAL, cache, requêtes préparées)"""
+        conn = await aiosqlite.connect(
+            self.db_path,
+            cached_statements=256  # Cache des requêtes préparées (par connexion)
+        )
+        conn.row_factory = aiosqlite.Row
+        await conn.execute("PRAGMA journal_mode = WAL")
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        await conn.execute("PRAGMA cache_size = -16000")  # ~16 MB
+        await conn.execute("PRAGMA temp_store = MEMORY")
+        await conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    async def _open_pool(self):
+        """Crée le pool de connexions (au premier accès)"""
+        async with self._pool_lock:
+            if self._pool is not None:
+                return
+            pool: asyncio.Queue = asyncio.Queue()
+            for _ in range(self.pool_size):
+                conn = await self._open_connection()
+                self._connections.append(conn)
+                pool.put_nowait(conn)
+            self._pool = pool
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Emprunte une connexion du pool (rollback si une erreur survient)"""
+        if self._pool is None:
+            await self._open_pool()
+        conn = await self._pool.get()
+        try:
+            yield conn
+        except BaseException:
+            await conn.rollback()
+            raise
+        finally:
+            self._pool.put_nowait(conn)
+
+    async def close(self):
+        """Ferme toutes les connexions du pool"""
+        async with self._pool_lock:
+            for conn in self._connections:
+                await conn.close()
+            self._connections = []
+            self._pool = None
 
     async def initialize(self):
         """Initialise la base de données (crée tables si nécessaire)"""
         if self._initialized:
             return
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise RuntimeError(
+                f"SQLite {sqlite3.sqlite_version} trop ancien "
+                f"(minimum {'.'.join(map(str, MIN_SQLITE_VERSION))})"
+            )
 
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS jobs (
                     id TEXT PRIMARY KEY,
@@ -56,6 +137,189 @@ class Database:
                 CREATE INDEX IF NOT EXISTS idx_created_at ON jobs(created_at DESC)
             """)
 
+            # Index couvrants pour la vue liste (pagination keyset sur created_at, id)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_list
+                ON jobs(created_at DESC, id DESC, sample_id, status, input_type, completed_at)
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_status_list
+                ON jobs(status, created_at DESC, id DESC, sample_id, input_type, completed_at)
+            """)
+
+            # Compteurs par statut maintenus par triggers (évite COUNT(*))
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS job_counts (
+                    status TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            await db.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_job_counts_insert AFTER INSERT ON jobs
+                BEGIN
+                    INSERT INTO job_counts (status, count) VALUES (NEW.status, 1)
+                    ON CONFLICT(status) DO UPDATE SET count = count + 1;
+                END
+            """)
+            await db.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_job_counts_delete AFTER DELETE ON jobs
+                BEGIN
+                    UPDATE job_counts SET count = count - 1 WHERE status = OLD.status;
+                END
+            """)
+            await db.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_job_counts_update AFTER UPDATE OF status ON jobs
+                WHEN OLD.status IS NOT NEW.status
+                BEGIN
+                    UPDATE job_counts SET count = count - 1 WHERE status = OLD.status;
+                    INSERT INTO job_counts (status, count) VALUES (NEW.status, 1)
+                    ON CONFLICT(status) DO UPDATE SET count = count + 1;
+                END
+            """)
+            # Resynchroniser les compteurs au démarrage (bases existantes)
+            await db.execute("DELETE FROM job_counts")
+            await db.execute("""
+                INSERT INTO job_counts (status, count)
+                SELECT status, COUNT(*) FROM jobs GROUP BY status
+            """)
+
+            # Manifeste des fichiers de chaque run (file_manifest.py)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS job_files (
+                    job_id TEXT NOT NULL,
+                    relative_path TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size BIGINT NOT NULL,
+                    mtime DOUBLE PRECISION NOT NULL,
+                    file_type TEXT NOT NULL,
+                    icon TEXT,
+                    category TEXT NOT NULL,
+                    extension TEXT,
+                    PRIMARY KEY (job_id, relative_path)
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_job_files_list
+                ON job_files(job_id, category, name, relative_path)
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS job_file_manifests (
+                    job_id TEXT PRIMARY KEY,
+                    complete INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP NOT NULL
+                )
+            """)
+
+            # Dernier numéro de run attribué par échantillon (allocate_run_number)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS run_counters (
+                    sample_id TEXT PRIMARY KEY,
+                    last_run INTEGER NOT NULL
+                )
+            """)
+
+            # Index inversé gène → échantillons (alimenté par les sorties du parser)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS gene_hits (
+                    job_id TEXT NOT NULL,
+                    ordinal INTEGER NOT NULL,
+                    sample_id TEXT NOT NULL,
+                    gene TEXT NOT NULL,
+                    gene_key TEXT NOT NULL,
+                    sequence TEXT,
+                    start INTEGER,
+                    "end" INTEGER,
+                    strand TEXT,
+                    coverage REAL,
+                    identity REAL,
+                    database TEXT,
+                    accession TEXT,
+                    product TEXT,
+                    resistance TEXT,
+                    subclass TEXT,
+                    element_type TEXT,
+                    element_subtype TEXT,
+                    source TEXT,
+                    sources TEXT,
+                    priority TEXT,
+                    completed_at TIMESTAMP,
+                    PRIMARY KEY (job_id, ordinal)
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_gene_hits_gene
+                ON gene_hits(gene_key, identity, coverage)
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS gene_hit_classes (
+                    class_key TEXT NOT NULL,
+                    job_id TEXT NOT NULL,
+                    ordinal INTEGER NOT NULL,
+                    PRIMARY KEY (class_key, job_id, ordinal)
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_gene_hit_classes_job
+                ON gene_hit_classes(job_id)
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS gene_index_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    num_genes INTEGER NOT NULL,
+                    indexed_at TIMESTAMP NOT NULL
+                )
+            """)
+            # Échecs d'indexation (sorties illisibles) : pas de nouvel essai à
+            # chaque requête, seulement après GENE_INDEX_RETRY_SECONDS, si les
+            # sorties ont changé, ou au démarrage (_backfill_gene_index)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS gene_index_failures (
+                    job_id TEXT PRIMARY KEY,
+                    error TEXT NOT NULL,
+                    failed_at TIMESTAMP NOT NULL
+                )
+            """)
+
+            # Historique des événements (append-only, alimenté par JobEventWriter)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS job_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    created_at TIMESTAMP NOT NULL,
+                    event_type TEXT NOT NULL,
+                    module TEXT,
+                    status TEXT,
+                    duration_s REAL,
+                    data TEXT
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_job_events_job
+                ON job_events(job_id, id)
+            """)
+
+            # Statistiques de validation des fichiers d'entrée (input_validation),
+            # par inode : les noms d'un même contenu uploadé partagent l'entrée
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS input_stats (
+                    file_key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    sha256 TEXT,
+                    stats TEXT NOT NULL,
+                    validated_at TIMESTAMP NOT NULL
+                )
+            """)
+
+            # Dernier état de la tâche de téléchargement de chaque base de
+            # référence (db_tasks) : conservé après un redémarrage de l'API
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS db_download_tasks (
+                    db_key TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at TIMESTAMP NOT NULL
+                )
+            """)
+
             await db.commit()
 
         self._initialized = True
@@ -77,7 +341,7 @@ class Database:
         job_id = str(uuid.uuid4())
         now = datetime.now()
 
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             await db.execute("""
                 INSERT INTO jobs (
                     id, sample_id, status, threads, prokka_mode,
@@ -100,8 +364,7 @@ class Database:
 
     async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Récupère un job par son ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._connection() as db:
             async with db.execute(
                 "SELECT * FROM jobs WHERE id = ?",
                 (job_id,)
@@ -142,7 +405,7 @@ class Database:
 
         query = f"UPDATE jobs SET {', '.join(fields)} WHERE id = ?"
 
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             cursor = await db.execute(query, values)
             await db.commit()
             return cursor.rowcount > 0
@@ -151,48 +414,70 @@ class Database:
         self,
         status: Optional[JobStatus] = None,
         limit: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        before: Optional[tuple] = None
     ) -> List[Dict[str, Any]]:
         """
-        Liste les jobs avec filtres optionnels
+        Liste les jobs avec filtres optionnels (colonnes de la vue liste)
+
+        La pagination par curseur (keyset) sur (created_at, id) est servie
+        directement par les index couvrants, quelle que soit la profondeur.
 
         Args:
             status: Filtrer par statut (optionnel)
             limit: Nombre maximum de résultats
-            offset: Offset pour pagination
+            offset: Offset pour pagination (ignoré si before est fourni)
+            before: Curseur (created_at, id) du dernier job de la page précédente
 
         Returns:
             Liste de dictionnaires représentant les jobs
         """
-        query = "SELECT * FROM jobs"
-        params = []
+        query = f"SELECT {JOB_LIST_COLUMNS} FROM jobs"
+        conditions = []
+        params: List[Any] = []
 
         if status:
-            query += " WHERE status = ?"
+            conditions.append("status = ?")
             params.append(status.value)
+        if before:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend([naive_local(before[0]), before[1]])
 
-        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        if offset and not before:
+            query += " OFFSET ?"
+            params.append(offset)
 
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._connection() as db:
             async with db.execute(query, params) as cursor:
                 rows = await cursor.fetchall()
                 return [dict(row) for row in rows]
 
     async def count_jobs(self, status: Optional[JobStatus] = None) -> int:
-        """Compte le nombre de jobs (avec filtre optionnel)"""
-        query = "SELECT COUNT(*) as count FROM jobs"
+        """Compte le nombre de jobs (table de compteurs par statut)"""
+        query = "SELECT COALESCE(SUM(count), 0) FROM job_counts"
         params = []
 
         if status:
             query += " WHERE status = ?"
             params.append(status.value)
 
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             async with db.execute(query, params) as cursor:
                 row = await cursor.fetchone()
-                return row[0] if row else 0
+                return int(row[0]) if row else 0
+
+    async def get_output_dirs(self) -> List[str]:
+        """Liste les répertoires de sortie de tous les jobs"""
+        async with self._connection() as db:
+            async with db.execute(
+                "SELECT output_dir FROM jobs WHERE output_dir IS NOT NULL"
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [row[0] for row in rows]
 
     async def get_max_run_number(self, sample_id: str) -> int:
         """
@@ -201,7 +486,7 @@ class Database:
         Returns:
             int: Numéro de run maximum (0 si aucun run existant)
         """
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             async with db.execute(
                 "SELECT MAX(run_number) as max_run FROM jobs WHERE sample_id = ?",
                 (sample_id,)
@@ -209,6 +494,38 @@ class Database:
                 row = await cursor.fetchone()
                 return row[0] if row and row[0] is not None else 0
 
+    async def allocate_run_number(self, sample_id: str) -> int:
+        """
+        Attribue atomiquement le prochain numéro de run d'un échantillon
+
+        Le compteur est initialisé au premier appel depuis MAX(run_number)
+        des jobs existants, puis incrémenté et relu dans la même
+        transaction : l'INSERT prend le verrou d'écriture (SQLite) ou le
+        verrou de ligne (PostgreSQL) dès le début, deux lancements
+        concurrents du même échantillon obtiennent des numéros distincts.
+        UPDATE puis SELECT plutôt que UPDATE ... RETURNING (SQLite 3.35+).
+
+        Returns:
+            int: Numéro de run réservé (1, 2, 3...)
+        """
+        async with self._connection() as db:
+            await db.execute("""
+                INSERT INTO run_counters (sample_id, last_run)
+                SELECT ?, COALESCE(MAX(run_number), 0) FROM jobs WHERE sample_id = ?
+                ON CONFLICT(sample_id) DO NOTHING
+            """, (sample_id, sample_id))
+            await db.execute(
+                "UPDATE run_counters SET last_run = last_run + 1 WHERE sample_id = ?",
+                (sample_id,)
+            )
+            async with db.execute(
+                "SELECT last_run FROM run_counters WHERE sample_id = ?",
+                (sample_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            await db.commit()
+            return row[0]
+
     async def get_running_jobs_count(self) -> int:
         """Compte le nombre de jobs en cours d'exécution"""
         return await self.count_jobs(status=JobStatus.RUNNING)
@@ -219,14 +536,15 @@ class Database:
 
         Utile pour nettoyer les jobs "zombies" (serveur crashé, etc.)
         """
-        async with aiosqlite.connect(self.db_path) as db:
+        cutoff = datetime.now() - timedelta(hours=max_age_hours)
+        async with self._connection() as db:
             await db.execute("""
                 UPDATE jobs
                 SET status = ?, error_message = 'Job timeout - probablement interrompu'
                 WHERE status = ?
                 AND started_at IS NOT NULL
-                AND started_at < datetime('now', '-' || ? || ' hours')
-            """, (JobStatus.FAILED.value, JobStatus.RUNNING.value, max_age_hours))
+                AND started_at < ?
+            """, (JobStatus.FAILED.value, JobStatus.RUNNING.value, cutoff))
             await db.commit()
 
     async def delete_job(self, job_id: str):
@@ -236,8 +554,15 @@ class Database:
         Args:
             job_id: ID du job à supprimer
         """
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             await db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            await db.execute("DELETE FROM gene_hits WHERE job_id = ?", (job_id,))
+            await db.execute("DELETE FROM gene_hit_classes WHERE job_id = ?", (job_id,))
+            await db.execute("DELETE FROM gene_index_jobs WHERE job_id = ?", (job_id,))
+            await db.execute("DELETE FROM gene_index_failures WHERE job_id = ?", (job_id,))
+            await db.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            await db.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,))
+            await db.execute("DELETE FROM job_file_manifests WHERE job_id = ?", (job_id,))
             await db.commit()
 
     async def delete_all_jobs(self) -> int:
@@ -247,7 +572,7 @@ class Database:
         Returns:
             int: Nombre de jobs supprimés
         """
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             # Compter d'abord
             async with db.execute("SELECT COUNT(*) FROM jobs") as cursor:
                 row = await cursor.fetchone()
@@ -255,10 +580,718 @@ class Database:
 
             # Supprimer tout
             await db.execute("DELETE FROM jobs")
+            await db.execute("DELETE FROM gene_hits")
+            await db.execute("DELETE FROM gene_hit_classes")
+            await db.execute("DELETE FROM gene_index_jobs")
+            await db.execute("DELETE FROM gene_index_failures")
+            await db.execute("DELETE FROM job_events")
+            await db.execute("DELETE FROM job_files")
+            await db.execute("DELETE FROM job_file_manifests")
             await db.commit()
 
             return count
 
+    # ========================================================================
+    # HISTORIQUE DES ÉVÉNEMENTS
+    # ========================================================================
+
+    async def insert_job_events(self, events: List[tuple]):
+        """
+        Insère un lot d'événements en une seule transaction
+
+        Args:
+            events: tuples (job_id, created_at, event_type, module, status, duration_s, data)
+        """
+        async with self._connection() as db:
+            await db.executemany("""
+                INSERT INTO job_events (
+                    job_id, created_at, event_type, module, status, duration_s, data
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, events)
+            await db.commit()
+
+    async def get_job_events(
+        self,
+        job_id: str,
+        event_type: Optional[str] = None,
+        after_id: int = 0,
+        limit: int = 500
+    ) -> List[Dict[str, Any]]:
+        """
+        Historique des événements d'un job, dans l'ordre d'écriture
+
+        Args:
+            job_id: ID du job
+            event_type: Filtrer par type (status, module_start, module_end...)
+            after_id: Ne renvoyer que les événements d'id supérieur (pagination)
+            limit: Nombre maximum d'événements
+        """
+        query = """
+            SELECT id, created_at, event_type, module, status, duration_s, data
+            FROM job_events WHERE job_id = ? AND id > ?
+        """
+        params: List[Any] = [job_id, after_id]
+        if event_type:
+            query += " AND event_type = ?"
+            params.append(event_type)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+
+        async with self._connection() as db:
+            async with db.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+
+        events = []
+        for row in rows:
+            event = dict(row)
+            event['data'] = json.loads(event['data']) if event['data'] else {}
+            events.append(event)
+        return events
+
+    # ========================================================================
+    # VALIDATION DES FICHIERS D'ENTRÉE
+    # ========================================================================
+
+    async def get_input_stats(self, file_key: str) -> Optional[Dict[str, Any]]:
+        """Statistiques de validation enregistrées pour un fichier (None si absentes)"""
+        async with self._connection() as db:
+            async with db.execute(
+                "SELECT stats FROM input_stats WHERE file_key = ?", (file_key,)
+            ) as cursor:
+                row = await cursor.fetchone()
+        return json.loads(row['stats']) if row else None
+
+    async def save_input_stats(
+        self,
+        file_key: str,
+        path: str,
+        stats: Dict[str, Any],
+        sha256: Optional[str] = None
+    ):
+        """
+        Enregistre les statistiques de validation d'un fichier
+
+        Args:
+            file_key: Identité du contenu (périphérique, inode, taille, mtime)
+            path: Chemin du fichier validé
+            stats: Résultat de input_validation
+            sha256: SHA-256 du contenu s'il est connu (uploads)
+        """
+        async with self._connection() as db:
+            await db.execute("""
+                INSERT INTO input_stats (file_key, path, sha256, stats, validated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(file_key) DO UPDATE SET
+                    path = excluded.path, sha256 = COALESCE(excluded.sha256, input_stats.sha256),
+                    stats = excluded.stats, validated_at = excluded.validated_at
+            """, (file_key, path, sha256, json.dumps(stats), datetime.now()))
+            await db.commit()
+
+    # ========================================================================
+    # TÂCHES DE TÉLÉCHARGEMENT DES BASES
+    # ========================================================================
+
+    async def list_db_download_tasks(self) -> Dict[str, Dict[str, Any]]:
+        """Dernier état enregistré de chaque tâche de téléchargement ({clé: état})"""
+        async with self._connection() as db:
+            async with db.execute("SELECT db_key, state FROM db_download_tasks") as cursor:
+                rows = await cursor.fetchall()
+        return {row['db_key']: json.loads(row['state']) for row in rows}
+
+    async def save_db_download_task(self, db_key: str, state: Dict[str, Any]):
+        """Enregistre l'état d'une tâche de téléchargement (remplace le précédent)"""
+        async with self._connection() as db:
+            await db.execute("""
+                INSERT INTO db_download_tasks (db_key, state, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(db_key) DO UPDATE SET
+                    state = excluded.state, updated_at = excluded.updated_at
+            """, (db_key, json.dumps(state, default=str), datetime.now()))
+            await db.commit()
+
+    # ========================================================================
+    # MANIFESTE DES FICHIERS
+    # ========================================================================
+
+    async def save_job_files(
+        self,
+        job_id: str,
+        changed: List[Dict[str, Any]],
+        removed: List[str],
+        replace: bool = False,
+        complete: bool = False
+    ):
+        """
+        Enregistre les entrées du manifeste d'un run
+
+        Args:
+            job_id: ID du job
+            changed: Entrées ajoutées ou modifiées (voir file_manifest.make_entry)
+            removed: Chemins relatifs supprimés
+            replace: Remplacer tout le manifeste (premier scan)
+            complete: Manifeste définitif (job terminé)
+        """
+        rows = [
+            (job_id, e['relative_path'], e['name'], e['size'], e['mtime'],
+             e['type'], e['icon'], e['category'], e['extension'])
+            for e in changed
+        ]
+        async with self._connection() as db:
+            if replace:
+                await db.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,))
+            elif removed:
+                await db.executemany(
+                    "DELETE FROM job_files WHERE job_id = ? AND relative_path = ?",
+                    [(job_id, path) for path in removed]
+                )
+            await db.executemany("""
+                INSERT INTO job_files (
+                    job_id, relative_path, name, size, mtime,
+                    file_type, icon, category, extension
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(job_id, relative_path) DO UPDATE SET
+                    size = excluded.size, mtime = excluded.mtime
+            """, rows)
+            await db.execute("""
+                INSERT INTO job_file_manifests (job_id, complete, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(job_id) DO UPDATE SET
+                    complete = excluded.complete, updated_at = excluded.updated_at
+            """, (job_id, int(complete), datetime.now()))
+            await db.commit()
+
+    async def get_file_manifest_summary(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        État du manifeste d'un run (None s'il n'a jamais été construit)
+
+        Returns:
+            Dict avec complete, updated_at, total_files, total_size,
+            categories ({catégorie: nombre de fichiers}) et category_sizes
+        """
+        async with self._connection() as db:
+            async with db.execute(
+                "SELECT complete, updated_at FROM job_file_manifests WHERE job_id = ?",
+                (job_id,)
+            ) as cursor:
+                manifest = await cursor.fetchone()
+            if not manifest:
+                return None
+            async with db.execute("""
+                SELECT category, COUNT(*) AS num_files, SUM(size) AS total_size
+                FROM job_files WHERE job_id = ?
+                GROUP BY category ORDER BY category
+            """, (job_id,)) as cursor:
+                rows = await cursor.fetchall()
+
+        return {
+            "complete": bool(manifest['complete']),
+            "updated_at": manifest['updated_at'],
+            "total_files": sum(int(row['num_files']) for row in rows),
+            "total_size": sum(int(row['total_size'] or 0) for row in rows),
+            "categories": {row['category']: int(row['num_files']) for row in rows},
+            "category_sizes": {row['category']: int(row['total_size'] or 0) for row in rows},
+        }
+
+    async def query_job_files(
+        self,
+        job_id: str,
+        category: Optional[str] = None,
+        after: Optional[tuple] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Fichiers du manifeste triés par (catégorie, nom, chemin)
+
+        Args:
+            job_id: ID du job
+            category: Restreindre à une catégorie (ex: 04_arg_detection)
+            after: Curseur (catégorie, nom, chemin) du dernier fichier de la page précédente
+            limit: Taille de page (None = tous)
+        """
+        query = """
+            SELECT relative_path, name, size, mtime, file_type, icon, category, extension
+            FROM job_files WHERE job_id = ?
+        """
+        params: List[Any] = [job_id]
+        if category:
+            query += " AND category = ?"
+            params.append(category)
+        if after:
+            query += " AND (category, name, relative_path) > (?, ?, ?)"
+            params.extend(after)
+        query += " ORDER BY category, name, relative_path"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        async with self._connection() as db:
+            async with db.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
+
+    async def get_jobs_without_file_manifest(self) -> List[Dict[str, Any]]:
+        """Liste les jobs terminés (COMPLETED/FAILED) sans manifeste définitif"""
+        async with self._connection() as db:
+            async with db.execute("""
+                SELECT j.id, j.output_dir FROM jobs j
+                LEFT JOIN job_file_manifests m ON m.job_id = j.id
+                WHERE j.status IN (?, ?) AND j.output_dir IS NOT NULL
+                AND (m.job_id IS NULL OR m.complete = 0)
+            """, (JobStatus.COMPLETED.value, JobStatus.FAILED.value)) as cursor:
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
+
+    # ========================================================================
+    # INDEX INVERSÉ DES GÈNES
+    # ========================================================================
+
+    async def index_job_genes(
+        self,
+        job_id: str,
+        sample_id: str,
+        completed_at: Optional[datetime],
+        genes: List[Dict[str, Any]]
+    ) -> int:
+        """
+        (Ré)indexe les gènes dédupliqués d'un job dans l'index inversé
+
+        Args:
+            job_id: ID du job
+            sample_id: Identifiant échantillon
+            completed_at: Date de fin du job (pour les requêtes "depuis")
+            genes: Gènes issus de OutputParser.parse_all_arg_deduplicated()
+
+        Returns:
+            int: Nombre de gènes indexés
+        """
+        hit_rows = []
+        class_rows = []
+        for ordinal, gene in enumerate(genes):
+            name = gene.get('gene') or ''
+            hit_rows.append((
+                job_id, ordinal, sample_id, name, name.lower(),
+                gene.get('sequence'), gene.get('start'), gene.get('end'), gene.get('strand'),
+                gene.get('coverage'), gene.get('identity'),
+                gene.get('database'), gene.get('accession'), gene.get('product'),
+                gene.get('resistance'), gene.get('subclass'),
+                gene.get('element_type'), gene.get('element_subtype'),
+                gene.get('source'), ';'.join(gene.get('sources') or []),
+                gene.get('priority'), completed_at
+            ))
+            for class_key in split_resistance_classes(gene.get('resistance'), gene.get('subclass')):
+                class_rows.append((class_key, job_id, ordinal))
+
+        async with self._connection() as db:
+            await db.execute("DELETE FROM gene_hits WHERE job_id = ?", (job_id,))
+            await db.execute("DELETE FROM gene_hit_classes WHERE job_id = ?", (job_id,))
+            await db.executemany("""
+                INSERT INTO gene_hits (
+                    job_id, ordinal, sample_id, gene, gene_key,
+                    sequence, start, "end", strand, coverage, identity,
+                    database, accession, product, resistance, subclass,
+                    element_type, element_subtype, source, sources,
+                    priority, completed_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, hit_rows)
+            await db.executemany("""
+                INSERT INTO gene_hit_classes (class_key, job_id, ordinal) VALUES (?, ?, ?)
+                ON CONFLICT DO NOTHING
+            """, class_rows)
+            await db.execute("""
+                INSERT INTO gene_index_jobs (job_id, num_genes, indexed_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(job_id) DO UPDATE SET
+                    num_genes = excluded.num_genes, indexed_at = excluded.indexed_at
+            """, (job_id, len(hit_rows), datetime.now()))
+            await db.execute("DELETE FROM gene_index_failures WHERE job_id = ?", (job_id,))
+            await db.commit()
+
+        return len(hit_rows)
+
+    async def is_job_genes_indexed(self, job_id: str) -> bool:
+        """Vérifie si les gènes d'un job sont présents dans l'index"""
+        async with self._connection() as db:
+            async with db.execute(
+                "SELECT 1 FROM gene_index_jobs WHERE job_id = ?",
+                (job_id,)
+            ) as cursor:
+                return await cursor.fetchone() is not None
+
+    async def record_gene_index_failure(self, job_id: str, error: str):
+        """Enregistre l'échec de l'indexation des gènes d'un job"""
+        async with self._connection() as db:
+            await db.execute("""
+                INSERT INTO gene_index_failures (job_id, error, failed_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(job_id) DO UPDATE SET
+                    error = excluded.error, failed_at = excluded.failed_at
+            """, (job_id, error, datetime.now()))
+            await db.commit()
+
+    async def get_gene_index_failure(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Dernier échec d'indexation des gènes d'un job (error, failed_at ; None si aucun)"""
+        async with self._connection() as db:
+            async with db.execute(
+                "SELECT error, failed_at FROM gene_index_failures WHERE job_id = ?",
+                (job_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+                return {'error': row[0], 'failed_at': row[1]} if row else None
+
+    async def query_job_genes(
+        self,
+        job_id: str,
+        priorities: Optional[List[str]] = None,
+        element_types: Optional[List[str]] = None,
+        sources: Optional[List[str]] = None,
+        min_identity: float = 0,
+        min_coverage: float = 0,
+        sort: str = "priority",
+        descending: bool = False,
+        after: Optional[tuple] = None,
+        limit: int = 100
+    ) -> Dict[str, Any]:
+        """
+        Filtre, trie et pagine (keyset) les gènes indexés d'un job
+
+        Args:
+            job_id: ID du job
+            priorities: Priorités acceptées (CRITICAL, HIGH, MEDIUM)
+            element_types: Types acceptés (AMR, VIRULENCE, STRESS)
+            sources: Outils acceptés (source principale ou l'une des sources)
+            min_identity: Identité minimale (%)
+            min_coverage: Couverture minimale (%)
+            sort: Colonne de tri (voir GENE_SORT_COLUMNS)
+            descending: Tri décroissant
+            after: Curseur (valeur de tri, ordinal) du dernier gène de la page précédente
+            limit: Taille de page
+
+        Returns:
+            Dict avec 'total' (nombre filtré), 'genes' (page) et 'next' (curseur ou None)
+        """
+        sort_expr = GENE_SORT_COLUMNS[sort]
+        conditions = ["job_id = ?", "COALESCE(identity, 0) >= ?", "COALESCE(coverage, 0) >= ?"]
+        params: List[Any] = [job_id, min_identity, min_coverage]
+
+        if priorities:
+            conditions.append(f"priority IN ({', '.join('?' for _ in priorities)})")
+            params.extend(priorities)
+        if element_types:
+            conditions.append(f"element_type IN ({', '.join('?' for _ in element_types)})")
+            params.extend(element_types)
+        if sources:
+            source_conditions = []
+            for source in sources:
+                source_conditions.append("(source = ? OR ';' || sources || ';' LIKE ?)")
+                params.extend([source, f"%;{source};%"])
+            conditions.append("(" + " OR ".join(source_conditions) + ")")
+
+        where = " AND ".join(conditions)
+        page_where = where
+        page_params = list(params)
+        if after is not None:
+            op = "<" if descending else ">"
+            page_where += f" AND ({sort_expr} {op} ? OR ({sort_expr} = ? AND ordinal > ?))"
+            page_params.extend([after[0], after[0], after[1]])
+
+        direction = "DESC" if descending else "ASC"
+        query = f"""
+            SELECT *, {sort_expr} AS sort_value FROM gene_hits
+            WHERE {page_where}
+            ORDER BY sort_value {direction}, ordinal ASC
+            LIMIT ?
+        """
+        page_params.append(limit + 1)
+
+        async with self._connection() as db:
+            async with db.execute(
+                f"SELECT COUNT(*) FROM gene_hits WHERE {where}", params
+            ) as cursor:
+                row = await cursor.fetchone()
+                total = row[0] if row else 0
+            async with db.execute(query, page_params) as cursor:
+                rows = [dict(row) for row in await cursor.fetchall()]
+
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1]['sort_value'], rows[-1]['ordinal'])
+
+        return {"total": total, "genes": rows, "next": next_key}
+
+    async def get_unindexed_completed_jobs(self) -> List[Dict[str, Any]]:
+        """Liste les jobs COMPLETED absents de l'index des gènes"""
+        async with self._connection() as db:
+            async with db.execute("""
+                SELECT j.* FROM jobs j
+                LEFT JOIN gene_index_jobs g ON g.job_id = j.id
+                WHERE j.status = ? AND g.job_id IS NULL
+                ORDER BY j.completed_at
+            """, (JobStatus.COMPLETED.value,)) as cursor:
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
+
+    async def search_gene_samples(
+        self,
+        gene: str,
+        prefix: bool = False,
+        resistance_class: Optional[str] = None,
+        min_identity: float = 0,
+        min_coverage: float = 0,
+        priority: Optional[str] = None,
+        since: Optional[datetime] = None,
+        limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """
+        Recherche les échantillons portant un gène (nom exact ou préfixe)
+
+        Args:
+            gene: Nom du gène (insensible à la casse)
+            prefix: True pour une recherche par préfixe (ex: "blandm")
+            resistance_class: Restreindre à une classe d'antibiotique (ex: carbapenem)
+            min_identity: Identité minimale (%)
+            min_coverage: Couverture minimale (%)
+            priority: Restreindre à une priorité (CRITICAL, HIGH, MEDIUM)
+            since: Jobs terminés après cette date
+            limit: Nombre maximum de résultats
+
+        Returns:
+            Liste des hits (job, échantillon, identité, couverture, priorité, source)
+        """
+        gene_key = gene.lower()
+        if prefix:
+            query = "SELECT h.* FROM gene_hits h WHERE h.gene_key >= ? AND h.gene_key < ?"
+            params: List[Any] = [gene_key, gene_key + '\uffff']
+        else:
+            query = "SELECT h.* FROM gene_hits h WHERE h.gene_key = ?"
+            params = [gene_key]
+
+        query += " AND h.identity >= ? AND h.coverage >= ?"
+        params.extend([min_identity, min_coverage])
+
+        if resistance_class:
+            query += """
+                AND EXISTS (
+                    SELECT 1 FROM gene_hit_classes c
+                    WHERE c.job_id = h.job_id AND c.ordinal = h.ordinal AND c.class_key = ?
+                )
+            """
+            params.append(resistance_class.lower())
+        if priority:
+            query += " AND h.priority = ?"
+            params.append(priority.upper())
+        if since:
+            query += " AND h.completed_at >= ?"
+            params.append(naive_local(since))
+
+        query += " ORDER BY h.completed_at DESC, h.job_id, h.ordinal LIMIT ?"
+        params.append(limit)
+
+        async with self._connection() as db:
+            async with db.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
+
+    async def list_indexed_genes(
+        self,
+        prefix: Optional[str] = None,
+        resistance_class: Optional[str] = None,
+        limit: int = 200
+    ) -> List[Dict[str, Any]]:
+        """
+        Liste les gènes présents dans l'index avec leur nombre d'échantillons
+
+        Args:
+            prefix: Préfixe du nom de gène (insensible à la casse)
+            resistance_class: Classe d'antibiotique (ex: carbapenem, colistin)
+            limit: Nombre maximum de gènes
+
+        Returns:
+            Liste de dicts {gene, num_samples, num_hits, max_identity}
+        """
+        query = """
+            SELECT h.gene_key, MIN(h.gene) AS gene,
+                   COUNT(DISTINCT h.job_id) AS num_samples,
+                   COUNT(*) AS num_hits,
+                   MAX(h.identity) AS max_identity
+            FROM gene_hits h
+        """
+        conditions = []
+        params: List[Any] = []
+
+        if resistance_class:
+            query += " JOIN gene_hit_classes c ON c.job_id = h.job_id AND c.ordinal = h.ordinal"
+            conditions.append("c.class_key = ?")
+            params.append(resistance_class.lower())
+        if prefix:
+            conditions.append("h.gene_key >= ? AND h.gene_key < ?")
+            params.extend([prefix.lower(), prefix.lower() + '\uffff'])
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY h.gene_key ORDER BY num_samples DESC, h.gene_key LIMIT ?"
+        params.append(limit)
+
+        async with self._connection() as db:
+            async with db.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
+
+
+# Colonnes de tri autorisées pour query_job_genes (nom API → expression SQL)
+GENE_SORT_COLUMNS = {
+    "priority": "CASE priority WHEN 'CRITICAL' THEN 0 WHEN 'HIGH' THEN 1 WHEN 'MEDIUM' THEN 2 ELSE 3 END",
+    "gene": "gene_key",
+    "identity": "COALESCE(identity, 0)",
+    "coverage": "COALESCE(coverage, 0)",
+    "source": "COALESCE(source, '')",
+    "element_type": "COALESCE(element_type, '')",
+    "position": "ordinal",
+}
+
+
+def naive_local(value: datetime) -> datetime:
+    """
+    Date en heure locale sans fuseau, comme les colonnes TIMESTAMP
+
+    Les dates enregistrées sont naïves (datetime.now()) ; une date avec
+    fuseau (`since=2026-01-01T00:00:00Z`) est convertie avant comparaison
+    (asyncpg refuse une date avec fuseau pour une colonne TIMESTAMP).
+    """
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+
+def split_resistance_classes(*values: Optional[str]) -> List[str]:
+    """
+    Découpe les champs resistance/subclass en classes normalisées
+
+    Ex: "AMINOGLYCOSIDE/QUINOLONE" et "Carbapenem;Cephalosporin"
+    → ['aminoglycoside', 'quinolone', 'carbapenem', 'cephalosporin']
+    """
+    classes = []
+    for value in values:
+        if not value:
+            continue
+        for part in re.split(r'[;/,]', value):
+            part = part.strip().lower()
+            if part and part not in classes:
+                classes.append(part)
+    return classes
+
+
+class JobEventWriter:
+    """
+    Écrivain asynchrone par lots pour la table job_events
+
+    emit() ne fait que mettre l'événement en file : une tâche de fond regroupe
+    tout ce qui arrive pendant flush_interval_ms et l'écrit en une transaction,
+    pour que les événements fréquents de nombreux jobs concurrents ne
+    sérialisent pas un commit SQLite chacun.
+    """
+
+    def __init__(self, database: Database, flush_interval_ms: int = 250, max_batch: int = 500):
+        self.database = database
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Démarre la tâche d'écriture (à appeler dans la boucle de l'application)"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    def emit(
+        self,
+        job_id: str,
+        event_type: str,
+        module: Optional[str] = None,
+        status: Optional[str] = None,
+        duration_s: Optional[float] = None,
+        created_at: Optional[datetime] = None,
+        **data
+    ):
+        """
+        Met un événement en file (non bloquant)
+
+        Args:
+            job_id: ID du job
+            event_type: status, module_start, module_end, module_skipped, metrics...
+            module: Module du pipeline concerné (optionnel)
+            status: Statut du job ou du module (optionnel)
+            duration_s: Durée en secondes (module_end, fin de job)
+            created_at: Horodatage (défaut: maintenant)
+            **data: Métriques libres, stockées en JSON
+        """
+        if self._queue is None:
+            logger.warning(f"Événement {event_type} ignoré pour {job_id}: writer non démarré")
+            return
+        self._queue.put_nowait((
+            job_id,
+            created_at or datetime.now(),
+            event_type,
+            module,
+            status,
+            duration_s,
+            json.dumps(data, default=str) if data else None
+        ))
+
+    async def _write(self, batch: List[tuple]):
+        try:
+            await self.database.insert_job_events(batch)
+        except Exception as e:
+            logger.error(f"Erreur écriture de {len(batch)} événements: {e}")
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            pending = [await self._queue.get()]
+            if pending[0] is not None:
+                await asyncio.sleep(self.flush_interval)
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            # None = sentinelle d'arrêt posée par stop()
+            stopping = None in pending
+            pending = [event for event in pending if event is not None]
+            for i in range(0, len(pending), self.max_batch):
+                await self._write(pending[i:i + self.max_batch])
+
+    async def stop(self):
+        """Arrête la tâche de fond après avoir écrit les événements en file"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+
+def create_database() -> Database:
+    """
+    Instancie le backend configuré
+
+    DATABASE_URL=postgresql://... → PostgreSQL (asyncpg), sinon SQLite
+    (DATABASE_PATH, défaut: jobs.db).
+    """
+    pool_size = int(os.environ.get("DATABASE_POOL_SIZE", "4"))
+    database_url = os.environ.get("DATABASE_URL", "")
+    if database_url.startswith(("postgres://", "postgresql://")):
+        from database_postgres import PostgresDatabase
+        return PostgresDatabase(database_url, pool_size=pool_size)
+    return Database(
+        db_path=os.environ.get("DATABASE_PATH", "jobs.db"),
+        pool_size=pool_size
+    )
+
 
 # Instance globale (singleton)
-db = Database()
+db = create_database()
+
+events = JobEventWriter(
+    db,
+    flush_interval_ms=int(os.environ.get("EVENT_FLUSH_MS", "250"))
+)
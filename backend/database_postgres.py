@@ -0,0 +1,415 @@
+"""
+Backend PostgreSQL (asyncpg) pour le suivi des jobs
+
+Même interface que Database (SQLite) : les requêtes de database.py sont
+réutilisées telles quelles via un adaptateur de connexion qui reproduit
+l'API aiosqlite utilisée (execute / executemany / commit / rollback,
+curseurs fetchone / fetchall / rowcount) et traduit les paramètres
+`?` en `$1, $2...`. Seul le schéma (DDL, triggers) est spécifique.
+
+Sélectionné quand DATABASE_URL commence par postgres:// ou postgresql://,
+ce qui permet de faire tourner plusieurs workers API sur un état partagé
+(l'état des jobs ; les uploads reprenables, téléchargements de bases et
+processus du pipeline restent propres à un worker, voir README).
+"""
+import re
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional, Sequence
+from urllib.parse import urlsplit, urlunsplit
+
+try:
+    import asyncpg
+except ImportError:  # Dépendance optionnelle (pip install asyncpg)
+    asyncpg = None
+
+from database import Database
+
+
+# Clé du verrou consultatif pris pendant la création du schéma
+# (plusieurs workers peuvent démarrer en même temps)
+SCHEMA_LOCK_KEY = 0x41524731  # "ARG1"
+
+# Chaînes entre quotes simples (ignorées lors de la traduction des paramètres)
+_PLACEHOLDER_RE = re.compile(r"'(?:[^']|'')*'|\?")
+
+# Requêtes qui renvoient des lignes (sinon seul le statut est lu)
+_RETURNS_ROWS_RE = re.compile(r"\s*(SELECT|WITH|VALUES)\b", re.IGNORECASE)
+
+
+def translate_placeholders(query: str) -> str:
+    """Traduit les paramètres SQLite `?` en paramètres PostgreSQL `$n`"""
+    counter = 0
+
+    def replace(match: re.Match) -> str:
+        nonlocal counter
+        if match.group(0) != '?':
+            return match.group(0)
+        counter += 1
+        return f"${counter}"
+
+    return _PLACEHOLDER_RE.sub(replace, query)
+
+
+class _Cursor:
+    """Résultat d'une requête, exposé comme un curseur aiosqlite"""
+
+    def __init__(self, rows: List[Any], rowcount: int):
+        self._rows = rows
+        self.rowcount = rowcount
+
+    async def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    async def fetchall(self):
+        return self._rows
+
+
+class _Execution:
+    """Requête en attente : utilisable avec `await` ou `async with` (comme aiosqlite)"""
+
+    def __init__(self, coro):
+        self._coro = coro
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    async def __aenter__(self) -> _Cursor:
+        return await self._coro
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class PostgresConnection:
+    """
+    Adaptateur asyncpg → interface aiosqlite utilisée par Database
+
+    Une transaction est ouverte à la première requête et validée par
+    commit() (comme le mode transactionnel implicite de sqlite3).
+    """
+
+    def __init__(self, conn: "asyncpg.Connection"):
+        self._conn = conn
+        self._transaction = None
+
+    async def _begin(self):
+        if self._transaction is None:
+            self._transaction = self._conn.transaction()
+            await self._transaction.start()
+
+    async def _run(self, query: str, params: Sequence[Any]) -> _Cursor:
+        await self._begin()
+        query = translate_placeholders(query)
+        # fetch/execute passent par le cache de requêtes préparées d'asyncpg
+        if _RETURNS_ROWS_RE.match(query) or 'RETURNING' in query.upper():
+            rows = await self._conn.fetch(query, *params)
+            return _Cursor(rows, len(rows))
+        # Statut "UPDATE 3", "DELETE 1", "INSERT 0 1"... → nombre de lignes
+        status_msg = await self._conn.execute(query, *params)
+        tail = status_msg.rsplit(" ", 1)[-1]
+        return _Cursor([], int(tail) if tail.isdigit() else -1)
+
+    def execute(self, query: str, params: Sequence[Any] = ()) -> _Execution:
+        return _Execution(self._run(query, params))
+
+    async def executemany(self, query: str, params: Sequence[Sequence[Any]]):
+        if not params:
+            return
+        await self._begin()
+        await self._conn.executemany(translate_placeholders(query), params)
+
+    async def commit(self):
+        if self._transaction is not None:
+            transaction, self._transaction = self._transaction, None
+            await transaction.commit()
+
+    async def rollback(self):
+        if self._transaction is not None:
+            transaction, self._transaction = self._transaction, None
+            await transaction.rollback()
+
+
+class PostgresDatabase(Database):
+    """
+    Gestionnaire de base de données PostgreSQL (pool asyncpg)
+
+    Réutilise toutes les requêtes de Database ; seuls la gestion des
+    connexions et le schéma diffèrent.
+    """
+
+    def __init__(self, dsn: str, pool_size: int = 4):
+        if asyncpg is None:
+            raise RuntimeError(
+                "DATABASE_URL PostgreSQL configurée mais asyncpg n'est pas installé "
+                "(pip install asyncpg)"
+            )
+        super().__init__(db_path=_mask_password(dsn), pool_size=pool_size)
+        self.dsn = dsn
+        self._pg_pool: Optional["asyncpg.Pool"] = None
+
+    async def _open_pool(self):
+        """Crée le pool asyncpg (au premier accès)"""
+        async with self._pool_lock:
+            if self._pg_pool is not None:
+                return
+            self._pg_pool = await asyncpg.create_pool(
+                self.dsn,
+                min_size=1,
+                max_size=self.pool_size,
+                statement_cache_size=256  # Requêtes préparées (par connexion)
+            )
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[PostgresConnection]:
+        """Emprunte une connexion du pool (rollback de ce qui n'a pas été validé)"""
+        if self._pg_pool is None:
+            await self._open_pool()
+        async with self._pg_pool.acquire() as conn:
+            adapter = PostgresConnection(conn)
+            try:
+                yield adapter
+            finally:
+                await adapter.rollback()
+
+    async def close(self):
+        """Ferme le pool de connexions"""
+        async with self._pool_lock:
+            if self._pg_pool is not None:
+                await self._pg_pool.close()
+                self._pg_pool = None
+
+    async def initialize(self):
+        """Initialise la base de données (crée tables si nécessaire)"""
+        if self._initialized:
+            return
+
+        async with self._connection() as db:
+            # Sérialiser la création du schéma entre workers
+            await db.execute("SELECT pg_advisory_xact_lock(?)", (SCHEMA_LOCK_KEY,))
+
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    sample_id TEXT NOT NULL,
+                    input_type TEXT,
+                    status TEXT NOT NULL,
+                    run_number INTEGER,
+                    output_dir TEXT,
+                    pid INTEGER,
+                    threads INTEGER DEFAULT 8,
+                    prokka_mode TEXT DEFAULT 'auto',
+                    prokka_genus TEXT,
+                    prokka_species TEXT,
+                    created_at TIMESTAMP NOT NULL,
+                    started_at TIMESTAMP,
+                    completed_at TIMESTAMP,
+                    exit_code INTEGER,
+                    error_message TEXT
+                )
+            """)
+
+            # Index pour recherches fréquentes
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_sample_id ON jobs(sample_id)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_status ON jobs(status)")
+
+            # Index couvrants pour la vue liste (pagination keyset sur created_at, id)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_list
+                ON jobs(created_at DESC, id DESC)
+                INCLUDE (sample_id, status, input_type, completed_at)
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_status_list
+                ON jobs(status, created_at DESC, id DESC)
+                INCLUDE (sample_id, input_type, completed_at)
+            """)
+
+            # Compteurs par statut maintenus par trigger (évite COUNT(*))
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS job_counts (
+                    status TEXT PRIMARY KEY,
+                    count BIGINT NOT NULL DEFAULT 0
+                )
+            """)
+            await db.execute("""
+                CREATE OR REPLACE FUNCTION job_counts_sync() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                        UPDATE job_counts SET count = count - 1 WHERE status = OLD.status;
+                    END IF;
+                    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                        INSERT INTO job_counts (status, count) VALUES (NEW.status, 1)
+                        ON CONFLICT (status) DO UPDATE SET count = job_counts.count + 1;
+                    END IF;
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+            await db.execute("DROP TRIGGER IF EXISTS trg_job_counts_insert_delete ON jobs")
+            await db.execute("""
+                CREATE TRIGGER trg_job_counts_insert_delete AFTER INSERT OR DELETE ON jobs
+                FOR EACH ROW EXECUTE FUNCTION job_counts_sync()
+            """)
+            await db.execute("DROP TRIGGER IF EXISTS trg_job_counts_update ON jobs")
+            await db.execute("""
+                CREATE TRIGGER trg_job_counts_update AFTER UPDATE OF status ON jobs
+                FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+                EXECUTE FUNCTION job_counts_sync()
+            """)
+            # Resynchroniser les compteurs au démarrage (bases existantes)
+            await db.execute("DELETE FROM job_counts")
+            await db.execute("""
+                INSERT INTO job_counts (status, count)
+                SELECT status, COUNT(*) FROM jobs GROUP BY status
+            """)
+
+            # Manifeste des fichiers de chaque run (file_manifest.py)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS job_files (
+                    job_id TEXT NOT NULL,
+                    relative_path TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size BIGINT NOT NULL,
+                    mtime DOUBLE PRECISION NOT NULL,
+                    file_type TEXT NOT NULL,
+                    icon TEXT,
+                    category TEXT NOT NULL,
+                    extension TEXT,
+                    PRIMARY KEY (job_id, relative_path)
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_job_files_list
+                ON job_files(job_id, category, name, relative_path)
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS job_file_manifests (
+                    job_id TEXT PRIMARY KEY,
+                    complete INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP NOT NULL
+                )
+            """)
+
+            # Dernier numéro de run attribué par échantillon (allocate_run_number)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS run_counters (
+                    sample_id TEXT PRIMARY KEY,
+                    last_run INTEGER NOT NULL
+                )
+            """)
+
+            # Index inversé gène → échantillons (collation C : recherche par préfixe
+            # en intervalle gene_key >= ? AND gene_key < ? || U+FFFF)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS gene_hits (
+                    job_id TEXT NOT NULL,
+                    ordinal INTEGER NOT NULL,
+                    sample_id TEXT NOT NULL,
+                    gene TEXT NOT NULL,
+                    gene_key TEXT COLLATE "C" NOT NULL,
+                    sequence TEXT,
+                    start INTEGER,
+                    "end" INTEGER,
+                    strand TEXT,
+                    coverage DOUBLE PRECISION,
+                    identity DOUBLE PRECISION,
+                    database TEXT,
+                    accession TEXT,
+                    product TEXT,
+                    resistance TEXT,
+                    subclass TEXT,
+                    element_type TEXT,
+                    element_subtype TEXT,
+                    source TEXT,
+                    sources TEXT,
+                    priority TEXT,
+                    completed_at TIMESTAMP,
+                    PRIMARY KEY (job_id, ordinal)
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_gene_hits_gene
+                ON gene_hits(gene_key, identity, coverage)
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS gene_hit_classes (
+                    class_key TEXT NOT NULL,
+                    job_id TEXT NOT NULL,
+                    ordinal INTEGER NOT NULL,
+                    PRIMARY KEY (class_key, job_id, ordinal)
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_gene_hit_classes_job
+                ON gene_hit_classes(job_id)
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS gene_index_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    num_genes INTEGER NOT NULL,
+                    indexed_at TIMESTAMP NOT NULL
+                )
+            """)
+            # Échecs d'indexation (sorties illisibles) : pas de nouvel essai à
+            # chaque requête, seulement après GENE_INDEX_RETRY_SECONDS, si les
+            # sorties ont changé, ou au démarrage (_backfill_gene_index)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS gene_index_failures (
+                    job_id TEXT PRIMARY KEY,
+                    error TEXT NOT NULL,
+                    failed_at TIMESTAMP NOT NULL
+                )
+            """)
+
+            # Historique des événements (append-only, alimenté par JobEventWriter)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS job_events (
+                    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+                    job_id TEXT NOT NULL,
+                    created_at TIMESTAMP NOT NULL,
+                    event_type TEXT NOT NULL,
+                    module TEXT,
+                    status TEXT,
+                    duration_s DOUBLE PRECISION,
+                    data TEXT
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_job_events_job
+                ON job_events(job_id, id)
+            """)
+
+            # Statistiques de validation des fichiers d'entrée (input_validation),
+            # par inode : les noms d'un même contenu uploadé partagent l'entrée
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS input_stats (
+                    file_key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    sha256 TEXT,
+                    stats TEXT NOT NULL,
+                    validated_at TIMESTAMP NOT NULL
+                )
+            """)
+
+            # Dernier état de la tâche de téléchargement de chaque base de
+            # référence (db_tasks) : conservé après un redémarrage de l'API
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS db_download_tasks (
+                    db_key TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at TIMESTAMP NOT NULL
+                )
+            """)
+
+            await db.commit()
+
+        self._initialized = True
+
+
+def _mask_password(dsn: str) -> str:
+    """DSN affichable dans les logs (mot de passe masqué)"""
+    parts = urlsplit(dsn)
+    if not parts.password:
+        return dsn
+    netloc = parts.netloc.replace(f":{parts.password}@", ":***@", 1)
+    return urlunsplit(parts._replace(netloc=netloc))
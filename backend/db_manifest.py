@@ -0,0 +1,194 @@
+"""
+Manifeste des bases de référence (statut, taille, fichiers de contrôle)
+
+Remplace le rglob(check_file) + rglob("*") avec stat de chaque requête
+/api/databases : le statut de chaque base est enregistré dans
+databases/.manifest.json et servi tel quel tant que le mtime du répertoire
+de la base n'a pas changé (un stat par base) ; les mises à jour forcent un
+rafraîchissement.
+
+Le rafraîchissement est incrémental, comme ManifestScanner : par
+répertoire, le mtime, la taille et le nombre des fichiers directs, les
+fichiers de contrôle présents et les sous-répertoires sont conservés ; seuls
+les répertoires dont le mtime a changé sont relistés.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_NAME = ".manifest.json"
+
+# Version du format : un manifeste d'un autre format est ignoré (reconstruit)
+MANIFEST_VERSION = 1
+
+
+def _scan_database(db_path: Path, check_files: List[str], previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Parcourt une base en réutilisant les répertoires inchangés du scan précédent
+
+    Les liens symboliques ne sont pas suivis (amrfinder `latest` pointe vers
+    une version déjà comptée).
+
+    Returns:
+        Dict avec size_bytes, file_count, ready, check_path et dirs
+        (chemin relatif → [mtime_ns, taille, fichiers, noms de contrôle, sous-répertoires])
+    """
+    old_dirs = previous.get("dirs", {}) if previous else {}
+    wanted = set(check_files)
+    dirs: Dict[str, list] = {}
+    size = 0
+    file_count = 0
+    check_path = None
+    stack = [""]
+
+    while stack:
+        rel_dir = stack.pop()
+        abs_dir = db_path / rel_dir if rel_dir else db_path
+        try:
+            dir_mtime = os.stat(abs_dir, follow_symlinks=False).st_mtime_ns
+        except OSError:
+            continue
+        cached = old_dirs.get(rel_dir)
+
+        if cached and cached[0] == dir_mtime:
+            state = cached
+        else:
+            dir_size = 0
+            dir_files = 0
+            found: List[str] = []
+            subdirs: List[str] = []
+            try:
+                with os.scandir(abs_dir) as it:
+                    for entry in it:
+                        rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                        if entry.name in wanted:
+                            found.append(entry.name)  # Fichier ou dossier (mlst: pubmlst/)
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(rel_path)
+                        elif entry.is_file(follow_symlinks=False):
+                            dir_size += entry.stat(follow_symlinks=False).st_size
+                            dir_files += 1
+            except OSError as e:
+                logger.warning(f"Manifeste bases: lecture impossible de {abs_dir}: {e}")
+                continue
+            state = [dir_mtime, dir_size, dir_files, sorted(found), sorted(subdirs)]
+
+        dirs[rel_dir] = state
+        size += state[1]
+        file_count += state[2]
+        if check_path is None and state[3]:
+            check_path = f"{rel_dir}/{state[3][0]}" if rel_dir else state[3][0]
+        stack.extend(state[4])
+
+    return {
+        "size_bytes": size,
+        "file_count": file_count,
+        "ready": check_path is not None,
+        "check_path": check_path,
+        "dirs": dirs,
+    }
+
+
+class DatabaseManifest:
+    """
+    Statut des bases de référence, persistant (JSON) et rafraîchi à la demande
+
+    status() coûte un stat (plus un stat du fichier de contrôle) quand la
+    base n'a pas changé ; le manifeste est chargé une fois puis gardé en
+    mémoire et réécrit atomiquement après chaque rafraîchissement.
+    """
+
+    def __init__(self, databases_dir: Path):
+        self.databases_dir = databases_dir
+        self.path = databases_dir / MANIFEST_NAME
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            entries = {}
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    entries = data.get("databases", {})
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, AttributeError) as e:
+                logger.warning(f"Manifeste bases illisible ({self.path}), reconstruction: {e}")
+            self._entries = entries
+        return self._entries
+
+    def _save(self):
+        tmp_path = self.path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({"version": MANIFEST_VERSION, "databases": self._entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # Répertoire en lecture seule : le manifeste reste en mémoire
+            logger.debug(f"Écriture du manifeste bases impossible: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+    def status(self, key: str, db_path: Path, check_files: List[str], refresh: bool = False) -> Dict[str, Any]:
+        """
+        Statut d'une base (manifeste si à jour, sinon rafraîchi)
+
+        Args:
+            key: Clé de la base (DATABASES_CONFIG)
+            db_path: Répertoire de la base
+            check_files: Noms dont la présence indique une base utilisable
+            refresh: Forcer le rafraîchissement (après téléchargement ou mise à jour)
+
+        Returns:
+            Dict avec exists, ready, size_bytes, file_count, mtime et scanned_at
+        """
+        try:
+            dir_mtime = db_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                if self._load().pop(key, None) is not None:
+                    self._save()
+            return {"exists": False, "ready": False, "size_bytes": 0, "file_count": 0,
+                    "mtime": None, "scanned_at": None}
+
+        with self._lock:
+            entry = self._load().get(key)
+        if (not refresh and entry and entry["path"] == str(db_path) and entry["mtime_ns"] == dir_mtime
+                and (not entry["ready"] or (db_path / entry["check_path"]).exists())):
+            return self._public(entry)
+
+        started = time.monotonic()
+        scanned = _scan_database(db_path, check_files, entry if entry and entry["path"] == str(db_path) else None)
+        entry = {
+            "path": str(db_path),
+            "mtime_ns": dir_mtime,
+            "scanned_at": time.time(),
+            **scanned,
+        }
+        with self._lock:
+            self._load()[key] = entry
+            self._save()
+        logger.info(
+            f"Manifeste bases: {key} rafraîchi en {time.monotonic() - started:.2f}s "
+            f"({entry['file_count']} fichiers, {len(entry['dirs'])} répertoires)"
+        )
+        return self._public(entry)
+
+    @staticmethod
+    def _public(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "exists": True,
+            "ready": entry["ready"],
+            "size_bytes": entry["size_bytes"],
+            "file_count": entry["file_count"],
+            "mtime": entry["mtime_ns"] / 1e9,
+            "scanned_at": entry["scanned_at"],
+        }
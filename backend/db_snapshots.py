@@ -0,0 +1,276 @@
+"""
+Versions des bases de référence (instantanés, bascule atomique, épinglage)
+
+Chaque mise à jour est construite dans un nouveau répertoire
+databases/.snapshots/{clé}/{version}, validée (fichiers de contrôle), puis
+activée en remplaçant atomiquement le lien symbolique
+.snapshots/{clé}/current ; databases/{chemin} (card_db, pointfinder_db, ...)
+pointe vers ce lien, les scripts et outils qui l'utilisent ne voient donc
+jamais une base à moitié écrite.
+
+Un job lancé reçoit un répertoire d'épinglage databases/.pins/{job_id} dont
+les liens pointent vers les versions courantes au lancement (--db-dir du
+pipeline) : il garde ces versions jusqu'à la fin, même si une mise à jour
+est activée entre-temps. Une version qui n'est ni courante ni épinglée par
+un job vivant est supprimée (compte de références), sauf si elle est en
+construction : un marqueur .{version}.building (PID du processus) la
+protège jusqu'à son activation ou son abandon. Une construction coupée
+(arrêt brutal pendant un téléchargement) garde son marqueur : elle est
+supprimée au démarrage suivant.
+"""
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOTS_DIR = ".snapshots"
+PINS_DIR = ".pins"
+CURRENT_LINK = "current"
+
+# Suffixe du marqueur d'une version en construction (.{version}.building)
+BUILDING_SUFFIX = ".building"
+
+# Fichier d'un épinglage contenant le PID du pipeline (épinglage abandonné si mort)
+PIN_PID_FILE = ".pid"
+
+# Épinglage sans PID (lancement interrompu) considéré abandonné après ce délai
+PIN_LAUNCH_GRACE = 600
+
+
+def _replace_symlink(link: Path, target: str):
+    """Crée ou remplace un lien symbolique en une opération (rename)"""
+    tmp_link = link.with_name(f".{link.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_link.unlink(missing_ok=True)
+    os.symlink(target, tmp_link)
+    os.replace(tmp_link, link)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SnapshotStore:
+    """
+    Instantanés versionnés des bases de databases_dir
+
+    Les opérations sur le système de fichiers sont synchrones (threads de
+    téléchargement, ou asyncio.to_thread depuis l'API).
+    """
+
+    def __init__(self, databases_dir: Path):
+        self.databases_dir = databases_dir
+        self.snapshots_dir = databases_dir / SNAPSHOTS_DIR
+        self.pins_dir = databases_dir / PINS_DIR
+        self._lock = threading.Lock()
+
+    def _key_dir(self, key: str) -> Path:
+        return self.snapshots_dir / key
+
+    def current(self, key: str) -> Optional[Path]:
+        """Répertoire de la version courante (résolu) ou None"""
+        link = self._key_dir(key) / CURRENT_LINK
+        if not link.is_symlink():
+            return None
+        target = link.resolve()
+        return target if target.is_dir() else None
+
+    def versions(self, key: str) -> List[str]:
+        """Versions présentes, de la plus ancienne à la plus récente"""
+        try:
+            return sorted(
+                entry.name for entry in os.scandir(self._key_dir(key))
+                if entry.is_dir(follow_symlinks=False) and not entry.name.startswith(".")
+            )
+        except FileNotFoundError:
+            return []
+
+    def _version_name(self, key: str, timestamp: Optional[float] = None) -> str:
+        base = time.strftime("%Y%m%d-%H%M%S", time.localtime(timestamp))
+        existing = set(self.versions(key))
+        name, n = base, 1
+        while name in existing:
+            n += 1
+            name = f"{base}-{n}"
+        return name
+
+    def adopt_legacy(self, key: str, path_name: str) -> bool:
+        """
+        Convertit databases/{path_name} (répertoire réel non vide) en première version
+
+        Returns:
+            True si une base a été convertie
+        """
+        public = self.databases_dir / path_name
+        if public.is_symlink() or not public.is_dir() or not any(public.iterdir()):
+            return False
+        with self._lock:
+            key_dir = self._key_dir(key)
+            key_dir.mkdir(parents=True, exist_ok=True)
+            version = key_dir / self._version_name(key, public.stat().st_mtime)
+            os.rename(public, version)
+            _replace_symlink(key_dir / CURRENT_LINK, version.name)
+            _replace_symlink(public, os.path.join(SNAPSHOTS_DIR, key, CURRENT_LINK))
+        logger.info(f"Base {key}: {public} convertie en version {version.name}")
+        return True
+
+    def _building_marker(self, version: Path) -> Path:
+        return version.with_name(f".{version.name}{BUILDING_SUFFIX}")
+
+    def _is_building(self, version: Path, interrupted: bool) -> bool:
+        """Version en construction par un processus vivant (toujours faux si interrupted)"""
+        try:
+            pid = int(self._building_marker(version).read_text())
+        except (OSError, ValueError):
+            return False
+        return not interrupted and _pid_alive(pid)
+
+    def new_version(self, key: str) -> Path:
+        """Crée le répertoire (vide) d'une nouvelle version, non activée et marquée en construction"""
+        with self._lock:
+            key_dir = self._key_dir(key)
+            key_dir.mkdir(parents=True, exist_ok=True)
+            version = key_dir / self._version_name(key)
+            self._building_marker(version).write_text(str(os.getpid()))
+            version.mkdir()
+        return version
+
+    def activate(self, key: str, path_name: str, version: Path):
+        """Bascule atomiquement la version courante (et databases/{path_name}) vers version"""
+        self.adopt_legacy(key, path_name)
+        with self._lock:
+            _replace_symlink(self._key_dir(key) / CURRENT_LINK, version.name)
+            self._building_marker(version).unlink(missing_ok=True)
+            public = self.databases_dir / path_name
+            if not public.is_symlink():
+                if public.is_dir():
+                    public.rmdir()  # Répertoire vide créé par pin()
+                _replace_symlink(public, os.path.join(SNAPSHOTS_DIR, key, CURRENT_LINK))
+        logger.info(f"Base {key}: version {version.name} activée")
+        self.prune(key)
+
+    def discard(self, version: Path):
+        """Supprime une version construite mais non activée (échec de la mise à jour)"""
+        shutil.rmtree(version, ignore_errors=True)
+        self._building_marker(version).unlink(missing_ok=True)
+
+    # ------------------------------------------------------------------
+    # Épinglage par les jobs
+    # ------------------------------------------------------------------
+
+    def pin(self, job_id: str, databases: Dict[str, str]) -> Path:
+        """
+        Épingle les versions courantes pour un job
+
+        Args:
+            job_id: ID du job
+            databases: {clé: chemin} (DATABASES_CONFIG) ; une base sans version
+                est liée à databases/{chemin}, créé au besoin : une base absente
+                installée par le pipeline l'est une fois pour toutes dans
+                databases/ (convertie en version au prochain démarrage), pas
+                dans l'épinglage supprimé en fin de job
+
+        Returns:
+            Répertoire à passer au pipeline comme répertoire des bases
+        """
+        pin_dir = self.pins_dir / job_id
+        with self._lock:
+            pin_dir.mkdir(parents=True, exist_ok=True)
+            for key, path_name in databases.items():
+                version = self.current(key)
+                target = version or self.databases_dir / path_name
+                if version is None and not target.is_symlink():
+                    target.mkdir(parents=True, exist_ok=True)
+                _replace_symlink(pin_dir / path_name, str(target.resolve()))
+        return pin_dir
+
+    def set_pin_pid(self, job_id: str, pid: int):
+        """Associe l'épinglage au processus du pipeline (détection des jobs disparus)"""
+        try:
+            (self.pins_dir / job_id / PIN_PID_FILE).write_text(str(pid))
+        except OSError as e:
+            logger.warning(f"Épinglage {job_id}: PID non enregistré: {e}")
+
+    def release(self, job_id: str):
+        """Libère l'épinglage d'un job terminé et supprime les versions orphelines"""
+        shutil.rmtree(self.pins_dir / job_id, ignore_errors=True)
+        self.prune()
+
+    def _live_pins(self) -> Iterable[Path]:
+        """Épinglages actifs ; les épinglages de processus disparus sont supprimés"""
+        try:
+            entries = list(os.scandir(self.pins_dir))
+        except FileNotFoundError:
+            return []
+        live = []
+        for entry in entries:
+            pin_dir = Path(entry.path)
+            try:
+                pid = int((pin_dir / PIN_PID_FILE).read_text())
+                alive = _pid_alive(pid)
+            except (OSError, ValueError):
+                alive = time.time() - entry.stat(follow_symlinks=False).st_mtime < PIN_LAUNCH_GRACE
+            if alive:
+                live.append(pin_dir)
+            else:
+                logger.info(f"Épinglage abandonné supprimé: {entry.name}")
+                shutil.rmtree(pin_dir, ignore_errors=True)
+        return live
+
+    def refcounts(self) -> Dict[Path, int]:
+        """Nombre de jobs vivants par version épinglée"""
+        counts: Dict[Path, int] = {}
+        for pin_dir in self._live_pins():
+            for link in pin_dir.iterdir():
+                if link.is_symlink():
+                    target = Path(os.readlink(link))
+                    counts[target] = counts.get(target, 0) + 1
+        return counts
+
+    def prune(self, key: Optional[str] = None, interrupted: bool = False) -> List[Path]:
+        """
+        Supprime les versions ni courantes, ni épinglées, ni en construction
+
+        Args:
+            key: Limiter à une base (toutes sinon)
+            interrupted: Constructions marquées considérées abandonnées
+                (démarrage : aucune mise à jour n'est en cours)
+
+        Returns:
+            Versions supprimées
+        """
+        removed = []
+        with self._lock:
+            counts = self.refcounts()
+            if key:
+                keys = [key]
+            elif self.snapshots_dir.is_dir():
+                keys = [entry.name for entry in os.scandir(self.snapshots_dir) if entry.is_dir()]
+            else:
+                keys = []
+            for k in keys:
+                current = self.current(k)
+                for name in self.versions(k):
+                    version = self._key_dir(k) / name
+                    # Comparaison des chemins résolus (databases_dir peut passer par un lien)
+                    if version.resolve() == current or counts.get(version.resolve(), 0):
+                        continue
+                    if self._is_building(version, interrupted):
+                        continue
+                    shutil.rmtree(version, ignore_errors=True)
+                    self._building_marker(version).unlink(missing_ok=True)
+                    removed.append(version)
+        for version in removed:
+            logger.info(f"Version de base supprimée (plus référencée): {version}")
+        return removed
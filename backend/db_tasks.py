@@ -0,0 +1,221 @@
+"""
+Gestionnaire asynchrone des téléchargements de bases de référence
+
+Remplace les threads par base (attente active sur les processus, puis
+time.sleep(30) pour garder le statut visible) : chaque mise à jour est une
+tâche asyncio, au plus `max_concurrent` à la fois (les autres attendent,
+statut "queued"), annulable, et dont l'état est enregistré en base
+(db_download_tasks) : le dernier statut reste consultable sans délai
+d'expiration, et une tâche coupée par un redémarrage apparaît "interrupted".
+
+La progression est poussée aux abonnés (listen(), flux SSE de l'API) ; les
+mises à jour rapprochées sont fusionnées par base pour un abonné lent.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Statuts finaux (la tâche n'est plus active)
+FINAL_STATUSES = ("completed", "failed", "cancelled", "interrupted")
+
+# Intervalle minimal entre deux enregistrements de la progression (secondes) ;
+# les changements de statut sont toujours enregistrés
+PERSIST_INTERVAL = 5.0
+
+
+class _Subscriber:
+    """File d'un abonné : dernier état en attente par base"""
+
+    def __init__(self):
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.event = asyncio.Event()
+
+    def push(self, key: str, state: Dict[str, Any]):
+        self.pending[key] = state
+        self.event.set()
+
+
+class DownloadTaskManager:
+    """
+    Tâches de téléchargement des bases (une par base au plus)
+
+    Toutes les méthodes s'appellent depuis la boucle d'événements de l'API.
+    """
+
+    def __init__(self, database, max_concurrent: int = 2):
+        self.database = database
+        self.max_concurrent = max_concurrent
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._subscribers: List[_Subscriber] = []
+        self._last_persist: Dict[str, float] = {}
+        self._persist_lock: Optional[asyncio.Lock] = None
+        # Enregistrements en cours (référencés jusqu'à leur fin)
+        self._persist_tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stopping = False
+
+    async def start(self):
+        """Charge les états enregistrés ; les tâches coupées par un arrêt deviennent "interrupted" """
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._persist_lock = asyncio.Lock()
+        try:
+            states = await self.database.list_db_download_tasks()
+        except Exception as e:
+            logger.error(f"Chargement des tâches de téléchargement impossible: {e}")
+            states = {}
+        for key, state in states.items():
+            self._states[key] = state
+            if state.get("status") not in FINAL_STATUSES:
+                state.update(active=False, status="interrupted",
+                             message="Interrompu (redémarrage de l'API)", speed="")
+                await self._persist(key)
+
+    async def stop(self):
+        """Annule les tâches en cours (enregistrées comme interrompues)"""
+        self._stopping = True
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._persist_tasks:
+            await asyncio.gather(*self._persist_tasks, return_exceptions=True)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """État courant (copie) ou None si aucune tâche n'a été lancée"""
+        state = self._states.get(key)
+        return dict(state) if state else None
+
+    def is_running(self, key: str) -> bool:
+        return key in self._tasks
+
+    def submit(self, key: str, runner: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+        """
+        Lance une tâche (en file si `max_concurrent` tâches tournent déjà)
+
+        Args:
+            key: Clé de la base
+            runner: Coroutine de téléchargement ; met à jour sa progression
+                par update() et termine par un statut completed ou failed
+
+        Returns:
+            État initial de la tâche
+
+        Raises:
+            RuntimeError: Une tâche est déjà en cours pour cette base
+        """
+        if self.is_running(key):
+            raise RuntimeError(f"Téléchargement déjà en cours pour '{key}'")
+        self._states[key] = {
+            "active": True,
+            "status": "queued",
+            "progress": 0,
+            "message": "En attente d'un emplacement de téléchargement...",
+            "downloaded_bytes": 0,
+            "total_bytes": 0,
+            "speed": "",
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "error": None,
+        }
+        self._notify(key, persist=True)
+        self._tasks[key] = asyncio.create_task(self._run(key, runner), name=f"db-download-{key}")
+        return self.get(key)
+
+    async def cancel(self, key: str) -> bool:
+        """Annule la tâche d'une base ; False si aucune tâche n'est en cours"""
+        task = self._tasks.get(key)
+        if task is None:
+            return False
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+        return True
+
+    def update(self, key: str, **fields):
+        """Met à jour l'état d'une tâche et le pousse aux abonnés"""
+        state = self._states.get(key)
+        if state is None:
+            return
+        status_changed = "status" in fields and fields["status"] != state.get("status")
+        state.update(fields)
+        if state.get("status") in FINAL_STATUSES:
+            state["active"] = False
+            state["finished_at"] = state.get("finished_at") or datetime.now().isoformat()
+        self._notify(key, persist=status_changed)
+
+    async def _run(self, key: str, runner: Callable[[], Awaitable[Any]]):
+        try:
+            async with self._semaphore:
+                self.update(key, status="starting", message="Démarrage...")
+                await runner()
+            if self._states[key].get("active"):
+                self.update(key, status="completed", progress=100)
+        except asyncio.CancelledError:
+            if self._stopping:
+                self.update(key, status="interrupted", message="Interrompu (arrêt de l'API)", speed="")
+            else:
+                self.update(key, status="cancelled", message="Annulé", speed="")
+            logger.info(f"[DB Download] {key}: {self._states[key]['message'].lower()}")
+        except Exception as e:
+            logger.error(f"[DB Download] Erreur {key}: {e}")
+            self.update(key, status="failed", progress=0,
+                        message=f"Erreur: {str(e)[:200]}", error=str(e)[:500])
+        finally:
+            self._tasks.pop(key, None)
+            await self._persist(key)
+
+    def _notify(self, key: str, persist: bool):
+        state = dict(self._states[key], key=key)
+        for subscriber in self._subscribers:
+            subscriber.push(key, state)
+        now = time.monotonic()
+        if persist or now - self._last_persist.get(key, 0) >= PERSIST_INTERVAL:
+            self._last_persist[key] = now
+            task = asyncio.get_running_loop().create_task(self._persist(key))
+            self._persist_tasks.add(task)
+            task.add_done_callback(self._persist_tasks.discard)
+
+    async def _persist(self, key: str):
+        # Écritures sérialisées, chacune de l'état courant : la dernière enregistre le plus récent
+        async with self._persist_lock:
+            try:
+                await self.database.save_db_download_task(key, dict(self._states[key]))
+            except Exception as e:
+                logger.warning(f"Enregistrement de la tâche {key} impossible: {e}")
+
+    async def listen(self, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        États des tâches au fil de leurs mises à jour
+
+        Commence par l'état courant de chaque base ; produit None après
+        `keepalive` secondes sans mise à jour (maintien de la connexion).
+        """
+        subscriber = _Subscriber()
+        for key in self._states:
+            subscriber.push(key, dict(self._states[key], key=key))
+        self._subscribers.append(subscriber)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.event.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                subscriber.event.clear()
+                pending, subscriber.pending = subscriber.pending, {}
+                for state in pending.values():
+                    yield state
+        finally:
+            self._subscribers.remove(subscriber)
@@ -0,0 +1,416 @@
+"""
+Téléchargement HTTP asynchrone des bases de référence (httpx)
+
+- Archives : download_and_extract() décompresse et extrait une archive tar
+  pendant sa réception (thread d'extraction alimenté par une file bornée),
+  sans écrire l'archive sur disque.
+- Reprise : une coupure est reprise par une requête Range à l'offset atteint
+  (If-Range : un fichier modifié sur le serveur fait échouer la reprise).
+- Intégrité : taille vérifiée, somme de contrôle calculée au fil de l'eau
+  et comparée à `checksum` si fournie, avant installation.
+- Progression : rappel (reçus, total, débit, extraits) au plus toutes les
+  PROGRESS_INTERVAL secondes, débit moyenné sur SPEED_WINDOW secondes.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import queue
+import shutil
+import tarfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+# Taille des écritures sur disque
+CHUNK_SIZE = 1024 * 1024
+
+# Échecs consécutifs tolérés (sans progression entre deux échecs)
+MAX_RETRIES = 5
+
+# Intervalle minimal entre deux rappels de progression (secondes)
+PROGRESS_INTERVAL = 0.5
+
+# Fenêtre de calcul du débit (secondes)
+SPEED_WINDOW = 5.0
+
+TIMEOUT = httpx.Timeout(30.0, read=120.0)
+
+# (octets reçus, total ou 0 si inconnu, débit en octets/s)
+ProgressCallback = Callable[[int, int, float], None]
+
+
+class DownloadError(Exception):
+    """Téléchargement impossible ou fichier reçu invalide"""
+
+
+class _RetryableError(Exception):
+    """Échec transitoire : le téléchargement est repris à l'offset atteint"""
+
+
+class _Progress:
+    """Compteur d'octets reçus avec rappel limité en fréquence et débit glissant"""
+
+    def __init__(self, total: int, downloaded: int, callback: Optional[ProgressCallback]):
+        self.total = total
+        self.downloaded = downloaded
+        self.callback = callback
+        self._samples = deque([(time.monotonic(), downloaded)])
+        self._last_report = 0.0
+
+    @property
+    def speed(self) -> float:
+        (first_time, first_bytes), (last_time, last_bytes) = self._samples[0], self._samples[-1]
+        elapsed = last_time - first_time
+        return (last_bytes - first_bytes) / elapsed if elapsed > 0 else 0.0
+
+    def add(self, count: int):
+        self.downloaded += count
+        now = time.monotonic()
+        if now - self._last_report >= PROGRESS_INTERVAL:
+            self.report(now)
+
+    def report(self, now: Optional[float] = None):
+        now = now or time.monotonic()
+        self._samples.append((now, self.downloaded))
+        while len(self._samples) > 2 and now - self._samples[0][0] > SPEED_WINDOW:
+            self._samples.popleft()
+        self._last_report = now
+        if self.callback:
+            self.callback(self.downloaded, self.total, self.speed)
+
+
+def _parse_checksum(checksum: Optional[str]) -> tuple:
+    """"sha256:abcd..." ou hex seul (SHA-256) → (algorithme, hex attendu ou None)"""
+    if not checksum:
+        return "sha256", None
+    algorithm, _, expected = checksum.rpartition(":")
+    algorithm = (algorithm or "sha256").lower()
+    if algorithm not in hashlib.algorithms_available:
+        raise DownloadError(f"Algorithme de somme de contrôle inconnu: {algorithm}")
+    return algorithm, expected.lower()
+
+
+async def _probe(client: httpx.AsyncClient, url: str) -> Dict[str, Any]:
+    """
+    URL finale (redirections suivies), taille, support des Range et validateur
+
+    Une requête GET Range 0-0 plutôt qu'un HEAD : certains serveurs
+    répondent mal aux HEAD, et elle teste réellement le support des Range.
+    """
+    headers = {"Range": "bytes=0-0", "Accept-Encoding": "identity"}
+    try:
+        async with client.stream("GET", url, headers=headers) as response:
+            return _probe_result(url, response)
+    except httpx.HTTPError as e:
+        raise DownloadError(f"Connexion impossible à {url}: {e}") from e
+
+
+def _probe_result(url: str, response: httpx.Response) -> Dict[str, Any]:
+    if response.status_code >= 400:
+        raise DownloadError(f"HTTP {response.status_code} pour {url}")
+    total = 0
+    ranges = False
+    if response.status_code == 206:
+        content_range = response.headers.get("content-range", "")
+        size = content_range.rpartition("/")[2]
+        if size.isdigit():
+            total = int(size)
+            ranges = True
+    elif response.headers.get("content-length", "").isdigit():
+        total = int(response.headers["content-length"])
+    return {
+        "url": str(response.url),
+        "total": total,
+        "ranges": ranges,
+        "validator": response.headers.get("etag") or response.headers.get("last-modified"),
+    }
+
+
+async def _fetch(
+    client: httpx.AsyncClient,
+    url: str,
+    sink,
+    end: Optional[int],
+    ranges: bool,
+    validator: Optional[str],
+    progress: _Progress,
+    digest
+) -> int:
+    """
+    Télécharge url jusqu'à end (exclusif, None = taille inconnue), avec reprises
+
+    La position n'avance qu'une fois les octets transmis à `sink`
+    (_ExtractSink) : c'est l'offset de la requête Range de reprise. digest
+    est haché au fil de l'eau.
+
+    Returns:
+        Nombre d'octets transmis à sink
+    """
+    failures = 0
+    delivered = 0
+    while True:
+        if end is not None and delivered >= end:
+            return delivered
+        failed_at = position = delivered
+        headers = {"Accept-Encoding": "identity"}
+        if ranges and position > 0:
+            headers["Range"] = f"bytes={position}-{end - 1 if end is not None else ''}"
+            if validator:
+                headers["If-Range"] = validator
+        buffer = bytearray()
+
+        async def flush():
+            nonlocal delivered
+            if buffer:
+                data = bytes(buffer)
+                buffer.clear()
+                await sink.write(data)
+                delivered += len(data)
+
+        try:
+            async with client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 200 and "Range" in headers:
+                    # Range ignoré, ou fichier modifié sur le serveur (If-Range)
+                    logger.warning(f"Reprise refusée par le serveur: {url}")
+                    sink.restart()
+                elif response.status_code in (408, 429) or response.status_code >= 500:
+                    raise _RetryableError(f"HTTP {response.status_code}")
+                elif response.status_code not in (200, 206):
+                    raise DownloadError(f"HTTP {response.status_code} pour {url}")
+
+                async for chunk in response.aiter_raw():
+                    if end is not None:
+                        chunk = chunk[:end - position]
+                    if not chunk:
+                        continue
+                    buffer += chunk
+                    position += len(chunk)
+                    digest.update(chunk)
+                    progress.add(len(chunk))
+                    if len(buffer) >= CHUNK_SIZE:
+                        await flush()
+                    if end is not None and position >= end:
+                        break
+            await flush()
+            if end is not None and position < end:
+                raise _RetryableError(f"flux interrompu à {position}/{end} octets")
+            # Taille inconnue : la fin du flux fait foi
+            return delivered
+        except (httpx.TransportError, _RetryableError) as e:
+            await flush()
+            # Compteur remis à zéro dès qu'une tentative a fait avancer le flux
+            failures = 1 if delivered > failed_at else failures + 1
+            if failures > MAX_RETRIES:
+                raise DownloadError(f"Téléchargement interrompu: {e}") from e
+            if not ranges and delivered:
+                sink.restart()
+            delay = min(2 ** failures, 30)
+            logger.warning(f"Téléchargement interrompu ({e}), reprise à l'octet {delivered} dans {delay}s")
+            await asyncio.sleep(delay)
+        except BaseException:
+            await flush()
+            raise
+
+
+# Blocs en attente entre le téléchargement et le thread d'extraction
+PIPE_CHUNKS = 16
+
+# Répertoire d'extraction temporaire (dans la destination, même système de fichiers)
+STAGING_PREFIX = ".extract-"
+
+
+class _StreamPipe(io.RawIOBase):
+    """
+    Flux en lecture seule alimenté par le téléchargement (file bornée)
+
+    Lu par tarfile en mode flux dans le thread d'extraction ; send() bloque
+    quand la file est pleine (contre-pression sur le téléchargement) et
+    échoue dès que l'extraction a échoué.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.queue: "queue.Queue" = queue.Queue(maxsize=PIPE_CHUNKS)
+        self.error: Optional[BaseException] = None
+        self.finished = threading.Event()
+        self._chunk = b''
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._chunk:
+            if self._eof:
+                return 0
+            item = self.queue.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, BaseException):
+                raise item
+            self._chunk = item
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    def send(self, item):
+        """Transmet un bloc, None (fin) ou une exception (abandon) au lecteur"""
+        while not self.finished.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        if self.error is not None and item is not None and not isinstance(item, BaseException):
+            raise DownloadError(f"Archive invalide: {self.error}")
+        # Lecteur terminé (fin de l'archive tar avant la fin du flux) : bloc ignoré
+
+
+def _extract_stream(pipe: _StreamPipe, staging: Path, counters: Dict[str, int]):
+    """Corps du thread d'extraction : décompresse et extrait au fil de la lecture"""
+    # Filtre 'data' (Python >= 3.11.4) : ni chemins absolus, ni '..', ni liens sortants
+    safe = hasattr(tarfile, "data_filter")
+    root = str(staging.resolve())
+    try:
+        with tarfile.open(fileobj=pipe, mode="r|*") as archive:
+            for member in archive:
+                if safe:
+                    archive.extract(member, staging, filter="data")
+                else:
+                    target = os.path.realpath(staging / member.name)
+                    if not target.startswith(root + os.sep) or member.issym() or member.islnk():
+                        raise DownloadError(f"Entrée d'archive refusée: {member.name}")
+                    archive.extract(member, staging)
+                if member.isfile():
+                    counters["extracted_bytes"] += member.size
+                    counters["files"] += 1
+    except BaseException as e:
+        pipe.error = e
+    finally:
+        pipe.finished.set()
+        # Débloquer un envoi en attente
+        while True:
+            try:
+                pipe.queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+def _install_extracted(staging: Path, dest_dir: Path):
+    """Remplace dans dest_dir les entrées extraites (renommages sur le même système de fichiers)"""
+    for entry in staging.iterdir():
+        target = dest_dir / entry.name
+        if target.is_dir() and not target.is_symlink():
+            shutil.rmtree(target)
+        elif target.exists() or target.is_symlink():
+            target.unlink()
+        os.replace(entry, target)
+    staging.rmdir()
+
+
+class _ExtractSink:
+    """Transmet les octets reçus, dans l'ordre, au thread d'extraction"""
+
+    def __init__(self, pipe: _StreamPipe):
+        self.pipe = pipe
+
+    async def write(self, data: bytes):
+        await asyncio.to_thread(self.pipe.send, data)
+
+    def restart(self):
+        """Reprise impossible (serveur sans Range) : les octets déjà extraits ne se rejouent pas"""
+        raise DownloadError("Reprise refusée par le serveur : extraction en flux interrompue")
+
+
+async def download_and_extract(
+    url: str,
+    dest_dir: Path,
+    checksum: Optional[str] = None,
+    progress: Optional[Callable[[int, int, float, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Télécharge une archive tar (gz, bz2, xz) et l'extrait pendant la réception
+
+    L'archive n'est jamais écrite sur disque : les octets reçus sont
+    décompressés et extraits au fil de l'eau dans un répertoire temporaire
+    de dest_dir, dont le contenu remplace celui de dest_dir une fois la
+    taille et la somme de contrôle vérifiées. Une coupure est reprise par
+    requête Range à l'offset atteint (le flux décompressé continue) ; la
+    reprise après redémarrage du serveur n'est en revanche pas possible.
+
+    Args:
+        url: URL de l'archive (redirections suivies)
+        dest_dir: Répertoire de destination
+        checksum: Somme attendue de l'archive ("sha256:hex", ...)
+        progress: Rappel (reçus, total, débit en octets/s, octets extraits)
+
+    Returns:
+        Dict avec size, checksum, extracted_bytes et files
+
+    Raises:
+        DownloadError: Erreur HTTP, archive invalide, taille ou somme incorrecte
+    """
+    algorithm, expected = _parse_checksum(checksum)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    for stale in dest_dir.glob(STAGING_PREFIX + "*"):
+        shutil.rmtree(stale, ignore_errors=True)  # Extraction interrompue précédente
+    staging = dest_dir / f"{STAGING_PREFIX}{os.getpid()}-{int(time.time())}"
+    staging.mkdir()
+
+    counters = {"extracted_bytes": 0, "files": 0}
+    pipe = _StreamPipe()
+    extractor = threading.Thread(
+        target=_extract_stream, args=(pipe, staging, counters), name="db-extract", daemon=True
+    )
+    try:
+        async with httpx.AsyncClient(follow_redirects=True, timeout=TIMEOUT) as client:
+            info = await _probe(client, url)
+            extractor.start()
+            digest = hashlib.new(algorithm)
+            tracker = _Progress(
+                info["total"], 0,
+                (lambda done, total, speed: progress(done, total, speed, counters["extracted_bytes"]))
+                if progress else None
+            )
+            try:
+                size = await _fetch(
+                    client, info["url"], _ExtractSink(pipe), info["total"] or None,
+                    info["ranges"], info["validator"], tracker, digest
+                )
+            except BaseException as e:
+                await asyncio.to_thread(pipe.send, DownloadError(f"Téléchargement interrompu: {e}"))
+                raise
+            await asyncio.to_thread(pipe.send, None)
+            await asyncio.to_thread(pipe.finished.wait)
+            tracker.report()
+
+        if pipe.error is not None:
+            raise DownloadError(f"Archive invalide: {pipe.error}") from pipe.error
+        if info["total"] and size != info["total"]:
+            raise DownloadError(f"Taille incorrecte: {size} octets reçus, {info['total']} attendus")
+        actual = digest.hexdigest()
+        if expected and actual != expected:
+            raise DownloadError(f"Somme de contrôle incorrecte ({algorithm}): {actual}, attendu {expected}")
+
+        await asyncio.to_thread(_install_extracted, staging, dest_dir)
+    finally:
+        if extractor.is_alive():
+            await asyncio.to_thread(extractor.join, 5)
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return {
+        "size": size,
+        "checksum": f"{algorithm}:{actual}",
+        **counters,
+    }
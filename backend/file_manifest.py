@@ -0,0 +1,164 @@
+"""
+Manifeste des fichiers d'un run (chemin, taille, mtime, type, catégorie)
+
+Remplace le rglob + stat complet de chaque requête /api/jobs/{id}/files :
+le manifeste est construit une fois (fin de job) puis servi depuis la base.
+Pendant l'exécution, ManifestScanner le met à jour de façon incrémentale :
+seuls les répertoires dont le mtime a changé sont relistés. Dans les autres,
+les fichiers récemment modifiés (encore en écriture) sont re-statés à chaque
+scan, les autres tous les IDLE_RESTAT_EVERY scans : ajouter des lignes à un
+fichier ne change pas le mtime de son répertoire (log SPAdes/Prokka qui
+reprend après plusieurs minutes de silence).
+"""
+import os
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Fichiers modifiés depuis moins de ACTIVE_WINDOW secondes : taille relue à chaque scan
+ACTIVE_WINDOW = 120
+
+# Fichiers plus anciens : taille relue un scan sur IDLE_RESTAT_EVERY
+IDLE_RESTAT_EVERY = 6
+
+# Type et icône par extension (onglet Fichiers)
+FILE_TYPES = {
+    **dict.fromkeys(['.tsv', '.csv'], ("data", "📊")),
+    **dict.fromkeys(['.html', '.htm'], ("report", "📑")),
+    **dict.fromkeys(['.log', '.txt'], ("log", "📋")),
+    **dict.fromkeys(['.fasta', '.fna', '.fa', '.faa', '.ffn'], ("sequence", "🧬")),
+    **dict.fromkeys(['.gff', '.gff3', '.gbk', '.gb'], ("annotation", "📝")),
+    **dict.fromkeys(['.json'], ("json", "🔧")),
+    **dict.fromkeys(['.png', '.jpg', '.jpeg', '.svg', '.pdf'], ("image", "🖼️")),
+}
+
+
+def classify_file(relative_path: str) -> Dict[str, str]:
+    """
+    Type, icône, extension et catégorie d'un fichier du run
+
+    La catégorie est le dossier de premier niveau (01_qc, 04_arg_detection...)
+    ou "root" pour les fichiers à la racine du run.
+    """
+    parts = relative_path.split('/')
+    suffix = os.path.splitext(parts[-1])[1].lower()
+    file_type, icon = FILE_TYPES.get(suffix, ("other", "📄"))
+    return {
+        "name": parts[-1],
+        "type": file_type,
+        "icon": icon,
+        "category": parts[0] if len(parts) > 1 else "root",
+        "extension": suffix,
+    }
+
+
+def make_entry(relative_path: str, stat_result: os.stat_result) -> Dict[str, Any]:
+    """Entrée de manifeste pour un fichier"""
+    return {
+        "relative_path": relative_path,
+        "size": stat_result.st_size,
+        "mtime": stat_result.st_mtime,
+        **classify_file(relative_path),
+    }
+
+
+class ManifestScanner:
+    """
+    Scanner incrémental d'un répertoire de run
+
+    Conserve, par répertoire, son mtime, ses fichiers et ses sous-répertoires.
+    scan() renvoie uniquement les entrées ajoutées/modifiées et les chemins
+    supprimés depuis l'appel précédent.
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = Path(output_dir)
+        # chemin relatif du répertoire → (mtime_ns, {nom: entrée}, [sous-répertoires])
+        self._dirs: Dict[str, Tuple[int, Dict[str, Dict[str, Any]], List[str]]] = {}
+        self._known: set = set()
+        self._scans = 0
+
+    def scan(self, full: bool = False) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Met à jour l'état du scanner
+
+        Args:
+            full: Relister et re-stater tous les répertoires (manifeste final)
+
+        Returns:
+            (entrées ajoutées ou modifiées, chemins relatifs supprimés)
+        """
+        changed: List[Dict[str, Any]] = []
+        seen_dirs = set()
+        self._scans += 1
+        restat_idle = self._scans % IDLE_RESTAT_EVERY == 0
+        recent = time.time() - ACTIVE_WINDOW
+        stack = [""]
+
+        while stack:
+            rel_dir = stack.pop()
+            abs_dir = self.output_dir / rel_dir if rel_dir else self.output_dir
+            try:
+                dir_mtime = abs_dir.stat().st_mtime_ns
+            except OSError:
+                continue
+            seen_dirs.add(rel_dir)
+            cached = self._dirs.get(rel_dir)
+
+            if cached and cached[0] == dir_mtime and not full:
+                # Répertoire inchangé : fichiers récents re-statés (tous, un scan sur N)
+                _, files, subdirs = cached
+                for name, entry in files.items():
+                    if entry["mtime"] < recent and not restat_idle:
+                        continue
+                    try:
+                        stat_result = os.stat(abs_dir / name)
+                    except OSError:
+                        continue
+                    if stat_result.st_size != entry["size"] or stat_result.st_mtime != entry["mtime"]:
+                        files[name] = make_entry(entry["relative_path"], stat_result)
+                        changed.append(files[name])
+                stack.extend(subdirs)
+                continue
+
+            old_files = cached[1] if cached else {}
+            files: Dict[str, Dict[str, Any]] = {}
+            subdirs: List[str] = []
+            try:
+                with os.scandir(abs_dir) as it:
+                    for dir_entry in it:
+                        rel_path = f"{rel_dir}/{dir_entry.name}" if rel_dir else dir_entry.name
+                        if dir_entry.is_dir(follow_symlinks=False):
+                            subdirs.append(rel_path)
+                        elif dir_entry.is_file():
+                            stat_result = dir_entry.stat()
+                            previous = old_files.get(dir_entry.name)
+                            if (previous and previous["size"] == stat_result.st_size
+                                    and previous["mtime"] == stat_result.st_mtime):
+                                files[dir_entry.name] = previous
+                            else:
+                                files[dir_entry.name] = make_entry(rel_path, stat_result)
+                                changed.append(files[dir_entry.name])
+            except OSError as e:
+                logger.warning(f"Manifeste: lecture impossible de {abs_dir}: {e}")
+                continue
+
+            self._dirs[rel_dir] = (dir_mtime, files, subdirs)
+            stack.extend(subdirs)
+
+        # Répertoires disparus, puis fichiers disparus depuis le scan précédent
+        for rel_dir in [d for d in self._dirs if d not in seen_dirs]:
+            del self._dirs[rel_dir]
+        current = {e["relative_path"] for e in self.entries()}
+        removed = sorted(self._known - current)
+        self._known = current
+
+        return changed, removed
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Toutes les entrées connues du scanner"""
+        return [e for _, files, _ in self._dirs.values() for e in files.values()]
@@ -0,0 +1,387 @@
+"""
+Accès direct aux contigs (FASTA) et aux annotations (GFF) d'un run
+
+FASTA : index au format samtools .fai (nom, longueur, offset, bases et
+octets par ligne) ; une région est lue par un seul seek, sans charger le
+contig entier. Un .fai à jour à côté du FASTA (samtools faidx) est
+réutilisé ; sinon l'index construit est écrit dans FAI_CACHE_DIR, jamais
+dans le répertoire du run (résultats d'un job terminé inchangés).
+
+GFF : index d'intervalles par contig, les features étant rangés par classe
+de longueur (puissances de 2), chacune triée par début. Une requête de
+région fait, par classe, une recherche dichotomique sur la fenêtre
+[début - longueur max de la classe, fin] puis lit uniquement les lignes des
+features qui chevauchent la région : un feature couvrant tout le contig
+(region, source) ne rend pas la recherche linéaire.
+
+Les index sont gardés en cache (LRU) et reconstruits si le fichier change.
+"""
+import hashlib
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Longueur maximale d'une région de séquence renvoyée (pb)
+MAX_REGION_LENGTH = 5_000_000
+
+# Nombre d'index conservés en mémoire
+INDEX_CACHE_SIZE = 64
+
+# Répertoire des index .fai construits par l'API (hors des répertoires de run)
+FAI_CACHE_DIR = Path(os.environ.get(
+    "FAI_CACHE_DIR", Path(__file__).resolve().parent.parent / "pipeline" / "data" / "fai_cache"
+))
+
+# Attributs GFF renvoyés tels quels (les autres restent dans `attributes`)
+GFF_MAIN_ATTRIBUTES = ('ID', 'Name', 'gene', 'product', 'locus_tag')
+
+
+class RegionError(ValueError):
+    """Région invalide"""
+
+
+class ContigNotFound(RegionError):
+    """Contig absent du FASTA ou du GFF"""
+
+
+@dataclass
+class FastaRecord:
+    """Entrée .fai ; line_bases = 0 si les lignes du contig sont de longueur irrégulière"""
+    name: str
+    length: int
+    offset: int
+    line_bases: int
+    line_width: int
+
+
+@dataclass
+class FastaIndex:
+    size: int
+    mtime_ns: int
+    records: Dict[str, FastaRecord] = field(default_factory=dict)
+
+
+@dataclass
+class GffIndex:
+    size: int
+    mtime_ns: int
+    # contig → classes de longueur : (débuts triés, fins, offsets des lignes, longueur maximale)
+    contigs: Dict[str, List[Tuple[List[int], List[int], List[int], int]]] = field(default_factory=dict)
+
+
+_cache: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cached(kind: str, path: Path, build):
+    """Index en cache (LRU), reconstruit si la taille ou le mtime du fichier a changé"""
+    stat_result = path.stat()
+    key = (kind, str(path))
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+    if index is not None and index.size == stat_result.st_size and index.mtime_ns == stat_result.st_mtime_ns:
+        return index
+
+    index = build(path, stat_result)
+    with _cache_lock:
+        _cache[key] = index
+        _cache.move_to_end(key)
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+# ----------------------------------------------------------------------------
+# FASTA
+# ----------------------------------------------------------------------------
+
+def _read_fai(fai_path: Path) -> Dict[str, FastaRecord]:
+    records = {}
+    with open(fai_path, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 5:
+                continue
+            name, length, offset, line_bases, line_width = fields[:5]
+            records[name] = FastaRecord(name, int(length), int(offset), int(line_bases), int(line_width))
+    return records
+
+
+def _scan_fasta(path: Path) -> Dict[str, FastaRecord]:
+    """Construit l'index .fai en une lecture séquentielle du FASTA"""
+    records: Dict[str, FastaRecord] = {}
+    current: Optional[FastaRecord] = None
+    # Dernière ligne vue plus courte que line_bases : la suivante rend le contig irrégulier
+    short_line = False
+    position = 0
+
+    with open(path, 'rb') as f:
+        for raw in f:
+            line_start = position
+            position += len(raw)
+            if raw.startswith(b'>'):
+                name = raw[1:].split(None, 1)[0].decode('utf-8', errors='replace') if raw[1:].strip() else ''
+                current = FastaRecord(name, 0, position, 0, 0)
+                records[name] = current
+                short_line = False
+                continue
+            if current is None:
+                continue
+            bases = len(raw.rstrip(b'\r\n'))
+            if bases == 0:
+                continue
+            if current.length == 0:
+                current.offset = line_start
+                current.line_bases = bases
+                current.line_width = len(raw)
+            elif current.line_bases and (short_line or bases > current.line_bases
+                                         or (raw.endswith(b'\n')
+                                             and len(raw) - bases != current.line_width - current.line_bases)):
+                current.line_bases = 0  # Irrégulier : lecture séquentielle
+            if current.line_bases and bases < current.line_bases:
+                short_line = True
+            current.length += bases
+    return records
+
+
+def _cached_fai_path(path: Path, stat_result) -> Tuple[str, Path]:
+    """Préfixe (chemin du FASTA) et .fai en cache de la version courante du FASTA"""
+    prefix = hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:20]
+    return prefix, FAI_CACHE_DIR / f"{prefix}_{stat_result.st_size}_{stat_result.st_mtime_ns}.fai"
+
+
+def _write_fai(prefix: str, fai_path: Path, records: Dict[str, FastaRecord]):
+    """Écrit le .fai en cache (renommage atomique) et supprime ceux des versions précédentes"""
+    FAI_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = fai_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, 'w') as f:
+        for r in records.values():
+            f.write(f"{r.name}\t{r.length}\t{r.offset}\t{r.line_bases}\t{r.line_width}\n")
+    os.replace(tmp, fai_path)
+    for old in FAI_CACHE_DIR.glob(f"{prefix}_*.fai"):
+        if old != fai_path:
+            old.unlink(missing_ok=True)
+
+
+def _build_fasta_index(path: Path, stat_result) -> FastaIndex:
+    # .fai fourni avec le FASTA (samtools faidx), sinon celui du cache
+    prefix, cached_fai = _cached_fai_path(path, stat_result)
+    local_fai = path.with_name(path.name + '.fai')
+    for fai_path in (local_fai, cached_fai):
+        try:
+            if fai_path.stat().st_mtime_ns >= stat_result.st_mtime_ns:
+                return FastaIndex(stat_result.st_size, stat_result.st_mtime_ns, _read_fai(fai_path))
+        except OSError:
+            pass
+
+    logger.info(f"🧬 Indexation de {path.name}")
+    records = _scan_fasta(path)
+    regular = all(r.line_bases for r in records.values())
+    if regular:
+        # Compatible samtools faidx ; sans écriture possible, l'index reste en mémoire
+        try:
+            _write_fai(prefix, cached_fai, records)
+        except OSError as e:
+            logger.debug(f"Écriture de {cached_fai} impossible: {e}")
+    return FastaIndex(stat_result.st_size, stat_result.st_mtime_ns, records)
+
+
+def get_fasta_index(path: Path) -> FastaIndex:
+    """Index .fai d'un FASTA (cache, .fai existant ou construit)"""
+    return _cached('fasta', path, _build_fasta_index)
+
+
+def _check_region(length: int, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+    """Région 1-based inclusive ramenée aux bornes du contig → (début 0-based, fin exclusive)"""
+    begin = (start or 1) - 1
+    stop = min(end, length) if end else length
+    if begin < 0 or (end is not None and end < (start or 1)):
+        raise RegionError(f"Région invalide: {start}-{end}")
+    if begin >= length:
+        raise RegionError(f"Début {start} au-delà de la fin du contig ({length} pb)")
+    if stop - begin > MAX_REGION_LENGTH:
+        raise RegionError(f"Région trop longue ({stop - begin} pb, maximum {MAX_REGION_LENGTH})")
+    return begin, stop
+
+
+def fetch_sequence(path: Path, contig: str, start: Optional[int] = None, end: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Lit une région d'un contig (coordonnées 1-based inclusives, défaut: contig entier)
+
+    Returns:
+        Dict avec contig, contig_length, start, end, sequence
+    """
+    index = get_fasta_index(path)
+    record = index.records.get(contig)
+    if record is None:
+        raise ContigNotFound(f"Contig inconnu: {contig}")
+    begin, stop = _check_region(record.length, start, end)
+
+    with open(path, 'rb') as f:
+        if record.line_bases:
+            # Un seul seek : offset = début + lignes complètes + reste
+            line, column = divmod(begin, record.line_bases)
+            f.seek(record.offset + line * record.line_width + column)
+            last_line, last_column = divmod(stop, record.line_bases)
+            span = (last_line - line) * record.line_width + last_column - column
+            data = f.read(span).replace(b'\n', b'').replace(b'\r', b'')
+        else:
+            # Lignes irrégulières : lecture depuis le début du contig, arrêt à la fin de la région
+            f.seek(record.offset)
+            chunks = []
+            position = 0
+            for raw in f:
+                if raw.startswith(b'>'):
+                    break
+                bases = raw.rstrip(b'\r\n')
+                if position + len(bases) > begin:
+                    chunks.append(bases[max(begin - position, 0):stop - position])
+                position += len(bases)
+                if position >= stop:
+                    break
+            data = b''.join(chunks)
+
+    return {
+        "contig": contig,
+        "contig_length": record.length,
+        "start": begin + 1,
+        "end": begin + len(data),
+        "sequence": data.decode('ascii', errors='replace'),
+    }
+
+
+# ----------------------------------------------------------------------------
+# GFF
+# ----------------------------------------------------------------------------
+
+def _build_gff_index(path: Path, stat_result) -> GffIndex:
+    logger.info(f"🧬 Indexation de {path.name}")
+    entries: Dict[str, List[Tuple[int, int, int]]] = {}
+    position = 0
+    with open(path, 'rb') as f:
+        for raw in f:
+            line_start = position
+            position += len(raw)
+            if raw.startswith(b'##FASTA'):
+                break  # Séquences embarquées (Prokka) : fin des annotations
+            if raw.startswith(b'#') or not raw.strip():
+                continue
+            fields = raw.split(b'\t', 5)
+            if len(fields) < 5:
+                continue
+            try:
+                start, end = int(fields[3]), int(fields[4])
+            except ValueError:
+                continue
+            seqid = unquote(fields[0].decode('utf-8', errors='replace'))
+            entries.setdefault(seqid, []).append((start, end, line_start))
+
+    contigs = {}
+    for seqid, items in entries.items():
+        # Classe = nombre de bits de la longueur : longueurs de [2^(k-1), 2^k[
+        classes: Dict[int, List[Tuple[int, int, int]]] = {}
+        for item in items:
+            classes.setdefault(max(item[1] - item[0] + 1, 1).bit_length(), []).append(item)
+        contigs[seqid] = []
+        for _, members in sorted(classes.items()):
+            members.sort()
+            contigs[seqid].append((
+                [s for s, _, _ in members],
+                [e for _, e, _ in members],
+                [o for _, _, o in members],
+                max(e - s for s, e, _ in members) + 1,
+            ))
+    return GffIndex(stat_result.st_size, stat_result.st_mtime_ns, contigs)
+
+
+def get_gff_index(path: Path) -> GffIndex:
+    """Index d'intervalles d'un GFF (cache)"""
+    return _cached('gff', path, _build_gff_index)
+
+
+def _parse_gff_line(line: str) -> Dict[str, Any]:
+    fields = line.rstrip('\r\n').split('\t')
+    fields += [''] * (9 - len(fields))
+    attributes = {}
+    for item in fields[8].split(';'):
+        if '=' in item:
+            key, value = item.split('=', 1)
+            attributes[unquote(key.strip())] = unquote(value.strip())
+    feature = {
+        "contig": unquote(fields[0]),
+        "source": fields[1],
+        "type": fields[2],
+        "start": int(fields[3]),
+        "end": int(fields[4]),
+        "score": None if fields[5] in ('', '.') else fields[5],
+        "strand": fields[6] or '.',
+        "phase": None if fields[7] in ('', '.') else fields[7],
+    }
+    for name in GFF_MAIN_ATTRIBUTES:
+        feature[name.lower()] = attributes.get(name)
+    feature["attributes"] = attributes
+    return feature
+
+
+def query_features(
+    path: Path,
+    contig: str,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    feature_type: Optional[str] = None,
+    limit: int = 1000
+) -> Dict[str, Any]:
+    """
+    Features d'un contig chevauchant [start, end] (1-based inclusif, défaut: tout le contig)
+
+    Returns:
+        Dict avec contig, start, end, total (features chevauchants, tous types)
+        et features (au plus `limit`, triés par début)
+    """
+    index = get_gff_index(path)
+    if contig not in index.contigs:
+        raise ContigNotFound(f"Contig sans annotation: {contig}")
+    classes = index.contigs[contig]
+    region_start = start or 1
+    region_end = end or max(max(ends) for _, ends, _, _ in classes)
+    if region_end < region_start:
+        raise RegionError(f"Région invalide: {start}-{end}")
+
+    # Un feature chevauche si start <= region_end et end >= region_start ;
+    # son début est donc au moins region_start - max_length + 1 (par classe)
+    hits = []
+    for starts, ends, offsets, max_length in classes:
+        first = bisect_left(starts, region_start - max_length + 1)
+        last = bisect_right(starts, region_end)
+        hits.extend((starts[i], offsets[i]) for i in range(first, last) if ends[i] >= region_start)
+    hits.sort()
+
+    features = []
+    with open(path, 'rb') as f:
+        for _, offset in hits:
+            f.seek(offset)
+            feature = _parse_gff_line(f.readline().decode('utf-8', errors='replace'))
+            if feature_type and feature["type"] != feature_type:
+                continue
+            features.append(feature)
+            if len(features) >= limit:
+                break
+
+    return {
+        "contig": contig,
+        "start": region_start,
+        "end": region_end,
+        "total": len(hits),
+        "features": features,
+    }
@@ -0,0 +1,384 @@
+"""
+Validation des fichiers d'entrée (FASTA/FASTQ, gzip ou non) en une passe
+
+SequenceValidator est alimenté bloc par bloc (update) : il est branché sur
+l'écriture des uploads, à côté du SHA-256, et valide le fichier pendant sa
+réception sans relecture. validate_file() applique le même validateur à un
+fichier déjà sur disque (uploads reprenables, chemins locaux).
+
+En une passe : intégrité gzip (décompression incrémentale, mémoire bornée),
+format des enregistrements (en-têtes, lignes '+', longueur des qualités),
+nombre de séquences, bases totales, N50, GC et N. Les longueurs sont
+gardées sous forme d'histogramme : la mémoire ne dépend pas du nombre de
+reads. Un fichier invalide, ou des reads présentés comme un assemblage,
+est refusé au lancement avant de prendre une place dans la file.
+"""
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Taille des blocs lus sur disque et produits par la décompression
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Nombre d'erreurs rapportées (la validation s'arrête à la première)
+MAX_ERRORS = 5
+
+# Identifiants FASTA mémorisés pour détecter les doublons (au-delà : non vérifié)
+MAX_TRACKED_IDS = 1_000_000
+
+# Un FASTA de plus de READS_MIN_RECORDS séquences avec un N50 inférieur à
+# READS_MAX_N50 pb ressemble à des reads, pas à un assemblage
+READS_MIN_RECORDS = 10_000
+READS_MAX_N50 = 1_000
+
+# En dessous, un assemblage bactérien est suspect (avertissement)
+MIN_ASSEMBLY_BASES = 100_000
+
+# Proportion de N au-delà de laquelle un avertissement est émis (%)
+MAX_N_PERCENT = 10.0
+
+# Caractères acceptés dans une séquence (IUPAC, gaps, '*')
+_SEQUENCE_CHARS = b"ACGTUNRYSWKMBDHVacgtunryswkmbdhv-.*"
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+class SequenceValidator:
+    """
+    Validateur incrémental d'un fichier FASTA/FASTQ (compressé ou non)
+
+    Usage : update(bloc) pour chaque bloc reçu, puis result(). Après la
+    première erreur, les blocs suivants sont ignorés.
+    """
+
+    def __init__(self):
+        self.format: Optional[str] = None
+        self.compressed: Optional[bool] = None
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self._head = b''
+        self._inflater = None
+        self._pending = b''
+        self._line_number = 0
+        # Enregistrement en cours
+        self._record_length = -1
+        self._records = 0
+        self._empty_records = 0
+        self._lengths: Counter = Counter()
+        self._gc = 0
+        self._n = 0
+        self._ids: Optional[set] = set()
+        self._duplicate_ids = 0
+        # FASTQ : position dans l'enregistrement de 4 lignes
+        self._fastq_line = 0
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.errors)
+
+    def _error(self, message: str):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(message)
+
+    # ------------------------------------------------------------------------
+    # Décompression
+    # ------------------------------------------------------------------------
+
+    def update(self, data: bytes):
+        """Ajoute un bloc d'octets bruts (tels que reçus ou lus sur disque)"""
+        if self.failed or not data:
+            return
+        if self.compressed is None:
+            # Deux octets suffisent à reconnaître un gzip
+            self._head += data
+            if len(self._head) < 2:
+                return
+            data, self._head = self._head, b''
+            self.compressed = data.startswith(_GZIP_MAGIC)
+        if self.compressed:
+            self._inflate(data)
+        else:
+            self._parse(data)
+
+    def _inflate(self, data: bytes):
+        try:
+            while data and not self.failed:
+                if self._inflater is None or self._inflater.eof:
+                    if self._inflater is not None and not data.strip(b'\0'):
+                        return  # Bourrage de zéros après le dernier membre
+                    # gzip multi-membres (bgzip, concaténation) : un décompresseur par membre
+                    self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                # Sortie bornée : un bloc très compressible ne gonfle pas la mémoire
+                out = self._inflater.decompress(data, READ_CHUNK_SIZE)
+                if self._inflater.eof:
+                    data = self._inflater.unused_data
+                else:
+                    data = self._inflater.unconsumed_tail
+                if out:
+                    self._parse(out)
+        except zlib.error as e:
+            self._error(f"Archive gzip corrompue ({e})")
+
+    # ------------------------------------------------------------------------
+    # Lecture des enregistrements
+    # ------------------------------------------------------------------------
+
+    def _parse(self, data: bytes):
+        if b'\r' in data:
+            data = data.replace(b'\r', b'')
+        lines = (self._pending + data).split(b'\n')
+        self._pending = lines.pop()
+        self._parse_lines(lines)
+
+    def _parse_lines(self, lines: List[bytes]):
+        if self.format is None:
+            for line in lines:
+                if line.strip():
+                    if line.startswith(b'>'):
+                        self.format = "fasta"
+                    elif line.startswith(b'@'):
+                        self.format = "fastq"
+                    else:
+                        self._error("Format non reconnu : ni FASTA ('>') ni FASTQ ('@')")
+                        return
+                    break
+            if self.format is None:
+                self._line_number += len(lines)
+                return
+        if self.format == "fasta":
+            self._parse_fasta(lines)
+        else:
+            self._parse_fastq(lines)
+
+    def _end_record(self):
+        if self._record_length < 0:
+            return
+        self._records += 1
+        if self._record_length == 0:
+            self._empty_records += 1
+        else:
+            self._lengths[self._record_length] += 1
+
+    def _count_bases(self, sequences: List[bytes]):
+        joined = b''.join(sequences)
+        if not joined:
+            return
+        invalid = joined.translate(None, _SEQUENCE_CHARS)
+        if invalid:
+            self._error(
+                f"Caractères invalides dans les séquences : {invalid[:10].decode('latin-1')!r}"
+            )
+        self._gc += joined.count(b'G') + joined.count(b'C') + joined.count(b'g') + joined.count(b'c')
+        self._n += joined.count(b'N') + joined.count(b'n')
+
+    def _parse_fasta(self, lines: List[bytes]):
+        sequences = []
+        for line in lines:
+            self._line_number += 1
+            if line.startswith(b'>'):
+                self._end_record()
+                self._record_length = 0
+                if self._ids is not None:
+                    parts = line[1:].split(None, 1)
+                    record_id = parts[0] if parts else b''
+                    if record_id in self._ids:
+                        self._duplicate_ids += 1
+                    elif len(self._ids) < MAX_TRACKED_IDS:
+                        self._ids.add(record_id)
+                    else:
+                        self._ids = None
+                continue
+            line = line.strip()
+            if not line:
+                continue
+            if self._record_length < 0:
+                self._error(f"Ligne {self._line_number} : séquence avant le premier en-tête '>'")
+                return
+            self._record_length += len(line)
+            sequences.append(line)
+        self._count_bases(sequences)
+
+    def _fastq_step(self, line: bytes, sequences: List[bytes]) -> bool:
+        """Vérifie une ligne FASTQ selon sa position dans l'enregistrement ; False si erreur"""
+        self._line_number += 1
+        position = self._fastq_line
+        if position == 0:
+            if not line:
+                return True  # Lignes vides entre enregistrements ou en fin de fichier
+            if not line.startswith(b'@'):
+                self._error(f"Ligne {self._line_number} : en-tête FASTQ '@' attendu")
+                return False
+        elif position == 1:
+            self._record_length = len(line)
+            sequences.append(line)
+        elif position == 2:
+            if not line.startswith(b'+'):
+                self._error(f"Ligne {self._line_number} : séparateur '+' attendu (qualités absentes ?)")
+                return False
+        else:
+            if len(line) != self._record_length:
+                self._error(f"Ligne {self._line_number} : {len(line)} qualités pour {self._record_length} bases")
+                return False
+            self._end_record()
+            self._record_length = -1
+        self._fastq_line = (position + 1) % 4
+        return True
+
+    def _check_fastq_group(self, group: List[bytes]) -> bool:
+        """Vérifie des enregistrements complets d'un coup (tranches de 4 lignes)"""
+        if b'' in group:
+            return False
+        headers = b'\n'.join(group[0::4])
+        separators = b'\n'.join(group[2::4])
+        count = len(group) // 4
+        return (
+            headers.startswith(b'@') and headers.count(b'\n@') == count - 1
+            and separators.startswith(b'+') and separators.count(b'\n+') == count - 1
+            and list(map(len, group[1::4])) == list(map(len, group[3::4]))
+        )
+
+    def _parse_fastq(self, lines: List[bytes]):
+        sequences: List[bytes] = []
+        # Fin de l'enregistrement commencé dans le bloc précédent
+        first = 0
+        while self._fastq_line and first < len(lines):
+            if not self._fastq_step(lines[first], sequences):
+                return
+            first += 1
+
+        # Enregistrements complets : vérification vectorisée (cas courant),
+        # ligne à ligne sinon pour situer l'erreur
+        last = first + (len(lines) - first) // 4 * 4
+        group = lines[first:last]
+        if group and self._check_fastq_group(group):
+            reads = group[1::4]
+            self._line_number += len(group)
+            self._records += len(reads)
+            self._lengths.update(map(len, reads))
+            self._empty_records += self._lengths.pop(0, 0)
+            sequences.extend(reads)
+            first = last
+
+        for line in lines[first:]:
+            if not self._fastq_step(line, sequences):
+                return
+        self._count_bases(sequences)
+
+    # ------------------------------------------------------------------------
+    # Résultat
+    # ------------------------------------------------------------------------
+
+    def _finish(self):
+        if self._head:
+            # Fichier de moins de deux octets
+            self.compressed = False
+            self._parse(self._head)
+            self._head = b''
+        if self.compressed and self._inflater is not None and not self._inflater.eof and not self.failed:
+            self._error("Archive gzip tronquée (fin de flux manquante)")
+        if self._pending and not self.failed:
+            lines, self._pending = [self._pending], b''
+            self._parse_lines(lines)
+        if self.failed:
+            return
+        if self.format == "fastq" and self._fastq_line != 0:
+            self._error("Dernier enregistrement FASTQ incomplet (fichier tronqué ?)")
+            return
+        self._end_record()
+        self._record_length = -1
+        if self._records == 0:
+            self._error("Aucune séquence dans le fichier")
+        elif not self._lengths:
+            self._error("Séquences vides (aucune base)")
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Termine la validation et renvoie les statistiques
+
+        Returns:
+            Dict avec valid, errors, warnings, format ("fasta"/"fastq"),
+            compressed, kind ("assembly"/"reads"), records, total_bases,
+            min_length, max_length, mean_length, n50, gc_percent, n_percent
+        """
+        self._finish()
+        total_bases = sum(length * count for length, count in self._lengths.items())
+        n50 = _n50(self._lengths, total_bases)
+
+        kind = None
+        if self.format == "fastq":
+            kind = "reads"
+        elif self.format == "fasta" and self._records:
+            looks_like_reads = self._records > READS_MIN_RECORDS and n50 < READS_MAX_N50
+            kind = "reads" if looks_like_reads else "assembly"
+
+        warnings = list(self.warnings)
+        if not self.failed:
+            if self._empty_records:
+                warnings.append(f"{self._empty_records} séquence(s) vide(s)")
+            if self._duplicate_ids:
+                warnings.append(f"{self._duplicate_ids} identifiant(s) de séquence en double")
+            if kind == "assembly" and total_bases < MIN_ASSEMBLY_BASES:
+                warnings.append(f"Assemblage très court ({total_bases} pb)")
+            if total_bases and self._n * 100 / total_bases > MAX_N_PERCENT:
+                warnings.append(f"{self._n * 100 / total_bases:.1f} % de bases N")
+
+        return {
+            "valid": not self.failed,
+            "errors": list(self.errors),
+            "warnings": warnings,
+            "format": self.format,
+            "compressed": bool(self.compressed),
+            "kind": kind,
+            "records": self._records,
+            "total_bases": total_bases,
+            "min_length": min(self._lengths) if self._lengths else 0,
+            "max_length": max(self._lengths) if self._lengths else 0,
+            "mean_length": round(total_bases / self._records, 1) if self._records else 0,
+            "n50": n50,
+            "gc_percent": round(self._gc * 100 / total_bases, 2) if total_bases else None,
+            "n_percent": round(self._n * 100 / total_bases, 2) if total_bases else None,
+        }
+
+
+def _n50(lengths: Counter, total_bases: int) -> int:
+    """N50 à partir de l'histogramme des longueurs"""
+    cumulative = 0
+    for length in sorted(lengths, reverse=True):
+        cumulative += length * lengths[length]
+        if cumulative * 2 >= total_bases:
+            return length
+    return 0
+
+
+def validate_file(path: Path) -> Dict[str, Any]:
+    """Valide un fichier sur disque (une lecture séquentielle par blocs)"""
+    validator = SequenceValidator()
+    with open(path, 'rb') as f:
+        while not validator.failed:
+            block = f.read(READ_CHUNK_SIZE)
+            if not block:
+                break
+            validator.update(block)
+    return validator.result()
+
+
+def launch_errors(stats: Dict[str, Any]) -> List[str]:
+    """
+    Raisons de refuser un fichier local comme entrée du pipeline
+
+    Le pipeline n'accepte en fichier local qu'un assemblage FASTA : des reads
+    (FASTQ ou FASTA de reads courts) échoueraient à l'annotation.
+    """
+    if not stats["valid"]:
+        return stats["errors"]
+    if stats["format"] != "fasta":
+        return ["Le fichier local doit être un assemblage FASTA (reads FASTQ non supportés)"]
+    if stats["compressed"]:
+        return ["Le fichier local doit être un FASTA non compressé"]
+    if stats["kind"] != "assembly":
+        return [
+            f"Le fichier ressemble à des reads ({stats['records']} séquences, N50 {stats['n50']} pb), "
+            "pas à un assemblage"
+        ]
+    return []
@@ -0,0 +1,173 @@
+"""
+Index de lignes creux pour afficher des fenêtres de fichiers texte volumineux
+
+Un point de contrôle (numéro de ligne, offset) est enregistré à chaque début
+de ligne suivant un bloc de BLOCK_SIZE octets : construire l'index ne coûte
+qu'un comptage de '\\n' par bloc, et lire n'importe quelle fenêtre revient à
+un seek plus au plus un bloc de lignes à sauter, quelle que soit la taille
+du fichier (mémoire constante). Les index sont gardés en cache (LRU) et
+prolongés sans relecture quand un fichier en cours d'écriture grandit (logs).
+"""
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+# Taille des blocs lus pour construire l'index (un point de contrôle par bloc)
+BLOCK_SIZE = 256 * 1024
+
+# Longueur maximale renvoyée pour une ligne (le reste est tronqué)
+MAX_LINE_BYTES = 16 * 1024
+
+# Nombre d'index conservés en mémoire
+INDEX_CACHE_SIZE = 256
+
+
+@dataclass
+class LineIndex:
+    """Points de contrôle (ligne, offset) d'un fichier, lignes numérotées à partir de 0"""
+    size: int = 0
+    mtime_ns: int = 0
+    checkpoints: List[Tuple[int, int]] = field(default_factory=lambda: [(0, 0)])
+    # Nombre de '\n' dans les `size` premiers octets
+    newlines: int = 0
+    ends_with_newline: bool = True
+
+    @property
+    def total_lines(self) -> int:
+        if self.size == 0:
+            return 0
+        return self.newlines + (0 if self.ends_with_newline else 1)
+
+    def locate(self, line: int) -> Tuple[int, int]:
+        """Point de contrôle (ligne, offset) le plus proche avant `line`"""
+        position = bisect_right(self.checkpoints, (line, float('inf'))) - 1
+        return self.checkpoints[max(position, 0)]
+
+
+_cache: "OrderedDict[str, LineIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _extend_index(path: Path, index: LineIndex, size: int, mtime_ns: int) -> LineIndex:
+    """Indexe les octets [dernier point de contrôle, size) du fichier"""
+    line, offset = index.checkpoints[-1]
+    newlines = line
+    last_byte = b''
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        position = offset
+        while position < size:
+            block = f.read(min(BLOCK_SIZE, size - position))
+            if not block:
+                break
+            newlines += block.count(b'\n')
+            position += len(block)
+            last_byte = block[-1:]
+            # Point de contrôle au début de la première ligne après ce bloc
+            last_newline = block.rfind(b'\n')
+            if last_newline != -1 and position < size:
+                checkpoint = (newlines, position - len(block) + last_newline + 1)
+                if checkpoint[1] > index.checkpoints[-1][1]:
+                    index.checkpoints.append(checkpoint)
+
+    index.newlines = newlines
+    if last_byte:
+        index.ends_with_newline = last_byte == b'\n'
+    index.size = size
+    index.mtime_ns = mtime_ns
+    return index
+
+
+def get_line_index(path: Path) -> LineIndex:
+    """
+    Index de lignes d'un fichier (cache LRU, prolongé si le fichier a grandi)
+
+    Un fichier qui a rétréci est réindexé entièrement ; un fichier qui a
+    grandi est supposé modifié par ajout (logs, sorties en cours d'écriture).
+    """
+    stat_result = path.stat()
+    key = str(path)
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+
+    if index is not None and index.size == stat_result.st_size and index.mtime_ns == stat_result.st_mtime_ns:
+        return index
+
+    if index is None or stat_result.st_size < index.size:
+        index = LineIndex()
+    else:
+        # Copie : les lecteurs concurrents gardent un index cohérent
+        index = LineIndex(
+            size=index.size,
+            mtime_ns=index.mtime_ns,
+            checkpoints=list(index.checkpoints),
+            newlines=index.newlines,
+            ends_with_newline=index.ends_with_newline
+        )
+    index = _extend_index(path, index, stat_result.st_size, stat_result.st_mtime_ns)
+
+    with _cache_lock:
+        _cache[key] = index
+        _cache.move_to_end(key)
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def _read_line(f, limit: int) -> Tuple[bytes, bool]:
+    """Lit une ligne (sans '\\n') en tronquant à `limit` octets ; renvoie (ligne, tronquée)"""
+    data = f.readline(limit + 1)
+    if data.endswith(b'\n'):
+        return data[:-1], False
+    if len(data) <= limit:
+        return data, False  # Dernière ligne sans '\n'
+    # Ligne trop longue : sauter le reste par blocs bornés
+    while True:
+        rest = f.readline(BLOCK_SIZE)
+        if not rest or rest.endswith(b'\n'):
+            break
+    return data[:limit], True
+
+
+def read_lines(path: Path, start: int = 0, count: int = 500) -> Dict[str, Any]:
+    """
+    Lit une fenêtre de lignes [start, start + count) (lignes numérotées à partir de 0)
+
+    Args:
+        path: Fichier texte
+        start: Première ligne (négatif = compté depuis la fin, -count = tail)
+        count: Nombre de lignes
+
+    Returns:
+        Dict avec lines (liste de str), start, total_lines, truncated_lines
+    """
+    index = get_line_index(path)
+    total = index.total_lines
+    if start < 0:
+        start = max(total + start, 0)
+    start = min(start, total)
+
+    lines: List[str] = []
+    truncated_lines = 0
+    checkpoint_line, offset = index.locate(start)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        # Sauter les lignes entre le point de contrôle et `start` (au plus ~un bloc)
+        for _ in range(start - checkpoint_line):
+            _read_line(f, BLOCK_SIZE)
+        while len(lines) < count and start + len(lines) < total:
+            data, truncated = _read_line(f, MAX_LINE_BYTES)
+            truncated_lines += truncated
+            lines.append(data.decode('utf-8', errors='replace').rstrip('\r'))
+
+    return {
+        "lines": lines,
+        "start": start,
+        "total_lines": total,
+        "truncated_lines": truncated_lines,
+    }
@@ -1,18 +1,24 @@
 """
 API FastAPI pour le Pipeline ARG
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File, status
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.requests import ClientDisconnect
+from contextlib import aclosing, asynccontextmanager
 import logging
 from pathlib import Path
 from datetime import datetime
 from typing import List, Optional
+import asyncio
 import os
 import shutil
+import signal
 import subprocess
-import threading
 import time
+import base64
+import hashlib
+import json
 import re as re_module
 
 from models import (
@@ -21,16 +27,38 @@ from models import (
     JobStatusResponse,
     JobListResponse,
     JobListItem,
+    JobEvent,
+    JobEventListResponse,
     AnalysisResults,
     DeduplicatedGene,
     DeduplicationStats,
+    GenePage,
+    TablePage,
     ErrorResponse,
+    GeneSampleHit,
+    GeneSamplesResponse,
+    IndexedGene,
+    IndexedGeneListResponse,
     JobStatus,
     InputType
 )
-from database import db
+from database import db, events, GENE_SORT_COLUMNS
 from pipeline_launcher import PipelineLauncher
 from output_parser import OutputParser
+from file_manifest import ManifestScanner
+from line_index import read_lines
+from run_archive import ARCHIVE_FORMATS, stream_archive
+from table_query import TABLE_EXTENSIONS, TableQueryError, open_table, parse_filter, query_table
+from uploads import (
+    MAX_UPLOAD_SIZE, ContentStore, ResumableUploadStore, UploadError,
+    iter_upload_file, safe_upload_filename, save_stream
+)
+from genome_index import ContigNotFound, RegionError, fetch_sequence, query_features
+from input_validation import SequenceValidator, launch_errors, validate_file
+from db_manifest import DatabaseManifest
+from db_snapshots import SnapshotStore
+from downloader import download_and_extract
+from db_tasks import DownloadTaskManager
 
 # Configuration logging
 logging.basicConfig(
@@ -57,6 +85,18 @@ launcher = PipelineLauncher(
     work_dir=str(PIPELINE_DIR)
 )
 
+# Tâches de fond lancées par l'API : l'event loop ne garde qu'une référence
+# faible sur une tâche, elles sont donc conservées ici jusqu'à leur fin
+_background_tasks: set = set()
+
+
+def _spawn(coro) -> asyncio.Task:
+    """Lance une tâche de fond référencée jusqu'à sa fin (annulée à l'arrêt de l'API)"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
 
 # Lifespan context manager pour startup/shutdown
 @asynccontextmanager
@@ -68,21 +108,37 @@ async def lifespan(app: FastAPI):
     logger.info("=" * 60)
     logger.info(f"Pipeline script: {PIPELINE_SCRIPT}")
     logger.info(f"Work directory: {PIPELINE_DIR}")
-    logger.info(f"Database: {BACKEND_DIR / 'jobs.db'}")
+    logger.info(f"Database: {db.db_path}")
 
     # Initialiser la base de données
     await db.initialize()
+    events.start()
+    await download_tasks.start()
     logger.info("✅ Base de données initialisée")
 
     # Nettoyer les jobs zombies (optionnel)
     await db.cleanup_stale_jobs(max_age_hours=24)
     logger.info("✅ Nettoyage jobs zombies effectué")
 
+    # Bases de référence : passage au format versionné, versions orphelines
+    await asyncio.to_thread(_prepare_db_snapshots)
+
+    # Compléter l'index des gènes pour les jobs terminés non encore indexés
+    _spawn(_backfill_gene_index())
+    _spawn(_backfill_file_manifests())
+    _spawn(_collect_upload_garbage())
+
     logger.info("✅ API prête à recevoir des requêtes")
 
     yield
 
     # Shutdown
+    for task in list(_background_tasks):
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await download_tasks.stop()
+    await events.stop()
+    await db.close()
     logger.info("🛑 Arrêt de l'API")
 
 
@@ -113,11 +169,367 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "DELETE"],
-    allow_headers=["Content-Type", "Cache-Control", "Pragma", "Expires"],
+    allow_methods=["GET", "POST", "DELETE", "PATCH", "HEAD"],
+    allow_headers=[
+        "Content-Type", "Cache-Control", "Pragma", "Expires", "If-None-Match",
+        "Upload-Offset", "Upload-Length", "Upload-Metadata", "Tus-Resumable"
+    ],
+    expose_headers=["ETag", "Location", "Upload-Offset", "Upload-Length", "Tus-Resumable"],
+)
+
+
+# Routes servant des fichiers bruts (déjà compressés ou binaires) ou un flux SSE : pas de gzip
+_RAW_FILE_ROUTE = re_module.compile(
+    r"^/api/(jobs/[^/]+/files/(download|serve)/|jobs/[^/]+/archive$|archive$|databases/events$)"
+)
+
+
+class JSONGZipMiddleware:
+    """Compresse en gzip les réponses de l'API, sauf les fichiers servis tels quels et les flux SSE"""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.gzip_app = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not _RAW_FILE_ROUTE.match(scope["path"]):
+            await self.gzip_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+app.add_middleware(JSONGZipMiddleware, minimum_size=1024)
+
+
+# ============================================================================
+# CACHE HTTP (ETag / requêtes conditionnelles)
+# ============================================================================
+
+# Ressources d'un job COMPLETED : immuables tant que le job existe
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Job en cours : toujours revalider
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    """Construit un ETag (fort, ou faible avec weak=True) à partir des éléments qui déterminent la ressource"""
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+    return f'{"W/" if weak else ""}"{digest[:32]}"'
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """
+    ETag fort d'un fichier (inode, taille, mtime en ns)
+
+    Réservé aux routes exclues du gzip (_RAW_FILE_ROUTE) : les octets
+    envoyés sont ceux du fichier, l'ETag peut donc être fort (If-Range).
+    """
+    return make_etag(stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Vérifie si l'en-tête If-None-Match du client correspond à l'ETag (comparaison faible)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """Réponse 304 Not Modified"""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": cache_control}
+    )
+
+
+def job_etag(job: dict, *extra) -> Optional[str]:
+    """
+    ETag d'une ressource dérivée d'un job terminé (None si le job n'est pas terminé)
+
+    ETag faible : la réponse JSON passe par JSONGZipMiddleware, et ses
+    versions gzip et identité (octets différents) partagent le même ETag.
+    """
+    if job.get('status') != JobStatus.COMPLETED.value:
+        return None
+    return make_etag(app.version, job['id'], job.get('completed_at'), *extra, weak=True)
+
+
+# ============================================================================
+# INDEX DES GÈNES (alimentation)
+# ============================================================================
+
+def _parse_deduplicated_genes(output_dir: str) -> list:
+    """Parse les gènes dédupliqués d'un run (appel bloquant, exécuté hors event loop)"""
+    parser = OutputParser(output_dir)
+    return parser.parse_all_arg_deduplicated()['genes']
+
+
+# Délai avant qu'une requête retente une indexation de gènes en échec (secondes)
+GENE_INDEX_RETRY_SECONDS = float(os.environ.get("GENE_INDEX_RETRY_SECONDS", "300"))
+
+
+async def _index_job_genes(job: dict) -> int:
+    """
+    Indexe les gènes d'un job terminé dans l'index inversé gène → échantillons
+
+    Un échec (sorties absentes ou illisibles) est enregistré : les requêtes
+    suivantes le signalent sans relancer l'indexation, retentée au prochain
+    démarrage ou dès que _gene_index_retry_due l'autorise.
+
+    Returns:
+        int: Nombre de gènes indexés (0 si sorties absentes ou erreur)
+    """
+    output_dir = job.get('output_dir')
+    if not output_dir or not Path(output_dir).exists():
+        logger.warning(f"Indexation gènes impossible pour le job {job['id']}: sorties absentes")
+        await db.record_gene_index_failure(job['id'], "Répertoire de sortie introuvable")
+        return 0
+
+    try:
+        genes = await asyncio.to_thread(_parse_deduplicated_genes, output_dir)
+        count = await db.index_job_genes(
+            job_id=job['id'],
+            sample_id=job['sample_id'],
+            completed_at=job.get('completed_at'),
+            genes=genes
+        )
+        logger.info(f"🧬 Index gènes: {count} gènes indexés pour le job {job['id']}")
+        return count
+    except Exception as e:
+        logger.warning(f"Indexation gènes impossible pour le job {job['id']}: {e}")
+        await db.record_gene_index_failure(job['id'], str(e) or type(e).__name__)
+        return 0
+
+
+def _gene_index_retry_due(job: dict, failure: dict) -> bool:
+    """
+    Une indexation en échec peut être retentée : échec plus ancien que
+    GENE_INDEX_RETRY_SECONDS, ou répertoire de sortie modifié depuis
+    (sorties restaurées, run relancé)
+    """
+    failed_at = datetime.fromisoformat(str(failure['failed_at']))
+    if (datetime.now() - failed_at).total_seconds() >= GENE_INDEX_RETRY_SECONDS:
+        return True
+    output_dir = job.get('output_dir')
+    try:
+        return bool(output_dir) and datetime.fromtimestamp(Path(output_dir).stat().st_mtime) > failed_at
+    except OSError:
+        return False
+
+
+async def _backfill_gene_index():
+    """Indexe les jobs terminés absents de l'index (démarrage, migration)"""
+    try:
+        jobs = await db.get_unindexed_completed_jobs()
+        if not jobs:
+            return
+        logger.info(f"🧬 Index gènes: {len(jobs)} job(s) terminé(s) à indexer")
+        for job in jobs:
+            await _index_job_genes(job)
+    except Exception as e:
+        logger.error(f"❌ Erreur construction index gènes: {e}")
+
+
+# ============================================================================
+# MANIFESTE DES FICHIERS
+# ============================================================================
+
+# Âge maximal du manifeste d'un job en cours avant rafraîchissement (secondes)
+MANIFEST_REFRESH_SECONDS = float(os.environ.get("MANIFEST_REFRESH_SECONDS", "5"))
+
+# Scanners incrémentaux des jobs en cours (job_id → ManifestScanner)
+_manifest_scanners: dict = {}
+
+# Un rafraîchissement à la fois par job (surveillance, listing, fin de job) :
+# scan() modifie l'état du scanner
+_manifest_locks: dict = {}
+
+
+async def _refresh_file_manifest(job_id: str, output_dir: Optional[str], complete: bool = False):
+    """
+    Met à jour le manifeste des fichiers d'un run
+
+    Incrémental pendant l'exécution (seules les entrées modifiées sont
+    écrites) ; complete=True fait un dernier scan complet et fige le manifeste.
+    Un rafraîchissement intermédiaire arrivé après le scan final est ignoré.
+    """
+    if not output_dir or not Path(output_dir).exists():
+        return
+    lock = _manifest_locks.setdefault(job_id, asyncio.Lock())
+    async with lock:
+        try:
+            scanner = _manifest_scanners.get(job_id)
+            replace = scanner is None
+            if scanner is None:
+                if not complete:
+                    summary = await db.get_file_manifest_summary(job_id)
+                    if summary and summary['complete']:
+                        return
+                scanner = _manifest_scanners[job_id] = ManifestScanner(output_dir)
+            changed, removed = await asyncio.to_thread(scanner.scan, complete)
+            if changed or removed or replace or complete:
+                await db.save_job_files(job_id, changed, removed, replace=replace, complete=complete)
+        except Exception as e:
+            logger.warning(f"Manifeste fichiers impossible pour le job {job_id}: {e}")
+        finally:
+            if complete:
+                _manifest_scanners.pop(job_id, None)
+                _manifest_locks.pop(job_id, None)
+
+
+async def _backfill_file_manifests():
+    """Construit le manifeste des jobs terminés qui n'en ont pas (démarrage, migration)"""
+    try:
+        jobs = await db.get_jobs_without_file_manifest()
+        if not jobs:
+            return
+        logger.info(f"📁 Manifeste fichiers: {len(jobs)} job(s) terminé(s) à indexer")
+        for job in jobs:
+            await _refresh_file_manifest(job['id'], job['output_dir'], complete=True)
+    except Exception as e:
+        logger.error(f"❌ Erreur construction manifestes fichiers: {e}")
+
+
+# ============================================================================
+# NUMÉROS DE RUN
+# ============================================================================
+
+async def _allocate_run_number(sample_id: str) -> int:
+    """
+    Réserve le prochain numéro de run d'un échantillon
+
+    Le compteur en base garantit l'unicité entre lancements concurrents ;
+    un seul stat par numéro suffit ensuite à sauter les dossiers créés hors
+    API (pipeline lancé en ligne de commande).
+    """
+    while True:
+        run_number = await db.allocate_run_number(sample_id)
+        if not launcher.get_output_dir(sample_id, run_number).exists():
+            return run_number
+        logger.info(f"Run {sample_id}_{run_number} déjà présent dans outputs/, numéro suivant")
+
+
+# ============================================================================
+# HISTORIQUE DES ÉVÉNEMENTS (modules du pipeline)
+# ============================================================================
+
+# Intervalle de lecture du log pendant l'exécution (secondes)
+MODULE_WATCH_INTERVAL = float(os.environ.get("MODULE_WATCH_INTERVAL", "5"))
+
+# Bannières de modules écrites par log_message() dans le pipeline bash:
+#   [2026-01-30 14:30:00] [INFO] MODULE 3 : ANNOTATION DU GÉNOME
+#   [2026-01-30 14:52:10] [SUCCESS] MODULE 3 TERMINÉ
+#   [2026-01-30 14:53:02] [INFO] MODULE 3.3 : TYPAGE MLST (Multi-Locus Sequence Typing)
+#   [2026-01-30 14:30:00] [WARN] MODULE 1 : CONTRÔLE QUALITÉ (QC) - IGNORÉ (entrée FASTA assemblée)
+_MODULE_LINE = re_module.compile(
+    r'^\[(?P<ts>[^\]]+)\] \[(?P<level>\w+)\] MODULE (?P<num>\d+(?:\.\d+)?)'
+    r'(?: : (?P<name>.+?))?(?P<end> TERMINÉ)?\s*$'
 )
 
 
+def _job_duration(job: Optional[dict], completed_at: datetime) -> Optional[float]:
+    """Durée d'exécution d'un job en secondes (None si started_at inconnu)"""
+    if not job or not job.get('started_at'):
+        return None
+    try:
+        started_at = datetime.fromisoformat(str(job['started_at']))
+    except ValueError:
+        return None
+    return round((completed_at - started_at).total_seconds(), 1)
+
+
+def _scan_module_events(job_id: str, lines: List[str], started: dict):
+    """
+    Émet les événements module_start / module_end / module_skipped d'un bloc de log
+
+    Args:
+        started: module → (nom, horodatage de début), partagé entre appels
+    """
+    for line in lines:
+        match = _MODULE_LINE.match(line)
+        if not match:
+            continue
+        try:
+            ts = datetime.strptime(match['ts'], '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            ts = datetime.now()
+        module = match['num']
+        name = (match['name'] or '').strip()
+
+        if match['end']:
+            module_name, start_ts = started.pop(module, (None, None))
+            duration = round((ts - start_ts).total_seconds(), 1) if start_ts else None
+            events.emit(
+                job_id, "module_end", module=module, status="SUCCESS",
+                duration_s=duration, created_at=ts, name=module_name
+            )
+        elif 'IGNORÉ' in name:
+            events.emit(
+                job_id, "module_skipped", module=module, status="SKIPPED",
+                created_at=ts, name=name.split(' - IGNORÉ')[0]
+            )
+        elif name:
+            started[module] = (name, ts)
+            events.emit(
+                job_id, "module_start", module=module, status="RUNNING",
+                created_at=ts, name=name
+            )
+
+
+async def _watch_job_modules(job_id: str, sample_id: str, run_number: int, done: asyncio.Event):
+    """
+    Suit le log d'un job en cours et historise les transitions de modules
+
+    Lecture incrémentale (offset conservé) jusqu'à la fin du processus,
+    puis une dernière passe pour les lignes écrites juste avant la sortie.
+    Le manifeste des fichiers est rafraîchi au même rythme.
+    """
+    offset = 0
+    partial = ""
+    started: dict = {}
+
+    def read_new(path: Path) -> tuple:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            f.seek(offset)
+            chunk = f.read()
+            return chunk, f.tell()
+
+    try:
+        while True:
+            finished = done.is_set()
+            log_file = launcher.get_log_file(sample_id, run_number)
+            if log_file and log_file.exists():
+                chunk, offset = await asyncio.to_thread(read_new, log_file)
+                lines = (partial + chunk).split('\n')
+                partial = lines.pop()
+                _scan_module_events(job_id, lines, started)
+            if not finished:
+                await _refresh_file_manifest(
+                    job_id, str(launcher.get_output_dir(sample_id, run_number))
+                )
+            if finished:
+                if partial:
+                    _scan_module_events(job_id, [partial], started)
+                # Modules démarrés mais jamais terminés (échec ou arrêt)
+                for module, (name, start_ts) in started.items():
+                    events.emit(
+                        job_id, "module_end", module=module, status="INTERRUPTED",
+                        duration_s=round((datetime.now() - start_ts).total_seconds(), 1),
+                        name=name
+                    )
+                return
+            try:
+                await asyncio.wait_for(done.wait(), timeout=MODULE_WATCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    except Exception as e:
+        logger.warning(f"Suivi des modules interrompu pour le job {job_id}: {e}")
+
+
 # ============================================================================
 # ROUTES API
 # ============================================================================
@@ -135,6 +547,8 @@ async def root():
             "status": "GET /api/status/{job_id}",
             "results": "GET /api/results/{job_id}",
             "jobs": "GET /api/jobs",
+            "events": "GET /api/jobs/{job_id}/events",
+            "gene_samples": "GET /api/genes/{name}/samples",
             "health": "GET /health"
         }
     }
@@ -154,55 +568,315 @@ async def health_check():
 UPLOAD_DIR = PIPELINE_DIR / "data" / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-ALLOWED_EXTENSIONS = {'.fasta', '.fa', '.fna', '.fastq', '.fq', '.fasta.gz', '.fastq.gz', '.fa.gz', '.fq.gz'}
+# Contenu des uploads adressé par SHA-256 (noms visibles = liens physiques)
+content_store = ContentStore(UPLOAD_DIR)
+
+
+def _input_file_key(path: Path) -> str:
+    """Identité d'un fichier d'entrée : les liens physiques d'un même contenu la partagent"""
+    stat_result = path.stat()
+    return f"{stat_result.st_dev}:{stat_result.st_ino}:{stat_result.st_size}:{stat_result.st_mtime_ns}"
+
+
+async def _input_stats(path: Path, sha256: Optional[str] = None) -> dict:
+    """
+    Statistiques de validation d'un fichier d'entrée
+
+    Lues en base si le fichier n'a pas changé depuis sa validation,
+    sinon calculées en une passe (hors de la boucle d'événements) et enregistrées.
+
+    Raises:
+        OSError: Fichier absent ou illisible
+    """
+    file_key = await asyncio.to_thread(_input_file_key, path)
+    stats = await db.get_input_stats(file_key)
+    if stats is None:
+        stats = await asyncio.to_thread(validate_file, path)
+        await db.save_input_stats(file_key, str(path), stats, sha256)
+        _log_input_stats(path, stats)
+    return stats
+
+
+def _log_input_stats(path: Path, stats: dict):
+    if stats['valid']:
+        logger.info(
+            f"🔎 {path.name} : {stats['format']} {stats['kind']}, {stats['records']} séquences, "
+            f"{stats['total_bases']} pb, N50 {stats['n50']}"
+        )
+    else:
+        logger.warning(f"🔎 {path.name} invalide : {'; '.join(stats['errors'])}")
+
 
 @app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(request: Request, filename: Optional[str] = None):
     """
     Upload un fichier FASTA/FASTQ pour analyse
 
+    Deux modes, tous deux écrits sur disque en streaming (mémoire constante) :
+    - corps brut (application/octet-stream) avec le nom dans `?filename=`
+      (recommandé : aucune copie temporaire)
+    - multipart/form-data avec un champ `file` (compatibilité)
+
+    Le contenu est rangé par SHA-256 : un fichier déjà uploadé n'est pas
+    stocké deux fois, et un nom déjà pris par un autre contenu reçoit un
+    suffixe au lieu d'être écrasé. Le fichier est validé pendant sa
+    réception (format, intégrité gzip, statistiques) : le résultat est
+    enregistré et renvoyé dans `validation`.
+
     Returns:
-        Le chemin du fichier sur le serveur à utiliser comme sample_id
-    """
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="Nom de fichier manquant")
-
-    # Valider l'extension
-    filename = file.filename.lower()
-    valid = False
-    for ext in ALLOWED_EXTENSIONS:
-        if filename.endswith(ext):
-            valid = True
-            break
-    if not valid:
+        Le chemin du fichier sur le serveur à utiliser comme sample_id,
+        sa taille, son SHA-256, deduplicated et validation
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_SIZE:
         raise HTTPException(
-            status_code=400,
-            detail="Format non supporté. Extensions acceptées : .fasta, .fa, .fna, .fastq, .fq (et .gz)"
+            status_code=413,
+            detail=f"Fichier trop volumineux (maximum {MAX_UPLOAD_SIZE // (1024 ** 2)} Mo)"
         )
 
-    # Nettoyer le nom de fichier (sécurité)
-    safe_filename = re_module.sub(r'[^a-zA-Z0-9._-]', '_', file.filename)
-    dest_path = UPLOAD_DIR / safe_filename
-
-    # Écrire le fichier
+    form = None
     try:
-        with open(dest_path, "wb") as f:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="Fichier vide")
-            f.write(content)
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form(max_files=1)
+            file = form.get("file")
+            if file is None or isinstance(file, str):
+                raise HTTPException(status_code=400, detail="Champ 'file' manquant")
+            safe_filename = safe_upload_filename(file.filename)
+            chunks = iter_upload_file(file)
+        else:
+            safe_filename = safe_upload_filename(filename)
+            chunks = request.stream()
 
-        logger.info(f"Fichier uploadé : {dest_path} ({len(content)} bytes)")
+        validator = SequenceValidator()
+        saved = await save_stream(chunks, content_store, safe_filename, validator=validator)
 
-        return {
-            "filename": safe_filename,
-            "path": str(dest_path),
-            "size": len(content)
-        }
+        logger.info(
+            f"Fichier uploadé : {saved['path']} ({saved['size']} bytes, sha256 {saved['sha256'][:12]}"
+            f"{', dédupliqué' if saved['deduplicated'] else ''})"
+        )
+        path = Path(saved['path'])
+        stats = await asyncio.to_thread(validator.result)
+        await db.save_input_stats(
+            await asyncio.to_thread(_input_file_key, path), saved['path'], stats, saved['sha256']
+        )
+        _log_input_stats(path, stats)
+        return {**saved, "validation": stats}
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except HTTPException:
         raise
     except OSError:
         raise HTTPException(status_code=500, detail="Erreur lors de l'enregistrement du fichier")
+    finally:
+        if form is not None:
+            await form.close()
+
+
+# ============================================================================
+# UPLOADS REPRENABLES (protocole type tus 1.0)
+# ============================================================================
+
+TUS_VERSION = "1.0.0"
+
+# Intervalle entre deux nettoyages des uploads abandonnés (secondes)
+UPLOAD_GC_INTERVAL = 3600
+
+resumable_uploads = ResumableUploadStore(content_store)
+
+
+async def _collect_upload_garbage():
+    """Supprime périodiquement les uploads partiels abandonnés"""
+    while True:
+        try:
+            removed = await asyncio.to_thread(resumable_uploads.collect_garbage)
+            if removed:
+                logger.info(f"🧹 {removed} upload(s) abandonné(s) supprimé(s)")
+        except Exception as e:
+            logger.warning(f"Nettoyage des uploads impossible: {e}")
+        await asyncio.sleep(UPLOAD_GC_INTERVAL)
+
+
+def _tus_headers(upload: Optional[dict] = None) -> dict:
+    headers = {"Tus-Resumable": TUS_VERSION, "Cache-Control": "no-store"}
+    if upload is not None:
+        headers["Upload-Offset"] = str(upload['offset'])
+        headers["Upload-Length"] = str(upload['length'])
+    return headers
+
+
+def _upload_metadata(header: str) -> dict:
+    """Décode l'en-tête Upload-Metadata ("clé base64,clé base64")"""
+    metadata = {}
+    for item in header.split(","):
+        parts = item.strip().split(" ", 1)
+        if not parts[0]:
+            continue
+        try:
+            metadata[parts[0]] = base64.b64decode(parts[1]).decode() if len(parts) > 1 else ""
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail="En-tête Upload-Metadata invalide")
+    return metadata
+
+
+def _upload_status(upload: dict) -> dict:
+    return {
+        "id": upload['id'],
+        "filename": upload['filename'],
+        "offset": upload['offset'],
+        "length": upload['length'],
+        "completed": upload['completed'],
+        "path": upload['path'],
+        "sha256": upload['sha256'],
+        "deduplicated": upload.get('deduplicated', False),
+    }
+
+
+@app.options("/api/uploads")
+async def tus_options():
+    """Capacités du serveur d'uploads reprenables (découverte tus)"""
+    return Response(status_code=204, headers={
+        "Tus-Resumable": TUS_VERSION,
+        "Tus-Version": TUS_VERSION,
+        "Tus-Extension": "creation,termination",
+        "Tus-Max-Size": str(MAX_UPLOAD_SIZE),
+    })
+
+
+@app.post("/api/uploads", status_code=status.HTTP_201_CREATED)
+async def create_resumable_upload(request: Request, response: Response, filename: Optional[str] = None):
+    """
+    Crée un upload reprenable
+
+    En-têtes : Upload-Length (taille totale, requis) et Upload-Metadata
+    (`filename <base64>`, `sha256 <base64>` optionnel) ou paramètre
+    `?filename=`. L'URL de l'upload est renvoyée dans l'en-tête Location.
+    Si le SHA-256 annoncé est déjà stocké, l'upload est créé terminé
+    (Upload-Offset = Upload-Length) : rien à envoyer.
+    """
+    length_header = request.headers.get("upload-length", "")
+    if not length_header.isdigit():
+        raise HTTPException(status_code=400, detail="En-tête Upload-Length manquant ou invalide")
+    metadata = _upload_metadata(request.headers.get("upload-metadata", ""))
+
+    try:
+        upload = await asyncio.to_thread(
+            resumable_uploads.create, metadata.get("filename") or filename or "", int(length_header),
+            metadata.get("sha256", "").lower() or None
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    location = f"/api/uploads/{upload['id']}"
+    response.headers.update(_tus_headers(upload))
+    response.headers["Location"] = location
+    logger.info(f"Upload reprenable créé : {upload['filename']} ({upload['length']} bytes)")
+    return {**_upload_status(upload), "upload_url": location}
+
+
+@app.get("/api/uploads/blobs/{sha256}")
+async def lookup_upload_content(sha256: str):
+    """Indique si un contenu (SHA-256) est déjà stocké, avec sa taille et son nombre de noms"""
+    try:
+        return await asyncio.to_thread(content_store.lookup, sha256.lower())
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@app.delete("/api/uploads/files/{filename}")
+async def delete_uploaded_file(filename: str):
+    """
+    Supprime un fichier uploadé (un nom) ; le contenu est supprimé
+    quand plus aucun nom ne le référence
+    """
+    try:
+        content_deleted = await asyncio.to_thread(content_store.release, filename)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {"filename": filename, "content_deleted": content_deleted}
+
+
+@app.get("/api/uploads/files/{filename}/validation")
+async def get_uploaded_file_validation(filename: str):
+    """Statistiques de validation d'un fichier uploadé (calculées si absentes)"""
+    name = os.path.basename(filename)
+    path = UPLOAD_DIR / name
+    if name.startswith('.') or not path.is_file():
+        raise HTTPException(status_code=404, detail="Fichier inconnu")
+    try:
+        return {"filename": name, **await _input_stats(path)}
+    except OSError:
+        raise HTTPException(status_code=500, detail="Lecture du fichier impossible")
+
+
+@app.head("/api/uploads/{upload_id}")
+async def head_resumable_upload(upload_id: str):
+    """Offset courant d'un upload (reprise après coupure)"""
+    try:
+        upload = await asyncio.to_thread(resumable_uploads.get, upload_id)
+    except UploadError as e:
+        return Response(status_code=e.status_code, headers=_tus_headers())
+    return Response(status_code=200, headers=_tus_headers(upload))
+
+
+@app.get("/api/uploads/{upload_id}")
+async def get_resumable_upload(upload_id: str):
+    """État d'un upload (chemin, SHA-256 et validation une fois terminé)"""
+    try:
+        upload = await asyncio.to_thread(resumable_uploads.get, upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    validation = None
+    if upload['completed']:
+        try:
+            validation = await _input_stats(Path(upload['path']), upload['sha256'])
+        except OSError:
+            pass  # Fichier supprimé depuis (DELETE /api/uploads/files/...)
+    return {**_upload_status(upload), "validation": validation}
+
+
+@app.patch("/api/uploads/{upload_id}")
+async def patch_resumable_upload(upload_id: str, request: Request):
+    """
+    Envoie un bloc de l'upload à partir de l'offset courant
+
+    En-têtes : Content-Type: application/offset+octet-stream et
+    Upload-Offset (doit être égal à l'offset courant, sinon 409).
+    L'upload est finalisé (renommage atomique) quand le dernier octet est reçu.
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type attendu: application/offset+octet-stream")
+    offset_header = request.headers.get("upload-offset", "")
+    if not offset_header.isdigit():
+        raise HTTPException(status_code=400, detail="En-tête Upload-Offset manquant ou invalide")
+
+    try:
+        upload = await resumable_uploads.append(upload_id, int(offset_header), request.stream())
+    except ClientDisconnect:
+        # Les octets reçus sont conservés : le client reprendra après un HEAD
+        logger.info(f"Upload {upload_id} interrompu par le client")
+        return Response(status_code=400, headers=_tus_headers())
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=_tus_headers())
+    except OSError:
+        raise HTTPException(status_code=500, detail="Erreur lors de l'enregistrement du fichier")
+
+    if upload['completed']:
+        # Validation dès la fin de l'upload : GET /api/uploads/{id} la renvoie sans relecture
+        try:
+            await _input_stats(Path(upload['path']), upload['sha256'])
+        except OSError as e:
+            logger.warning(f"Validation de {upload['path']} impossible: {e}")
+    return Response(status_code=204, headers=_tus_headers(upload))
+
+
+@app.delete("/api/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_resumable_upload(upload_id: str):
+    """Abandonne un upload reprenable (données partielles supprimées)"""
+    try:
+        await asyncio.to_thread(resumable_uploads.delete, upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return Response(status_code=204, headers=_tus_headers())
 
 
 @app.post("/api/launch", response_model=JobResponse, status_code=status.HTTP_201_CREATED)
@@ -217,12 +891,28 @@ async def launch_analysis(request: LaunchAnalysisRequest):
         JobResponse avec job_id et statut initial
 
     Raises:
-        HTTPException 400: Si les paramètres sont invalides
+        HTTPException 400: Si les paramètres sont invalides ou si le fichier
+            local est absent, invalide ou n'est pas un assemblage FASTA
         HTTPException 500: Si erreur lors du lancement
     """
     try:
         logger.info(f"📥 Nouvelle requête d'analyse: {request.sample_id}")
 
+        input_stats = None
+        if launcher.detect_input_type(request.sample_id) == InputType.LOCAL_FASTA:
+            # Fichier local validé avant de créer le job : un fichier inutilisable
+            # est refusé ici plutôt qu'après l'activation conda et l'assemblage
+            input_path = Path(request.sample_id)
+            if not input_path.is_absolute():
+                input_path = launcher.work_dir / input_path
+            try:
+                input_stats = await _input_stats(input_path)
+            except OSError:
+                raise HTTPException(status_code=400, detail=f"Fichier introuvable: {request.sample_id}")
+            errors = launch_errors(input_stats)
+            if errors:
+                raise HTTPException(status_code=400, detail=f"Fichier d'entrée refusé : {'; '.join(errors)}")
+
         # Créer le job dans la base de données
         job_id = await db.create_job(
             sample_id=request.sample_id,
@@ -234,20 +924,41 @@ async def launch_analysis(request: LaunchAnalysisRequest):
 
         logger.info(f"✅ Job créé: {job_id}")
 
+        events.emit(job_id, "status", status=JobStatus.PENDING.value)
+        if input_stats is not None:
+            events.emit(job_id, "input_validation", **input_stats)
+        pipeline_done = asyncio.Event()
+
         # Définir callback de complétion
         async def on_complete(exit_code: int, stdout: str, stderr: str):
             """Callback appelé quand le pipeline se termine"""
+            pipeline_done.set()
+            await _release_db_pin(job_id)
+            await _refresh_file_manifest(
+                job_id, str(launcher.get_output_dir(request.sample_id, run_number)), complete=True
+            )
             if exit_code == 0:
+                completed_at = datetime.now()
                 await db.update_job_status(
                     job_id=job_id,
                     status=JobStatus.COMPLETED,
-                    completed_at=datetime.now(),
+                    completed_at=completed_at,
                     exit_code=exit_code
                 )
                 logger.info(f"✅ Job {job_id} terminé avec succès")
+
+                job_data = await db.get_job(job_id)
+                events.emit(
+                    job_id, "status", status=JobStatus.COMPLETED.value,
+                    duration_s=_job_duration(job_data, completed_at), exit_code=exit_code
+                )
+                if job_data:
+                    num_genes = await _index_job_genes(job_data)
+                    events.emit(job_id, "metrics", num_genes=num_genes)
             else:
                 # Extraire message d'erreur du stderr et des logs
                 error_msg = "Erreur inconnue"
+                job_data = None
 
                 # Essayer de récupérer les dernières lignes du log pipeline
                 try:
@@ -275,26 +986,47 @@ async def launch_analysis(request: LaunchAnalysisRequest):
                 if error_msg == "Erreur inconnue" and stderr:
                     error_msg = stderr[-500:]
 
+                completed_at = datetime.now()
                 await db.update_job_status(
                     job_id=job_id,
                     status=JobStatus.FAILED,
-                    completed_at=datetime.now(),
+                    completed_at=completed_at,
                     exit_code=exit_code,
                     error_message=error_msg
                 )
+                events.emit(
+                    job_id, "status", status=JobStatus.FAILED.value,
+                    duration_s=_job_duration(job_data, completed_at),
+                    exit_code=exit_code, error=error_msg[:500]
+                )
                 logger.error(f"❌ Job {job_id} échoué (exit code: {exit_code}): {error_msg[:100]}")
 
-        # Lancer le pipeline
-        launch_result = await launcher.launch(
-            sample_id=request.sample_id,
-            threads=request.threads,
-            prokka_mode=request.prokka_mode.value,
-            prokka_genus=request.prokka_genus,
-            prokka_species=request.prokka_species,
-            force=request.force,
-            on_complete=on_complete
+        # Réserver le numéro de run (atomique en base, sans scanner outputs/)
+        run_number = await _allocate_run_number(request.sample_id)
+
+        # Versions des bases figées pour toute la durée du job
+        db_dir = await asyncio.to_thread(
+            db_snapshots.pin, job_id, {key: config["path"] for key, config in DATABASES_CONFIG.items()}
         )
 
+        # Lancer le pipeline
+        try:
+            launch_result = await launcher.launch(
+                sample_id=request.sample_id,
+                threads=request.threads,
+                prokka_mode=request.prokka_mode.value,
+                prokka_genus=request.prokka_genus,
+                prokka_species=request.prokka_species,
+                force=request.force,
+                run_number=run_number,
+                db_dir=str(db_dir),
+                on_complete=on_complete
+            )
+        except Exception:
+            await _release_db_pin(job_id)
+            raise
+        db_snapshots.set_pin_pid(job_id, launch_result['pid'])
+
         # Mettre à jour le job avec les infos du lancement
         await db.update_job_status(
             job_id=job_id,
@@ -305,6 +1037,14 @@ async def launch_analysis(request: LaunchAnalysisRequest):
             run_number=launch_result['run_number'],
             output_dir=launch_result['output_dir']
         )
+        events.emit(
+            job_id, "status", status=JobStatus.RUNNING.value,
+            pid=launch_result['pid'], run_number=launch_result['run_number'],
+            input_type=launch_result['input_type']
+        )
+        _spawn(_watch_job_modules(
+            job_id, request.sample_id, launch_result['run_number'], pipeline_done
+        ))
 
         logger.info(f"🚀 Pipeline lancé (PID: {launch_result['pid']}, Run: {launch_result['run_number']})")
 
@@ -318,6 +1058,8 @@ async def launch_analysis(request: LaunchAnalysisRequest):
             message=f"Analyse lancée avec succès (Run #{launch_result['run_number']})"
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Erreur lancement analyse: {e}")
         raise HTTPException(
@@ -446,13 +1188,81 @@ async def get_job_status(job_id: str):
         )
 
 
+def _build_job_results(job: dict, include_genes: bool = True) -> AnalysisResults:
+    """
+    Parse les sorties d'un job terminé en AnalysisResults (appel bloquant)
+
+    La taxonomie NCBI (appel réseau) est renseignée séparément par l'appelant.
+    """
+    parser = OutputParser(job['output_dir'])
+
+    # Parser détection ARG (brut par outil, outils en parallèle)
+    arg_detection = parser.parse_all_arg_detection()
+
+    # Parser détection ARG avec déduplication (comme le rapport HTML)
+    deduplicated_data = parser.parse_all_arg_deduplicated()
+    deduplicated_genes = [
+        DeduplicatedGene(**gene) for gene in deduplicated_data['genes']
+    ]
+    dedup_stats = DeduplicationStats(
+        total_raw=deduplicated_data['stats']['total_raw'],
+        total_deduplicated=deduplicated_data['stats']['total_deduplicated'],
+        duplicates_removed=deduplicated_data['stats']['duplicates_removed'],
+        by_type=deduplicated_data['stats']['by_type']
+    )
+
+    # Parser stats assemblage (si disponible)
+    assembly_stats = parser.parse_assembly_stats()
+    mlst_info = parser.parse_mlst()
+
+    # Trouver rapport HTML
+    report_html_path = parser.get_report_html_path()
+
+    # Calculer statistiques globales
+    total_arg_genes_raw = sum(r.num_genes for r in arg_detection.values())
+    total_unique_genes = deduplicated_data['stats']['total_deduplicated']
+    unique_resistance_types = parser.get_unique_resistance_types(arg_detection)
+
+    if not include_genes:
+        arg_detection = {
+            key: detection.model_copy(update={"genes": []})
+            for key, detection in arg_detection.items()
+        }
+        deduplicated_genes = []
+
+    return AnalysisResults(
+        job_id=job['id'],
+        sample_id=job['sample_id'],
+        run_number=job['run_number'],
+        input_type=InputType(job['input_type']),
+        assembly_stats=assembly_stats,
+        arg_detection=arg_detection,
+        deduplicated_genes=deduplicated_genes,
+        deduplication_stats=dedup_stats,
+        total_arg_genes=total_arg_genes_raw,
+        total_unique_genes=total_unique_genes,
+        unique_resistance_types=unique_resistance_types,
+        mlst=mlst_info,
+        report_html_path=report_html_path,
+        output_directory=job['output_dir'],
+        completed_at=job['completed_at']
+    )
+
+
 @app.get("/api/results/{job_id}", response_model=AnalysisResults)
-async def get_job_results(job_id: str):
+async def get_job_results(
+    job_id: str,
+    request: Request,
+    response: Response,
+    include_genes: bool = True
+):
     """
     Récupère les résultats d'une analyse terminée
 
     Args:
         job_id: ID du job
+        include_genes: Inclure les listes de gènes (False = résumé seul,
+            utiliser GET /api/results/{job_id}/genes pour les gènes paginés)
 
     Returns:
         AnalysisResults avec gènes ARG détectés, stats assemblage, etc.
@@ -478,74 +1288,206 @@ async def get_job_results(job_id: str):
                 detail=f"Job {job_id} pas encore terminé (statut: {job['status']})"
             )
 
-        # Parser les résultats
-        parser = OutputParser(job['output_dir'])
-
-        # Parser détection ARG (brut par outil)
-        arg_detection = parser.parse_all_arg_detection()
+        # Résultats immuables une fois le job terminé : requête conditionnelle
+        etag = job_etag(job, "results", include_genes)
+        if etag_matches(request, etag):
+            return not_modified(etag, IMMUTABLE_CACHE_CONTROL)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+
+        # Parsing bloquant hors event loop ; l'appel NCBI (réseau) en parallèle
+        ncbi_parser = OutputParser(job['output_dir'])
+        results, ncbi_info = await asyncio.gather(
+            asyncio.to_thread(_build_job_results, job, include_genes),
+            asyncio.to_thread(ncbi_parser.fetch_ncbi_organism, job['sample_id'], job['input_type'])
+        )
+        results.taxonomy = {'ncbi': ncbi_info, 'source': 'NCBI'} if ncbi_info else None
+        if ncbi_info is None:
+            # Taxonomie absente (peut-être une erreur réseau NCBI passagère) :
+            # réponse non mise en cache et sans ETag, la prochaine requête réessaie
+            del response.headers["ETag"]
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        return results
 
-        # Parser détection ARG avec déduplication (comme le rapport HTML)
-        deduplicated_data = parser.parse_all_arg_deduplicated()
-        deduplicated_genes = [
-            DeduplicatedGene(**gene) for gene in deduplicated_data['genes']
-        ]
-        dedup_stats = DeduplicationStats(
-            total_raw=deduplicated_data['stats']['total_raw'],
-            total_deduplicated=deduplicated_data['stats']['total_deduplicated'],
-            duplicates_removed=deduplicated_data['stats']['duplicates_removed'],
-            by_type=deduplicated_data['stats']['by_type']
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Erreur récupération résultats: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erreur lors du parsing des résultats"
         )
 
-        # Parser stats assemblage (si disponible)
-        assembly_stats = parser.parse_assembly_stats()
 
-        # Parser informations taxonomiques (via NCBI API)
-        ncbi_info = parser.fetch_ncbi_organism(job['sample_id'], job['input_type'])
-        taxonomy_info = {'ncbi': ncbi_info, 'source': 'NCBI'} if ncbi_info else None
-        mlst_info = parser.parse_mlst()
+def _encode_cursor(key: tuple) -> str:
+    """Encode un curseur keyset (valeur de tri, identifiant) en chaîne opaque"""
+    raw = json.dumps(list(key), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-        # Trouver rapport HTML
-        report_html_path = parser.get_report_html_path()
 
-        # Calculer statistiques globales
-        total_arg_genes_raw = sum(r.num_genes for r in arg_detection.values())
-        total_unique_genes = deduplicated_data['stats']['total_deduplicated']
-        unique_resistance_types = parser.get_unique_resistance_types(arg_detection)
+def _decode_cursor(cursor: str, size: int = 2) -> tuple:
+    """Décode un curseur produit par _encode_cursor (tuple de size éléments)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return tuple(key)
+
+
+# Colonnes de tri des gènes dont la valeur de curseur est un entier / un nombre
+# (les autres sont du texte) : un curseur d'un autre type est refusé (400)
+_GENE_SORT_INTEGER = {"priority", "position"}
+_GENE_SORT_NUMERIC = {"identity", "coverage"}
+
+
+def _split_param(value: Optional[str], upper: bool = False) -> Optional[List[str]]:
+    """Découpe un paramètre de requête multi-valeurs séparées par des virgules"""
+    if not value:
+        return None
+    items = [v.strip() for v in value.split(",") if v.strip()]
+    return [v.upper() for v in items] if upper else items
+
+
+def _gene_hit_to_model(row: dict) -> DeduplicatedGene:
+    """Convertit une ligne de l'index des gènes en DeduplicatedGene"""
+    return DeduplicatedGene(
+        gene=row['gene'],
+        sequence=row['sequence'] or '',
+        start=row['start'] or 0,
+        end=row['end'] or 0,
+        strand=row['strand'] or '+',
+        coverage=row['coverage'] or 0,
+        identity=row['identity'] or 0,
+        database=row['database'] or '',
+        accession=row['accession'] or '',
+        product=row['product'],
+        resistance=row['resistance'],
+        subclass=row['subclass'],
+        element_type=row['element_type'],
+        element_subtype=row['element_subtype'],
+        source=row['source'] or '',
+        sources=[s for s in (row['sources'] or '').split(';') if s],
+        priority=row['priority']
+    )
+
+
+@app.get("/api/results/{job_id}/genes", response_model=GenePage)
+async def get_job_genes(
+    job_id: str,
+    priority: Optional[str] = None,
+    element_type: Optional[str] = None,
+    source: Optional[str] = None,
+    min_identity: float = Query(0, ge=0, le=100),
+    min_coverage: float = Query(0, ge=0, le=100),
+    sort: str = "priority",
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Gènes dédupliqués d'une analyse, filtrés, triés et paginés côté serveur
+
+    Args:
+        job_id: ID du job
+        priority: Priorités séparées par des virgules (ex: CRITICAL,HIGH)
+        element_type: Types séparés par des virgules (ex: AMR,VIRULENCE)
+        source: Outils séparés par des virgules (ex: AMRFinderPlus,CARD)
+        min_identity: Identité minimale (%)
+        min_coverage: Couverture minimale (%)
+        sort: Colonne de tri, préfixe "-" pour décroissant (ex: -identity)
+        cursor: Curseur renvoyé par la page précédente (next_cursor)
+        limit: Taille de page (défaut: 100)
 
-        return AnalysisResults(
+    Returns:
+        GenePage avec le total filtré, la page et le curseur suivant
+    """
+    descending = sort.startswith("-")
+    sort_key = sort.lstrip("-")
+    if sort_key not in GENE_SORT_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tri invalide. Valeurs acceptées: {', '.join(GENE_SORT_COLUMNS)}"
+        )
+    after = None
+    if cursor:
+        sort_value, ordinal = _decode_cursor(cursor)
+        if sort_key in _GENE_SORT_INTEGER:
+            value_ok = type(sort_value) is int
+        elif sort_key in _GENE_SORT_NUMERIC:
+            value_ok = type(sort_value) in (int, float)
+        else:
+            value_ok = isinstance(sort_value, str)
+        if type(ordinal) is not int or not value_ok:
+            raise HTTPException(status_code=400, detail="Curseur invalide")
+        after = (sort_value, ordinal)
+
+    try:
+        job = await db.get_job(job_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Job {job_id} non trouvé"
+            )
+
+        if job['status'] != JobStatus.COMPLETED.value:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Job {job_id} pas encore terminé (statut: {job['status']})"
+            )
+
+        # Les gènes sont servis depuis l'index (construit à la volée si absent)
+        if not await db.is_job_genes_indexed(job_id):
+            failure = await db.get_gene_index_failure(job_id)
+            if failure is None or _gene_index_retry_due(job, failure):
+                await _index_job_genes(job)
+                failure = await db.get_gene_index_failure(job_id)
+            if failure is not None:
+                logger.warning(f"Gènes indisponibles pour le job {job_id}: {failure['error']}")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Gènes du job illisibles (échec de l'indexation)"
+                )
+
+        page = await db.query_job_genes(
             job_id=job_id,
-            sample_id=job['sample_id'],
-            run_number=job['run_number'],
-            input_type=InputType(job['input_type']),
-            assembly_stats=assembly_stats,
-            arg_detection=arg_detection,
-            deduplicated_genes=deduplicated_genes,
-            deduplication_stats=dedup_stats,
-            total_arg_genes=total_arg_genes_raw,
-            total_unique_genes=total_unique_genes,
-            unique_resistance_types=unique_resistance_types,
-            taxonomy=taxonomy_info,
-            mlst=mlst_info,
-            report_html_path=report_html_path,
-            output_directory=job['output_dir'],
-            completed_at=job['completed_at']
+            priorities=_split_param(priority, upper=True),
+            element_types=_split_param(element_type, upper=True),
+            sources=_split_param(source),
+            min_identity=min_identity,
+            min_coverage=min_coverage,
+            sort=sort_key,
+            descending=descending,
+            after=after,
+            limit=limit
+        )
+
+        genes = [_gene_hit_to_model(row) for row in page['genes']]
+        return GenePage(
+            job_id=job_id,
+            total=page['total'],
+            count=len(genes),
+            next_cursor=_encode_cursor(page['next']) if page['next'] else None,
+            genes=genes
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Erreur récupération résultats: {e}")
+        logger.error(f"❌ Erreur récupération gènes job {job_id}: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Erreur lors du parsing des résultats"
+            detail="Erreur lors de la récupération des gènes"
         )
 
 
 @app.get("/api/jobs", response_model=JobListResponse)
 async def list_jobs(
     status_filter: Optional[JobStatus] = None,
-    limit: int = 100,
-    offset: int = 0
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
     """
     Liste tous les jobs avec filtres optionnels
@@ -553,16 +1495,30 @@ async def list_jobs(
     Args:
         status_filter: Filtrer par statut (optionnel)
         limit: Nombre maximum de résultats (défaut: 100)
-        offset: Offset pour pagination (défaut: 0)
+        offset: Offset pour pagination (défaut: 0, préférer cursor)
+        cursor: Curseur renvoyé par la page précédente (next_cursor)
 
     Returns:
         JobListResponse avec liste des jobs
     """
+    before = None
+    if cursor:
+        created_at, cursor_job_id = _decode_cursor(cursor)
+        try:
+            before = (datetime.fromisoformat(str(created_at)), str(cursor_job_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Curseur invalide")
+
     try:
-        # Récupérer les jobs
-        jobs = await db.get_jobs(status=status_filter, limit=limit, offset=offset)
+        # Récupérer les jobs (une ligne de plus pour savoir s'il reste une page)
+        jobs = await db.get_jobs(status=status_filter, limit=limit + 1, offset=offset, before=before)
         total = await db.count_jobs(status=status_filter)
 
+        next_cursor = None
+        if len(jobs) > limit:
+            jobs = jobs[:limit]
+            next_cursor = _encode_cursor((jobs[-1]['created_at'], jobs[-1]['id']))
+
         # Convertir en JobListItem
         job_items = [
             JobListItem(
@@ -578,7 +1534,8 @@ async def list_jobs(
 
         return JobListResponse(
             total=total,
-            jobs=job_items
+            jobs=job_items,
+            next_cursor=next_cursor
         )
 
     except Exception as e:
@@ -589,6 +1546,48 @@ async def list_jobs(
         )
 
 
+@app.get("/api/jobs/{job_id}/events", response_model=JobEventListResponse)
+async def get_job_events(
+    job_id: str,
+    event_type: Optional[str] = None,
+    after: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000)
+):
+    """
+    Historique des événements d'un job (statuts, modules, métriques)
+
+    Les événements sont écrits par lots (EVENT_FLUSH_MS) : les plus récents
+    peuvent apparaître avec un léger décalage.
+
+    Args:
+        job_id: ID du job
+        event_type: Filtrer par type (status, module_start, module_end, module_skipped, metrics)
+        after: Ne renvoyer que les événements d'id supérieur (pagination / suivi)
+        limit: Nombre maximum d'événements (défaut: 500)
+
+    Raises:
+        HTTPException 404: Si job non trouvé
+    """
+    job = await db.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} non trouvé"
+        )
+
+    rows = await db.get_job_events(job_id, event_type=event_type, after_id=after, limit=limit + 1)
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_after = rows[-1]['id']
+
+    return JobEventListResponse(
+        job_id=job_id,
+        events=[JobEvent(**row) for row in rows],
+        next_after=next_after
+    )
+
+
 @app.delete("/api/jobs/{job_id}")
 async def delete_job(job_id: str, delete_files: bool = True):
     """
@@ -657,17 +1656,15 @@ async def delete_all_jobs(delete_files: bool = True):
 
         # Supprimer les fichiers de chaque job avant de vider la DB
         if delete_files:
-            jobs = await db.get_jobs(limit=10000)
-            for job in jobs:
-                if job.get('output_dir'):
-                    output_path = Path(job['output_dir'])
-                    if output_path.exists():
-                        try:
-                            shutil.rmtree(output_path)
-                            files_deleted += 1
-                            logger.info(f"🗑️ Fichiers supprimés: {output_path}")
-                        except OSError as e:
-                            logger.error(f"Erreur suppression {output_path}: {e}")
+            for output_dir in await db.get_output_dirs():
+                output_path = Path(output_dir)
+                if output_path.exists():
+                    try:
+                        shutil.rmtree(output_path)
+                        files_deleted += 1
+                        logger.info(f"🗑️ Fichiers supprimés: {output_path}")
+                    except OSError as e:
+                        logger.error(f"Erreur suppression {output_path}: {e}")
 
         count = await db.delete_all_jobs()
         logger.warning(f"🗑️ Tous les jobs supprimés ({count} jobs, {files_deleted} dossiers)")
@@ -684,6 +1681,124 @@ async def delete_all_jobs(delete_files: bool = True):
         )
 
 
+# ============================================================================
+# RECHERCHE DE GÈNES INTER-ÉCHANTILLONS
+# ============================================================================
+
+@app.get("/api/genes", response_model=IndexedGeneListResponse)
+async def list_indexed_genes(
+    prefix: Optional[str] = None,
+    resistance_class: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=5000)
+):
+    """
+    Liste les gènes détectés dans l'ensemble des runs terminés
+
+    Args:
+        prefix: Préfixe du nom de gène (ex: "blaNDM", "mcr")
+        resistance_class: Classe d'antibiotique (ex: carbapenem, colistin)
+        limit: Nombre maximum de gènes (défaut: 200)
+
+    Returns:
+        IndexedGeneListResponse avec le nombre d'échantillons par gène
+    """
+    try:
+        rows = await db.list_indexed_genes(
+            prefix=prefix,
+            resistance_class=resistance_class,
+            limit=limit
+        )
+        genes = [
+            IndexedGene(
+                gene=row['gene'],
+                num_samples=row['num_samples'],
+                num_hits=row['num_hits'],
+                max_identity=row['max_identity']
+            )
+            for row in rows
+        ]
+        return IndexedGeneListResponse(total=len(genes), genes=genes)
+
+    except Exception as e:
+        logger.error(f"❌ Erreur listing gènes indexés: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erreur lors de la recherche dans l'index des gènes"
+        )
+
+
+@app.get("/api/genes/{gene_name}/samples", response_model=GeneSamplesResponse)
+async def get_gene_samples(
+    gene_name: str,
+    match: str = Query("exact", pattern="^(exact|prefix)$"),
+    resistance_class: Optional[str] = None,
+    min_identity: float = Query(0, ge=0, le=100),
+    min_coverage: float = Query(0, ge=0, le=100),
+    priority: Optional[str] = Query(None, pattern="^(CRITICAL|HIGH|MEDIUM)$"),
+    since: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """
+    Liste les échantillons portant un gène (surveillance inter-runs)
+
+    Exemple: /api/genes/blaNDM/samples?match=prefix&min_identity=95&since=2026-01-01
+
+    Args:
+        gene_name: Nom du gène (insensible à la casse)
+        match: "exact" ou "prefix"
+        resistance_class: Classe d'antibiotique (ex: carbapenem)
+        min_identity: Identité minimale (%)
+        min_coverage: Couverture minimale (%)
+        priority: CRITICAL, HIGH ou MEDIUM
+        since: Runs terminés à partir de cette date
+        limit: Nombre maximum de hits
+
+    Returns:
+        GeneSamplesResponse avec les hits par job
+    """
+    try:
+        rows = await db.search_gene_samples(
+            gene=gene_name,
+            prefix=(match == "prefix"),
+            resistance_class=resistance_class,
+            min_identity=min_identity,
+            min_coverage=min_coverage,
+            priority=priority,
+            since=since,
+            limit=limit
+        )
+        hits = [
+            GeneSampleHit(
+                job_id=row['job_id'],
+                sample_id=row['sample_id'],
+                gene=row['gene'],
+                identity=row['identity'],
+                coverage=row['coverage'],
+                priority=row['priority'],
+                source=row['source'],
+                resistance=row['resistance'],
+                subclass=row['subclass'],
+                element_type=row['element_type'],
+                completed_at=row['completed_at']
+            )
+            for row in rows
+        ]
+        return GeneSamplesResponse(
+            query=gene_name,
+            match=match,
+            total=len(hits),
+            num_samples=len({hit.job_id for hit in hits}),
+            hits=hits
+        )
+
+    except Exception as e:
+        logger.error(f"❌ Erreur recherche gène {gene_name}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erreur lors de la recherche dans l'index des gènes"
+        )
+
+
 # ============================================================================
 # ARRÊT DE JOB
 # ============================================================================
@@ -735,6 +1850,10 @@ async def stop_job(job_id: str):
             completed_at=datetime.now(),
             error_message="Arrêté manuellement par l'utilisateur"
         )
+        events.emit(
+            job_id, "status", status=JobStatus.FAILED.value,
+            error="Arrêté manuellement par l'utilisateur", process_killed=process_killed
+        )
 
         logger.info(f"🛑 Job {job_id} marqué comme arrêté (processus tué: {process_killed})")
 
@@ -759,12 +1878,25 @@ async def stop_job(job_id: str):
 # ============================================================================
 
 @app.get("/api/jobs/{job_id}/files")
-async def list_job_files(job_id: str):
+async def list_job_files(
+    job_id: str,
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None
+):
     """
     Liste tous les fichiers générés par un job
 
+    Servi depuis le manifeste (construit à la fin du job, mis à jour pendant
+    l'exécution) au lieu de parcourir le répertoire à chaque requête.
+
     Args:
         job_id: ID du job
+        category: Restreindre à une catégorie (ex: 04_arg_detection)
+        limit: Taille de page (défaut: tous les fichiers)
+        cursor: Curseur renvoyé par la page précédente (next_cursor)
 
     Returns:
         Liste des fichiers avec leurs métadonnées
@@ -781,76 +1913,85 @@ async def list_job_files(job_id: str):
         if not output_dir or not Path(output_dir).exists():
             return {"files": [], "output_dir": output_dir, "message": "Répertoire de sortie non trouvé"}
 
+        # Liste figée une fois le job terminé : requête conditionnelle
+        etag = job_etag(job, "files", category, limit, cursor)
+        if etag:
+            if etag_matches(request, etag):
+                return not_modified(etag, IMMUTABLE_CACHE_CONTROL)
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+
+        # Construire / rafraîchir le manifeste si absent ou périmé
+        summary = await db.get_file_manifest_summary(job_id)
+        finished = job['status'] in (JobStatus.COMPLETED.value, JobStatus.FAILED.value)
+        if summary is None or (finished and not summary['complete']):
+            await _refresh_file_manifest(job_id, output_dir, complete=finished)
+            summary = await db.get_file_manifest_summary(job_id)
+        elif not summary['complete']:
+            updated_at = datetime.fromisoformat(str(summary['updated_at']))
+            if (datetime.now() - updated_at).total_seconds() > MANIFEST_REFRESH_SECONDS:
+                await _refresh_file_manifest(job_id, output_dir)
+                summary = await db.get_file_manifest_summary(job_id)
+        if summary is None:
+            logger.warning(f"Manifeste fichiers indisponible pour le job {job_id}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Liste des fichiers indisponible, réessayez plus tard"
+            )
+
+        after = _decode_cursor(cursor, size=3) if cursor else None
+        if after and not all(isinstance(value, str) for value in after):
+            raise HTTPException(status_code=400, detail="Curseur invalide")
+        rows = await db.query_job_files(
+            job_id,
+            category=category,
+            after=after,
+            limit=limit + 1 if limit else None
+        )
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = _encode_cursor((last['category'], last['name'], last['relative_path']))
+
         output_path = Path(output_dir)
-        files = []
-
-        # Parcourir tous les fichiers récursivement
-        for file_path in output_path.rglob("*"):
-            if file_path.is_file():
-                # Déterminer le type de fichier
-                suffix = file_path.suffix.lower()
-                file_type = "other"
-                icon = "📄"
-
-                if suffix in ['.tsv', '.csv']:
-                    file_type = "data"
-                    icon = "📊"
-                elif suffix in ['.html', '.htm']:
-                    file_type = "report"
-                    icon = "📑"
-                elif suffix in ['.log', '.txt']:
-                    file_type = "log"
-                    icon = "📋"
-                elif suffix in ['.fasta', '.fna', '.fa', '.faa', '.ffn']:
-                    file_type = "sequence"
-                    icon = "🧬"
-                elif suffix in ['.gff', '.gff3', '.gbk', '.gb']:
-                    file_type = "annotation"
-                    icon = "📝"
-                elif suffix in ['.json']:
-                    file_type = "json"
-                    icon = "🔧"
-                elif suffix in ['.png', '.jpg', '.jpeg', '.svg', '.pdf']:
-                    file_type = "image"
-                    icon = "🖼️"
-
-                # Chemin relatif depuis output_dir
-                relative_path = file_path.relative_to(output_path)
-
-                # Catégorie basée sur le dossier parent
-                parts = relative_path.parts
-                category = parts[0] if len(parts) > 1 else "root"
-
-                files.append({
-                    "name": file_path.name,
-                    "path": str(file_path),
-                    "relative_path": str(relative_path),
-                    "size": file_path.stat().st_size,
-                    "size_human": format_size(file_path.stat().st_size),
-                    "modified": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
-                    "type": file_type,
-                    "icon": icon,
-                    "category": category,
-                    "extension": suffix
-                })
-
-        # Trier par catégorie puis par nom
-        files.sort(key=lambda x: (x['category'], x['name']))
-
-        # Grouper par catégorie
+        files = [
+            {
+                "name": row['name'],
+                "path": str(output_path / row['relative_path']),
+                "relative_path": row['relative_path'],
+                "size": row['size'],
+                "size_human": format_size(row['size']),
+                "modified": datetime.fromtimestamp(row['mtime']).isoformat(),
+                "type": row['file_type'],
+                "icon": row['icon'],
+                "category": row['category'],
+                "extension": row['extension']
+            }
+            for row in rows
+        ]
+
+        # Grouper par catégorie (fichiers de la page)
         categories = {}
         for f in files:
-            cat = f['category']
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(f)
+            categories.setdefault(f['category'], []).append(f)
+
+        if category:
+            total_files = summary['categories'].get(category, 0)
+            total_size = summary['category_sizes'].get(category, 0)
+        else:
+            total_files, total_size = summary['total_files'], summary['total_size']
 
         return {
             "output_dir": str(output_path),
-            "total_files": len(files),
-            "total_size": format_size(sum(f['size'] for f in files)),
+            "total_files": total_files,
+            "total_size": format_size(total_size),
             "files": files,
-            "categories": categories
+            "categories": categories,
+            "category_counts": summary['categories'],
+            "next_cursor": next_cursor
         }
 
     except HTTPException:
@@ -863,8 +2004,16 @@ async def list_job_files(job_id: str):
         )
 
 
+def _file_cache_headers(job: dict, full_path: Path) -> tuple:
+    """ETag (dérivé du stat du fichier) et Cache-Control selon l'état du job"""
+    etag = file_etag(full_path.stat())
+    if job['status'] == JobStatus.COMPLETED.value:
+        return etag, IMMUTABLE_CACHE_CONTROL
+    return etag, REVALIDATE_CACHE_CONTROL
+
+
 @app.get("/api/jobs/{job_id}/files/download/{file_path:path}")
-async def download_job_file(job_id: str, file_path: str):
+async def download_job_file(job_id: str, file_path: str, request: Request):
     """
     Télécharge un fichier spécifique d'un job
     """
@@ -888,10 +2037,15 @@ async def download_job_file(job_id: str, file_path: str):
         if not full_path.exists():
             raise HTTPException(status_code=404, detail=f"Fichier non trouvé: {file_path}")
 
+        etag, cache_control = _file_cache_headers(job, full_path)
+        if etag_matches(request, etag):
+            return not_modified(etag, cache_control)
+
         return FileResponse(
             path=str(full_path),
             filename=full_path.name,
-            media_type="application/octet-stream"
+            media_type="application/octet-stream",
+            headers={"ETag": etag, "Cache-Control": cache_control}
         )
 
     except HTTPException:
@@ -902,9 +2056,25 @@ async def download_job_file(job_id: str, file_path: str):
 
 
 @app.get("/api/jobs/{job_id}/files/view/{file_path:path}")
-async def view_job_file(job_id: str, file_path: str, lines: int = 500):
+async def view_job_file(
+    job_id: str,
+    file_path: str,
+    lines: int = Query(500, ge=1, le=10000),
+    from_line: Optional[int] = Query(None, alias="from", ge=1),
+    count: Optional[int] = Query(None, ge=1, le=10000),
+    tail: bool = False
+):
     """
-    Affiche le contenu d'un fichier texte d'un job
+    Affiche une fenêtre de lignes d'un fichier texte d'un job
+
+    Lecture par seek grâce à un index de lignes creux mis en cache
+    (line_index.py) : fichiers de toute taille, mémoire constante.
+
+    Args:
+        lines: Nombre de lignes (compatibilité, remplacé par count)
+        from_line: Première ligne affichée (paramètre `from`, à partir de 1)
+        count: Nombre de lignes de la fenêtre
+        tail: Afficher les `count` dernières lignes
     """
     try:
         job = await db.get_job(job_id)
@@ -921,38 +2091,38 @@ async def view_job_file(job_id: str, file_path: str, lines: int = 500):
         if not str(full_path.resolve()).startswith(str(Path(output_dir).resolve())):
             raise HTTPException(status_code=403, detail="Accès non autorisé")
 
-        if not full_path.exists():
+        if not full_path.is_file():
             raise HTTPException(status_code=404, detail=f"Fichier non trouvé: {file_path}")
 
-        # Vérifier taille
         size = full_path.stat().st_size
-        if size > 10 * 1024 * 1024:  # 10 MB max
-            return {
-                "error": "Fichier trop volumineux pour affichage",
-                "size": format_size(size),
-                "path": str(full_path)
-            }
+        window = count or lines
+        start = -window if tail else (from_line or 1) - 1
 
-        # Lire le contenu
+        # Lire la fenêtre (index construit ou prolongé hors event loop)
         try:
-            content = full_path.read_text(encoding='utf-8', errors='ignore')
-            content_lines = content.split('\n')
-
-            return {
-                "name": full_path.name,
-                "path": str(full_path),
-                "size": format_size(size),
-                "total_lines": len(content_lines),
-                "lines_returned": min(lines, len(content_lines)),
-                "content": '\n'.join(content_lines[:lines]),
-                "truncated": len(content_lines) > lines
-            }
-        except Exception as e:
+            page = await asyncio.to_thread(read_lines, full_path, start, window)
+        except OSError as e:
             return {
                 "error": f"Impossible de lire le fichier: {e}",
                 "path": str(full_path)
             }
 
+        first = page['start']
+        returned = len(page['lines'])
+        return {
+            "name": full_path.name,
+            "path": str(full_path),
+            "size": format_size(size),
+            "total_lines": page['total_lines'],
+            "from": first + 1,
+            "to": first + returned,
+            "lines_returned": returned,
+            "content": '\n'.join(page['lines']),
+            "truncated": first + returned < page['total_lines'],
+            "has_previous": first > 0,
+            "truncated_lines": page['truncated_lines']
+        }
+
     except HTTPException:
         raise
     except Exception as e:
@@ -960,8 +2130,211 @@ async def view_job_file(job_id: str, file_path: str, lines: int = 500):
         raise HTTPException(status_code=500, detail="Erreur lors de l'affichage du fichier")
 
 
+@app.get("/api/jobs/{job_id}/tables/{file_path:path}", response_model=TablePage)
+async def query_job_table(
+    job_id: str,
+    file_path: str,
+    columns: Optional[str] = None,
+    filters: List[str] = Query([], alias="filter"),
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    header: Optional[bool] = None
+):
+    """
+    Interroge un fichier TSV d'un job côté serveur (BLAST, AMRFinderPlus, RGI, Snippy...)
+
+    Le fichier est converti une fois en table SQLite mise en cache
+    (table_query.py) ; les requêtes suivantes ne relisent pas le TSV.
+
+    Args:
+        columns: Colonnes renvoyées, séparées par des virgules (défaut: toutes)
+        filters: Filtres "colonne:opérateur:valeur" (paramètre `filter`, répétable),
+            opérateurs eq, ne, lt, le, gt, ge, contains, startswith
+        sort: Colonne de tri, préfixe "-" pour décroissant (ex: -pident)
+        cursor: Curseur renvoyé par la page précédente (next_cursor)
+        limit: Taille de page (défaut: 100)
+        header: Première ligne = en-tête (défaut: détection automatique)
+    """
+    after = None
+    if cursor:
+        sort_value, row_number = _decode_cursor(cursor)
+        # Cellules NUMERIC : nombre, texte ou NULL (bool exclu, sqlite3 refuse listes et objets)
+        if type(row_number) is not int or type(sort_value) not in (str, int, float, type(None)):
+            raise HTTPException(status_code=400, detail="Curseur invalide")
+        after = (sort_value, row_number)
+
+    try:
+        parsed_filters = [parse_filter(f) for f in filters]
+
+        job = await db.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} non trouvé")
+
+        output_dir = job.get('output_dir')
+        if not output_dir:
+            raise HTTPException(status_code=404, detail="Répertoire de sortie non trouvé")
+
+        full_path = Path(output_dir) / file_path
+
+        # Sécurité
+        if not str(full_path.resolve()).startswith(str(Path(output_dir).resolve())):
+            raise HTTPException(status_code=403, detail="Accès non autorisé")
+
+        if not full_path.is_file():
+            raise HTTPException(status_code=404, detail=f"Fichier non trouvé: {file_path}")
+
+        if full_path.suffix.lower() not in TABLE_EXTENSIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Fichier non tabulé. Extensions acceptées: {', '.join(sorted(TABLE_EXTENSIONS))}"
+            )
+
+        def run_query():
+            with open_table(full_path, header) as table:
+                return query_table(
+                    table,
+                    columns=_split_param(columns),
+                    filters=parsed_filters,
+                    sort=sort.lstrip("-") if sort else None,
+                    descending=bool(sort and sort.startswith("-")),
+                    after=after,
+                    limit=limit
+                )
+
+        page = await asyncio.to_thread(run_query)
+
+        return TablePage(
+            job_id=job_id,
+            path=file_path,
+            columns=page['columns'],
+            total_rows=page['total_rows'],
+            total=page['total'],
+            count=len(page['rows']),
+            next_cursor=_encode_cursor(page['next']) if page['next'] else None,
+            rows=page['rows']
+        )
+
+    except TableQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur requête table: {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de la lecture de la table")
+
+
+# Fichiers consultés par défaut pour les séquences et les annotations d'un run
+SEQUENCE_FILE_PATTERNS = ["02_assembly/filtered/*_filtered.fasta", "03_annotation/prokka/*.fna"]
+FEATURE_FILE_PATTERNS = ["03_annotation/prokka/*.gff"]
+
+
+async def _resolve_run_file(job_id: str, file_path: Optional[str], patterns: List[str]) -> Path:
+    """
+    Fichier d'un run : chemin relatif fourni (vérifié) ou premier motif trouvé
+
+    Raises:
+        HTTPException: 404 (job, répertoire ou fichier absent), 403 (hors du run)
+    """
+    job = await db.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} non trouvé")
+
+    output_dir = job.get('output_dir')
+    if not output_dir or not Path(output_dir).is_dir():
+        raise HTTPException(status_code=404, detail="Répertoire de sortie non trouvé")
+    output_path = Path(output_dir)
+
+    if file_path:
+        full_path = output_path / file_path
+        if not str(full_path.resolve()).startswith(str(output_path.resolve())):
+            raise HTTPException(status_code=403, detail="Accès non autorisé")
+        if not full_path.is_file():
+            raise HTTPException(status_code=404, detail=f"Fichier non trouvé: {file_path}")
+        return full_path
+
+    for pattern in patterns:
+        matches = sorted(output_path.glob(pattern))
+        if matches:
+            return matches[0]
+    raise HTTPException(
+        status_code=404,
+        detail=f"Aucun fichier trouvé ({', '.join(patterns)})"
+    )
+
+
+@app.get("/api/jobs/{job_id}/sequence/{contig}")
+async def get_job_sequence(
+    job_id: str,
+    contig: str,
+    start: Optional[int] = Query(None, ge=1),
+    end: Optional[int] = Query(None, ge=1),
+    file: Optional[str] = None
+):
+    """
+    Région d'un contig de l'assemblage (lecture directe via un index .fai)
+
+    Args:
+        contig: Nom du contig (premier mot de l'en-tête FASTA)
+        start: Début, 1-based inclusif (défaut: 1)
+        end: Fin incluse (défaut: fin du contig)
+        file: FASTA relatif au run (défaut: contigs filtrés, puis .fna Prokka)
+    """
+    try:
+        fasta_path = await _resolve_run_file(job_id, file, SEQUENCE_FILE_PATTERNS)
+        region = await asyncio.to_thread(fetch_sequence, fasta_path, contig, start, end)
+        return {"job_id": job_id, "file": fasta_path.name, **region}
+
+    except ContigNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RegionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lecture séquence: {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de la lecture de la séquence")
+
+
+@app.get("/api/jobs/{job_id}/features")
+async def get_job_features(
+    job_id: str,
+    contig: str,
+    start: Optional[int] = Query(None, ge=1),
+    end: Optional[int] = Query(None, ge=1),
+    feature_type: Optional[str] = Query(None, alias="type"),
+    limit: int = Query(1000, ge=1, le=10000),
+    file: Optional[str] = None
+):
+    """
+    Annotations (GFF) chevauchant une région d'un contig, via un index d'intervalles
+
+    Args:
+        contig: Nom du contig
+        start: Début de la région, 1-based inclusif (défaut: 1)
+        end: Fin incluse (défaut: fin du contig)
+        feature_type: Type de feature (paramètre `type`, ex: CDS)
+        limit: Nombre maximum de features renvoyés
+        file: GFF relatif au run (défaut: GFF Prokka)
+    """
+    try:
+        gff_path = await _resolve_run_file(job_id, file, FEATURE_FILE_PATTERNS)
+        result = await asyncio.to_thread(query_features, gff_path, contig, start, end, feature_type, limit)
+        return {"job_id": job_id, "file": gff_path.name, **result}
+
+    except ContigNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RegionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lecture annotations: {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de la lecture des annotations")
+
+
 @app.get("/api/jobs/{job_id}/files/serve/{file_path:path}")
-async def serve_job_file(job_id: str, file_path: str):
+async def serve_job_file(job_id: str, file_path: str, request: Request):
     """
     Sert un fichier directement (HTML, images, etc.) pour affichage dans le navigateur
     """
@@ -986,6 +2359,10 @@ async def serve_job_file(job_id: str, file_path: str):
         if not full_path.exists():
             raise HTTPException(status_code=404, detail=f"Fichier non trouvé: {file_path}")
 
+        etag, cache_control = _file_cache_headers(job, full_path)
+        if etag_matches(request, etag):
+            return not_modified(etag, cache_control)
+
         # Déterminer le type MIME
         mime_type, _ = mimetypes.guess_type(str(full_path))
         if mime_type is None:
@@ -995,7 +2372,8 @@ async def serve_job_file(job_id: str, file_path: str):
         return FileResponse(
             path=full_path,
             media_type=mime_type,
-            filename=full_path.name
+            filename=full_path.name,
+            headers={"ETag": etag, "Cache-Control": cache_control}
         )
 
     except HTTPException:
@@ -1005,6 +2383,124 @@ async def serve_job_file(job_id: str, file_path: str):
         raise HTTPException(status_code=500, detail="Erreur lors du service du fichier")
 
 
+# Nombre maximum de runs dans un export groupé
+MAX_ARCHIVE_JOBS = 200
+
+
+def _archive_response(sources: list, archive_format: str, category: Optional[str], filename: str):
+    """StreamingResponse d'une archive de runs (voir run_archive.py)"""
+    from fastapi.responses import StreamingResponse
+
+    if archive_format not in ARCHIVE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Format invalide. Formats supportés: {', '.join(ARCHIVE_FORMATS)}"
+        )
+    categories = _split_param(category)
+    if categories and any('/' in c or c in ('.', '..') for c in categories):
+        raise HTTPException(status_code=400, detail="Catégorie invalide")
+
+    media_type, extension = ARCHIVE_FORMATS[archive_format]
+    return StreamingResponse(
+        stream_archive(sources, archive_format, categories),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}{extension}"',
+            "Cache-Control": "no-store"
+        }
+    )
+
+
+@app.get("/api/jobs/{job_id}/archive")
+async def download_job_archive(
+    job_id: str,
+    archive_format: str = Query("zip", alias="format"),
+    category: Optional[str] = None
+):
+    """
+    Télécharge le répertoire d'un run sous forme d'archive (streaming)
+
+    L'archive est produite à la volée : pas de fichier temporaire, mémoire
+    bornée quelle que soit la taille du run.
+
+    Args:
+        archive_format: "zip" (défaut) ou "tar.gz" (paramètre `format`)
+        category: Dossiers de premier niveau à inclure, séparés par des
+            virgules (ex: 04_arg_detection,06_analysis ; "root" = fichiers
+            à la racine du run)
+    """
+    try:
+        job = await db.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} non trouvé")
+
+        output_dir = job.get('output_dir')
+        if not output_dir or not Path(output_dir).is_dir():
+            raise HTTPException(status_code=404, detail="Répertoire de sortie non trouvé")
+
+        output_path = Path(output_dir)
+        return _archive_response(
+            [(output_path, output_path.name)], archive_format, category, output_path.name
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur export archive: {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de l'export de l'archive")
+
+
+@app.get("/api/archive")
+async def download_jobs_archive(
+    job_ids: str,
+    archive_format: str = Query("zip", alias="format"),
+    category: Optional[str] = None
+):
+    """
+    Export groupé de plusieurs runs dans une seule archive (streaming)
+
+    Chaque run est placé dans son propre dossier ({sample}_{run}) de l'archive.
+
+    Args:
+        job_ids: Identifiants des jobs, séparés par des virgules
+        archive_format: "zip" (défaut) ou "tar.gz" (paramètre `format`)
+        category: Dossiers de premier niveau à inclure (voir /api/jobs/{id}/archive)
+    """
+    try:
+        ids = list(dict.fromkeys(_split_param(job_ids) or []))
+        if not ids:
+            raise HTTPException(status_code=400, detail="Aucun job demandé")
+        if len(ids) > MAX_ARCHIVE_JOBS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Trop de jobs ({len(ids)}), maximum {MAX_ARCHIVE_JOBS}"
+            )
+
+        sources = []
+        seen_dirs = set()
+        for job_id in ids:
+            job = await db.get_job(job_id)
+            if not job:
+                raise HTTPException(status_code=404, detail=f"Job {job_id} non trouvé")
+            output_dir = job.get('output_dir')
+            if not output_dir or not Path(output_dir).is_dir() or output_dir in seen_dirs:
+                continue
+            seen_dirs.add(output_dir)
+            sources.append((Path(output_dir), Path(output_dir).name))
+
+        if not sources:
+            raise HTTPException(status_code=404, detail="Aucun répertoire de sortie trouvé")
+
+        filename = f"export_{len(sources)}_runs_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return _archive_response(sources, archive_format, category, filename)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur export groupé: {e}")
+        raise HTTPException(status_code=500, detail="Erreur lors de l'export groupé")
+
+
 # ============================================================================
 # GESTION DES BASES DE DONNÉES
 # ============================================================================
@@ -1020,6 +2516,12 @@ def _validate_db_key(db_key: str) -> str:
 
 DATABASES_DIR = PIPELINE_DIR / "databases"
 
+# Statut et taille des bases, rafraîchis seulement quand une base change
+db_manifest = DatabaseManifest(DATABASES_DIR)
+
+# Versions des bases : mises à jour construites à part puis activées atomiquement
+db_snapshots = SnapshotStore(DATABASES_DIR)
+
 # Détecter conda et l'environnement arg_detection
 CONDA_BASE = subprocess.getoutput("conda info --base 2>/dev/null").strip()
 CONDA_INIT = f"{CONDA_BASE}/etc/profile.d/conda.sh" if CONDA_BASE else None
@@ -1068,7 +2570,9 @@ DATABASES_CONFIG = {
         "path": "mlst_db",
         "check_files": ["pubmlst"],
         "size_estimate": "~200 MB",
-        "update_cmd": "download_mlst_db"
+        "update_cmd": "download_mlst_db",
+        # `mlst --update` met à jour la base interne de l'outil, pas mlst_db
+        "versioned": False
     },
     "kma": {
         "name": "KMA/ResFinder",
@@ -1080,171 +2584,145 @@ DATABASES_CONFIG = {
     }
 }
 
-# Suivi des téléchargements en cours
-db_download_tasks = {}  # {db_key: {active, status, progress, message, ...}}
-db_download_lock = threading.Lock()
+# Tâches de téléchargement : asyncio, concurrence bornée, état enregistré en base
+download_tasks = DownloadTaskManager(
+    db, max_concurrent=int(os.environ.get("DB_DOWNLOAD_CONCURRENCY", "2"))
+)
+
+# Intervalle des messages de vie d'une commande sans progression mesurable (secondes)
+COMMAND_HEARTBEAT = 2
+
+# Bases abricate indexées pour KMA, et suffixe du fichier gardant l'empreinte
+# (sha256) des séquences source d'un index (même format que le pipeline)
+KMA_SOURCE_DATABASES = ["resfinder", "card", "ncbi"]
+KMA_SOURCE_STAMP = ".sources.sha256"
+
+# Flux SSE de progression : durée d'une connexion (secondes) et délai de reconnexion (ms)
+SSE_STREAM_MAX_AGE = 60
+SSE_RETRY_MS = 1000
 
 
 def _update_download_progress(db_key: str, **kwargs):
-    """Met à jour la progression d'un téléchargement"""
-    with db_download_lock:
-        if db_key in db_download_tasks:
-            db_download_tasks[db_key].update(kwargs)
+    """Met à jour la progression d'un téléchargement (poussée au flux /api/databases/events)"""
+    download_tasks.update(db_key, **kwargs)
+
 
+async def _run_db_download(db_key: str):
+    """
+    Télécharge une base de données (tâche de download_tasks)
 
-def _run_db_download(db_key: str):
-    """Exécute le téléchargement d'une base de données en arrière-plan"""
+    Les bases versionnées sont construites dans une nouvelle version,
+    validée puis activée atomiquement : la version courante reste intacte
+    (et utilisable par les jobs en cours) jusqu'à la bascule. Une erreur ou
+    une annulation supprime la version en construction.
+    """
     config = DATABASES_CONFIG[db_key]
-    db_path = DATABASES_DIR / config["path"]
-    db_path.mkdir(parents=True, exist_ok=True)
+    versioned = config.get("versioned", True)
+    if versioned:
+        db_path = await asyncio.to_thread(db_snapshots.new_version, db_key)
+    else:
+        db_path = DATABASES_DIR / config["path"]
+        db_path.mkdir(parents=True, exist_ok=True)
+    activated = False
 
-    logger.info(f"[DB Download] Début téléchargement: {db_key}")
+    logger.info(f"[DB Download] Début téléchargement: {db_key} ({db_path})")
 
     try:
         if db_key == "amrfinder":
             cmd = _conda_wrap(f"amrfinder_update --force_update --database {db_path}", CONDA_ARG_ENV)
             fallback = _conda_wrap(f"amrfinder --force_update --database {db_path}", CONDA_ARG_ENV)
-            _download_with_command(db_key, f"bash -c '{cmd}'",
-                                   fallback_cmd=f"bash -c '{fallback}'",
-                                   timeout=1800)
+            await _download_with_command(db_key, f"bash -c '{cmd}'",
+                                         fallback_cmd=f"bash -c '{fallback}'",
+                                         timeout=1800)
 
         elif db_key == "pointfinder":
-            _update_download_progress(db_key, message="Suppression ancienne version...", progress=-1)
-            if db_path.exists():
-                shutil.rmtree(db_path)
-            _download_with_command(db_key,
-                                   ["git", "clone", "https://bitbucket.org/genomicepidemiology/pointfinder_db.git", str(db_path)],
-                                   timeout=600, use_shell=False)
+            await _download_with_command(db_key,
+                                         ["git", "clone", "https://bitbucket.org/genomicepidemiology/pointfinder_db.git", str(db_path)],
+                                         timeout=600, use_shell=False)
 
         elif db_key == "card":
-            _download_with_wget(db_key, "https://card.mcmaster.ca/latest/data",
-                                db_path, "card-data.tar.bz2", extract_cmd="tar -xjf")
+            await _download_archive(db_key, "https://card.mcmaster.ca/latest/data",
+                                    db_path, checksum=config.get("checksum"))
 
         elif db_key == "mlst":
             cmd = _conda_wrap("mlst --update 2>&1 || echo 'MLST update done'", CONDA_ARG_ENV)
-            _download_with_command(db_key, f"bash -c '{cmd}'", timeout=1800)
+            await _download_with_command(db_key, f"bash -c '{cmd}'", timeout=1800)
 
         elif db_key == "kma":
-            _download_kma_database(db_key, db_path)
-
-        # Vérifier résultat final
-        new_status = get_db_status(db_key)
-        success = new_status["ready"]
-
-        _update_download_progress(
-            db_key,
-            active=True,
-            status="completed" if success else "failed",
-            progress=100 if success else 0,
-            message=f"{'Terminé avec succès' if success else 'Échec - fichiers manquants'}",
-        )
-        logger.info(f"[DB Download] {db_key} terminé: {'succès' if success else 'échec'}")
-
-    except Exception as e:
-        logger.error(f"[DB Download] Erreur {db_key}: {e}")
-        _update_download_progress(
-            db_key,
-            active=True,
-            status="failed",
-            progress=0,
-            message=f"Erreur: {str(e)[:200]}",
-            error=str(e)[:500],
-        )
-
-    # Garder le statut final visible pendant 30s puis nettoyer
-    time.sleep(30)
-    with db_download_lock:
-        db_download_tasks.pop(db_key, None)
-
-
-def _download_with_wget(db_key: str, url: str, db_path: Path, archive_name: str, extract_cmd: str):
-    """Téléchargement avec wget et suivi de progression via taille du fichier"""
-    archive_path = db_path / archive_name
+            await _download_kma_database(db_key, db_path)
 
-    # Étape 1: Obtenir la taille totale via HEAD request
-    _update_download_progress(db_key, message="Récupération des informations...", progress=0)
-    total_bytes = 0
-    try:
-        import urllib.request
-        req = urllib.request.Request(url, method='HEAD')
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            total_bytes = int(resp.headers.get('Content-Length', 0))
-        if total_bytes:
-            logger.info(f"[DB Download] {db_key}: taille totale = {format_size(total_bytes)}")
-    except Exception as e:
-        logger.warning(f"[DB Download] {db_key}: impossible d'obtenir la taille: {e}")
+        if versioned:
+            # Validation avant bascule : une version incomplète n'est jamais activée
+            complete = await asyncio.to_thread(
+                lambda: any(next(db_path.rglob(name), None) for name in config["check_files"])
+            )
+            if not complete:
+                raise Exception(f"Nouvelle version incomplète: {', '.join(config['check_files'])} introuvable(s)")
+            _update_download_progress(db_key, message="Activation de la nouvelle version...", progress=99)
+            activation = asyncio.ensure_future(
+                asyncio.to_thread(db_snapshots.activate, db_key, config["path"], db_path)
+            )
+            try:
+                await asyncio.shield(activation)
+            finally:
+                # Annulation pendant la bascule : elle est menée à son terme
+                await activation
+                activated = True
+    finally:
+        if versioned and not activated:
+            await asyncio.to_thread(db_snapshots.discard, db_path)
+
+    # Vérifier résultat final (le manifeste est rafraîchi : la mise à jour
+    # a pu modifier des sous-répertoires sans changer le mtime de la base)
+    new_status = await asyncio.to_thread(get_db_status, db_key, True)
+    if not new_status["ready"]:
+        raise Exception("Échec - fichiers manquants")
+
+    _update_download_progress(db_key, status="completed", progress=100,
+                              message="Terminé avec succès", speed="")
+    logger.info(f"[DB Download] {db_key} terminé: succès")
+
+
+async def _download_archive(db_key: str, url: str, db_path: Path, checksum: Optional[str] = None):
+    """
+    Téléchargement d'une archive tar et extraction en flux dans db_path
 
+    L'archive est décompressée et extraite pendant sa réception (pas de
+    fichier intermédiaire ni de passe tar séparée) ; son contenu ne remplace
+    celui de la base qu'une fois la taille et la somme de contrôle vérifiées.
+    """
     _update_download_progress(
         db_key,
         status="downloading",
-        message="Téléchargement en cours...",
-        total_bytes=total_bytes,
+        progress=0,
+        message="Connexion...",
+        total_bytes=0,
         downloaded_bytes=0,
+        extracted_bytes=0,
     )
 
-    # Étape 2: Lancer wget
-    process = subprocess.Popen(
-        ["wget", "-O", archive_name, url],
-        cwd=str(db_path), stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-
-    # Étape 3: Monitorer la taille du fichier pendant le téléchargement
-    last_size = 0
-    last_time = time.time()
-    while process.poll() is None:
-        time.sleep(1)
-        try:
-            if archive_path.exists():
-                current_size = archive_path.stat().st_size
-                now = time.time()
-                elapsed = now - last_time
-                speed = (current_size - last_size) / elapsed if elapsed > 0 else 0
-                progress = int((current_size / total_bytes) * 100) if total_bytes > 0 else -1
-
-                _update_download_progress(
-                    db_key,
-                    progress=min(progress, 99) if progress >= 0 else -1,
-                    downloaded_bytes=current_size,
-                    speed=format_size(int(speed)) + "/s" if speed > 0 else "",
-                    message=f"Téléchargement: {format_size(current_size)}" +
-                            (f" / {format_size(total_bytes)}" if total_bytes > 0 else ""),
-                )
-                last_size = current_size
-                last_time = now
-        except Exception:
-            pass
-
-    # Vérifier le résultat wget
-    if process.returncode != 0:
-        stderr = process.stderr.read().decode(errors="replace")[-500:]
-        raise Exception(f"wget a échoué (code {process.returncode}): {stderr}")
+    def on_progress(downloaded: int, total: int, speed: float, extracted: int):
+        progress = min(int(downloaded * 100 / total), 99) if total else -1
+        _update_download_progress(
+            db_key,
+            progress=progress,
+            downloaded_bytes=downloaded,
+            total_bytes=total,
+            extracted_bytes=extracted,
+            speed=format_size(int(speed)) + "/s" if speed > 0 else "",
+            message=f"Téléchargement et extraction: {format_size(downloaded)}" +
+                    (f" / {format_size(total)}" if total else "") +
+                    f" ({format_size(extracted)} extraits)",
+        )
 
-    # Étape 4: Extraction
-    _update_download_progress(
-        db_key,
-        status="extracting",
-        progress=-1,
-        message="Extraction de l'archive...",
-        speed="",
+    result = await download_and_extract(url, db_path, checksum=checksum, progress=on_progress)
+    logger.info(
+        f"[DB Download] {db_key}: {format_size(result['size'])} reçus, "
+        f"{result['files']} fichiers ({format_size(result['extracted_bytes'])}) extraits ({result['checksum']})"
     )
-    logger.info(f"[DB Download] {db_key}: extraction en cours...")
-    extract_parts = extract_cmd.split() + [archive_name]
-    extract_result = subprocess.run(
-        extract_parts,
-        cwd=str(db_path), capture_output=True, text=True, timeout=1800
-    )
-    if extract_result.returncode != 0:
-        raise Exception(f"Extraction échouée: {extract_result.stderr[:300]}")
-
-    # Étape 5: Nettoyage
-    _update_download_progress(db_key, message="Nettoyage...", progress=95)
-    try:
-        archive_path.unlink(missing_ok=True)
-    except Exception:
-        pass
 
 
-def _download_kma_database(db_key: str, db_path: Path):
+async def _download_kma_database(db_key: str, db_path: Path):
     """Crée les index KMA à partir des bases abricate (resfinder, card, ncbi)"""
     _update_download_progress(db_key, status="downloading", progress=-1,
                               message="Recherche des bases abricate...", speed="")
@@ -1254,12 +2732,11 @@ def _download_kma_database(db_key: str, db_path: Path):
     abricate_db_dir = None
     for env_name in ["abricate_env", CONDA_ARG_ENV]:
         try:
-            result = subprocess.run(
-                f"bash -c '{_conda_wrap('abricate --datadir', env_name)}'",
-                shell=True, capture_output=True, text=True, timeout=30
+            returncode, stdout, _ = await _run_command(
+                db_key, f"bash -c '{_conda_wrap('abricate --datadir', env_name)}'", timeout=30
             )
-            if result.returncode == 0 and result.stdout.strip():
-                candidate = Path(result.stdout.strip())
+            if returncode == 0 and stdout.strip():
+                candidate = Path(stdout.strip())
                 if candidate.is_dir():
                     abricate_db_dir = candidate
                     logger.info(f"[DB Download] kma: abricate trouvé dans env '{env_name}'")
@@ -1289,28 +2766,49 @@ def _download_kma_database(db_key: str, db_path: Path):
     logger.info(f"[DB Download] kma: bases abricate trouvées: {abricate_db_dir}")
     db_path.mkdir(parents=True, exist_ok=True)
 
-    # Créer les index KMA pour chaque base
-    databases_to_index = ["resfinder", "card", "ncbi"]
-    for i, db_name in enumerate(databases_to_index):
+    # Index de la version courante réutilisables : séquences source inchangées
+    previous = await asyncio.to_thread(db_snapshots.current, db_key)
+    to_index = []
+    reused = []
+    for db_name in KMA_SOURCE_DATABASES:
         seq_file = abricate_db_dir / db_name / "sequences"
         if not seq_file.exists():
             logger.warning(f"[DB Download] kma: séquences non trouvées: {seq_file}")
             continue
+        digest = await asyncio.to_thread(_file_sha256, seq_file)
+        if previous and await asyncio.to_thread(_reuse_kma_index, previous, db_path, db_name, digest):
+            reused.append(db_name)
+        else:
+            to_index.append((db_name, seq_file, digest))
 
-        progress_pct = int((i / len(databases_to_index)) * 80)
-        _update_download_progress(db_key, progress=progress_pct,
-                                  message=f"Indexation KMA: {db_name}... ({i+1}/{len(databases_to_index)})")
+    if reused:
+        logger.info(f"[DB Download] kma: index inchangés réutilisés: {', '.join(reused)}")
+    _update_download_progress(
+        db_key, progress=10,
+        message=f"Indexation KMA: {len(to_index)} base(s) à indexer, {len(reused)} inchangée(s)"
+    )
 
+    async def build_index(db_name: str, seq_file: Path, digest: str):
         kma_raw = "kma index -i {} -o {}".format(seq_file, db_path / db_name)
         kma_cmd = "bash -c '{}'".format(_conda_wrap(kma_raw, CONDA_ARG_ENV))
-        result = subprocess.run(
-            kma_cmd, shell=True, capture_output=True, text=True, timeout=300
-        )
-        if result.returncode != 0:
-            logger.warning(f"[DB Download] kma index {db_name} failed: {result.stderr[:200]}")
+        returncode, _, stderr = await _run_command(db_key, kma_cmd, timeout=300)
+        if returncode != 0:
+            logger.warning(f"[DB Download] kma index {db_name} failed: {stderr[:200]}")
         elif (db_path / f"{db_name}.name").exists():
+            (db_path / f"{db_name}{KMA_SOURCE_STAMP}").write_text(digest + "\n")
             logger.info(f"[DB Download] kma: index créé: {db_name}")
 
+    # Index indépendants : construits en parallèle ; au premier échec les
+    # autres sont annulés (processus tués) avant que db_path soit supprimé
+    builds = [asyncio.create_task(build_index(*item)) for item in to_index]
+    try:
+        await asyncio.gather(*builds)
+    except BaseException:
+        for build in builds:
+            build.cancel()
+        await asyncio.gather(*builds, return_exceptions=True)
+        raise
+
     # Vérification finale
     if not (db_path / "resfinder.name").exists():
         raise Exception("Échec création index KMA resfinder")
@@ -1318,7 +2816,88 @@ def _download_kma_database(db_key: str, db_path: Path):
     _update_download_progress(db_key, progress=90, message="Index KMA créés avec succès")
 
 
-def _download_with_command(db_key: str, cmd, fallback_cmd=None, timeout: int = 1800, use_shell: bool = True):
+def _file_sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                break
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _reuse_kma_index(previous: Path, db_path: Path, db_name: str, digest: str) -> bool:
+    """
+    Reprend dans db_path l'index KMA de db_name de la version précédente
+
+    Uniquement si son empreinte correspond aux séquences actuelles ; les
+    fichiers sont liés (liens physiques) quand c'est possible, copiés sinon.
+
+    Returns:
+        True si l'index a été repris
+    """
+    stamp = previous / f"{db_name}{KMA_SOURCE_STAMP}"
+    try:
+        if stamp.read_text().strip() != digest or not (previous / f"{db_name}.name").exists():
+            return False
+    except OSError:
+        return False
+    for source in previous.glob(f"{db_name}.*"):
+        target = db_path / source.name
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+    return True
+
+
+async def _run_command(db_key: str, cmd, timeout: int, use_shell: bool = True,
+                       label: Optional[str] = None):
+    """
+    Exécute une commande sans bloquer la boucle d'événements
+
+    Le processus et ses enfants (groupe dédié) sont tués en cas de timeout
+    ou d'annulation de la tâche. Avec `label`, un message de vie (durée
+    écoulée) est publié toutes les COMMAND_HEARTBEAT secondes.
+
+    Returns:
+        (code de retour, stdout, stderr)
+    """
+    if use_shell:
+        process = await asyncio.create_subprocess_shell(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True
+        )
+    else:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True
+        )
+    communicate = asyncio.ensure_future(process.communicate())
+    start_time = time.monotonic()
+    try:
+        while True:
+            done, _ = await asyncio.wait({communicate}, timeout=COMMAND_HEARTBEAT)
+            if done:
+                break
+            elapsed = int(time.monotonic() - start_time)
+            if elapsed > timeout:
+                raise Exception(f"Timeout après {timeout}s")
+            if label:
+                mins, secs = divmod(elapsed, 60)
+                _update_download_progress(db_key, message=f"{label} ({mins}m{secs:02d}s)")
+    except BaseException:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        communicate.cancel()
+        raise
+
+    stdout, stderr = communicate.result()
+    return process.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+
+async def _download_with_command(db_key: str, cmd, fallback_cmd=None, timeout: int = 1800, use_shell: bool = True):
     """Exécute une commande de téléchargement avec progression indéterminée.
 
     Args:
@@ -1335,94 +2914,76 @@ def _download_with_command(db_key: str, cmd, fallback_cmd=None, timeout: int = 1
         speed="",
     )
 
-    process = subprocess.Popen(cmd, shell=use_shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    # Monitorer le process avec messages de vie
-    start_time = time.time()
-    while process.poll() is None:
-        time.sleep(2)
-        elapsed = int(time.time() - start_time)
-        mins, secs = divmod(elapsed, 60)
-        _update_download_progress(
-            db_key,
-            message=f"Installation en cours... ({mins}m{secs:02d}s)",
-        )
-        if elapsed > timeout:
-            process.kill()
-            raise Exception(f"Timeout après {timeout}s")
+    returncode, _, stderr = await _run_command(
+        db_key, cmd, timeout, use_shell=use_shell, label="Installation en cours..."
+    )
 
-    if process.returncode != 0 and fallback_cmd:
+    if returncode != 0 and fallback_cmd:
         logger.info(f"[DB Download] {db_key}: commande principale échouée, essai fallback...")
         _update_download_progress(db_key, message="Essai méthode alternative...")
-        process = subprocess.Popen(fallback_cmd, shell=use_shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        start_time = time.time()
-        while process.poll() is None:
-            time.sleep(2)
-            elapsed = int(time.time() - start_time)
-            mins, secs = divmod(elapsed, 60)
-            _update_download_progress(
-                db_key,
-                message=f"Méthode alternative... ({mins}m{secs:02d}s)",
-            )
-            if elapsed > timeout:
-                process.kill()
-                raise Exception(f"Timeout après {timeout}s")
+        returncode, _, stderr = await _run_command(
+            db_key, fallback_cmd, timeout, use_shell=use_shell, label="Méthode alternative..."
+        )
+
+    if returncode != 0:
+        raise Exception(f"Commande échouée (code {returncode}): {stderr[-500:]}")
+
+
+async def _release_db_pin(job_id: str):
+    """Libère les versions de bases épinglées par un job terminé"""
+    try:
+        await asyncio.to_thread(db_snapshots.release, job_id)
+    except OSError as e:
+        logger.warning(f"Libération des bases épinglées du job {job_id} impossible: {e}")
 
-    if process.returncode != 0:
-        stderr = process.stderr.read().decode(errors="replace")[-500:]
-        raise Exception(f"Commande échouée (code {process.returncode}): {stderr}")
 
+def _prepare_db_snapshots():
+    """
+    Convertit les bases non versionnées (répertoires réels) et supprime les
+    versions orphelines, y compris les constructions coupées par un arrêt
+    """
+    for db_key, config in DATABASES_CONFIG.items():
+        if config.get("versioned", True):
+            try:
+                db_snapshots.adopt_legacy(db_key, config["path"])
+            except OSError as e:
+                logger.warning(f"Conversion de la base {db_key} en version impossible: {e}")
+    db_snapshots.prune(interrupted=True)
+
+
+def get_db_status(db_key: str, refresh: bool = False) -> dict:
+    """
+    Vérifie le statut d'une base de données
 
-def get_db_status(db_key: str) -> dict:
-    """Vérifie le statut d'une base de données"""
+    Lu dans le manifeste (un stat) si le répertoire de la base n'a pas
+    changé ; sinon seuls les répertoires modifiés sont relistés.
+
+    Args:
+        db_key: Clé de la base
+        refresh: Forcer le rafraîchissement du manifeste
+    """
     config = DATABASES_CONFIG.get(db_key)
     if not config:
         return None
 
     db_path = DATABASES_DIR / config["path"]
-
-    # Vérifier si le dossier existe
-    exists = db_path.exists()
-
-    # Vérifier si les fichiers requis sont présents
-    ready = False
-    if exists:
-        for check_file in config["check_files"]:
-            # Chercher le fichier (peut être dans un sous-dossier)
-            found = list(db_path.rglob(check_file))
-            if found:
-                ready = True
-                break
-
-    # Calculer la taille
-    size = 0
-    if exists:
-        try:
-            for f in db_path.rglob("*"):
-                if f.is_file():
-                    size += f.stat().st_size
-        except OSError:
-            pass
-
-    # Date de dernière modification
-    last_updated = None
-    if exists:
-        try:
-            last_updated = datetime.fromtimestamp(db_path.stat().st_mtime).isoformat()
-        except OSError:
-            pass
+    # Chemin résolu : une nouvelle version activée est un autre répertoire
+    status = db_manifest.status(db_key, db_path.resolve(), config["check_files"], refresh=refresh)
 
     return {
         "key": db_key,
         "name": config["name"],
         "description": config["description"],
         "path": str(db_path),
-        "exists": exists,
-        "ready": ready,
-        "size_bytes": size,
-        "size_human": format_size(size),
+        "exists": status["exists"],
+        "ready": status["ready"],
+        "size_bytes": status["size_bytes"],
+        "size_human": format_size(status["size_bytes"]),
         "size_estimate": config["size_estimate"],
-        "last_updated": last_updated
+        "file_count": status["file_count"],
+        "version": current.name if (current := db_snapshots.current(db_key)) else None,
+        "last_updated": datetime.fromtimestamp(status["mtime"]).isoformat() if status["mtime"] else None,
+        "scanned_at": datetime.fromtimestamp(status["scanned_at"]).isoformat() if status["scanned_at"] else None,
     }
 
 
@@ -1438,13 +2999,17 @@ def format_size(size_bytes: int) -> str:
 
 
 @app.get("/api/databases")
-async def list_databases():
-    """Liste toutes les bases de données avec leur statut"""
-    databases = []
-    for db_key in DATABASES_CONFIG:
-        status = get_db_status(db_key)
-        if status:
-            databases.append(status)
+async def list_databases(refresh: bool = False):
+    """
+    Liste toutes les bases de données avec leur statut
+
+    Args:
+        refresh: Recalculer le statut de chaque base (sinon manifeste)
+    """
+    def collect():
+        return [get_db_status(db_key, refresh=refresh) for db_key in DATABASES_CONFIG]
+
+    databases = [db_status for db_status in await asyncio.to_thread(collect) if db_status]
 
     return {
         "databases_dir": str(DATABASES_DIR),
@@ -1452,11 +3017,46 @@ async def list_databases():
     }
 
 
+@app.get("/api/databases/events")
+async def stream_db_download_events(request: Request):
+    """
+    Flux SSE (text/event-stream) de la progression des téléchargements de bases
+
+    Un événement `progress` par mise à jour (état de /progress, avec `key`),
+    en commençant par le dernier état de chaque base ; un commentaire de
+    maintien de connexion toutes les 15 secondes sans mise à jour. Le flux
+    est fermé après SSE_STREAM_MAX_AGE secondes (EventSource se reconnecte
+    seul) pour ne pas retenir l'arrêt du serveur, qui attend la fin des
+    réponses en cours.
+    """
+    from fastapi.responses import StreamingResponse
+
+    async def stream():
+        opened_at = time.monotonic()
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        async with aclosing(download_tasks.listen()) as states:
+            async for state in states:
+                # Âge vérifié à chaque événement : un téléchargement actif
+                # pousse des mises à jour sans jamais laisser passer de keepalive
+                if await request.is_disconnected() or time.monotonic() - opened_at > SSE_STREAM_MAX_AGE:
+                    break
+                if state is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: progress\ndata: {json.dumps(state, default=str)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/databases/{db_key}")
-async def get_database_status(db_key: str):
+async def get_database_status(db_key: str, refresh: bool = False):
     """Récupère le statut d'une base de données spécifique"""
     _validate_db_key(db_key)
-    db_status = get_db_status(db_key)
+    db_status = await asyncio.to_thread(get_db_status, db_key, refresh)
     if not db_status:
         raise HTTPException(
             status_code=404,
@@ -1469,7 +3069,8 @@ async def get_database_status(db_key: str):
 async def update_database(db_key: str):
     """
     Lance la mise à jour/téléchargement d'une base de données en arrière-plan.
-    Retourne immédiatement. Utiliser GET /api/databases/{db_key}/progress pour suivre.
+    Retourne immédiatement. Suivre la progression avec le flux
+    GET /api/databases/events (ou GET /api/databases/{db_key}/progress).
     """
     _validate_db_key(db_key)
     if db_key not in DATABASES_CONFIG:
@@ -1479,34 +3080,14 @@ async def update_database(db_key: str):
         )
 
     # Vérifier si un téléchargement est déjà en cours
-    with db_download_lock:
-        if db_key in db_download_tasks and db_download_tasks[db_key].get("active"):
-            current = db_download_tasks[db_key]
-            if current.get("status") not in ("completed", "failed"):
-                raise HTTPException(
-                    status_code=409,
-                    detail=f"Téléchargement déjà en cours pour '{db_key}'"
-                )
+    if download_tasks.is_running(db_key):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Téléchargement déjà en cours pour '{db_key}'"
+        )
 
     config = DATABASES_CONFIG[db_key]
-
-    # Initialiser le tracking
-    with db_download_lock:
-        db_download_tasks[db_key] = {
-            "active": True,
-            "status": "starting",
-            "progress": 0,
-            "message": "Démarrage...",
-            "downloaded_bytes": 0,
-            "total_bytes": 0,
-            "speed": "",
-            "started_at": datetime.now().isoformat(),
-            "error": None,
-        }
-
-    # Lancer en arrière-plan
-    thread = threading.Thread(target=_run_db_download, args=(db_key,), daemon=True)
-    thread.start()
+    task = download_tasks.submit(db_key, lambda: _run_db_download(db_key))
 
     logger.info(f"[DB Download] Téléchargement lancé en arrière-plan: {db_key}")
 
@@ -1514,17 +3095,27 @@ async def update_database(db_key: str):
         "started": True,
         "message": f"Téléchargement de {config['name']} lancé en arrière-plan",
         "db_key": db_key,
+        "status": task["status"],
     }
 
 
+@app.post("/api/databases/{db_key}/cancel")
+async def cancel_database_update(db_key: str):
+    """Annule le téléchargement en cours (ou en attente) d'une base de données"""
+    _validate_db_key(db_key)
+    if not await download_tasks.cancel(db_key):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Aucun téléchargement en cours pour '{db_key}'"
+        )
+    return download_tasks.get(db_key)
+
+
 @app.get("/api/databases/{db_key}/progress")
 async def get_db_download_progress(db_key: str):
-    """Retourne la progression du téléchargement d'une base de données"""
+    """Retourne la progression (ou le dernier statut) du téléchargement d'une base de données"""
     _validate_db_key(db_key)
-    with db_download_lock:
-        if db_key in db_download_tasks:
-            return dict(db_download_tasks[db_key])
-    return {"active": False}
+    return download_tasks.get(db_key) or {"active": False}
 
 
 # ============================================================================
@@ -157,6 +157,25 @@ class JobListResponse(BaseModel):
     """Réponse pour la liste des jobs"""
     total: int
     jobs: List[JobListItem]
+    next_cursor: Optional[str] = Field(None, description="Curseur de la page suivante (None si dernière page)")
+
+
+class JobEvent(BaseModel):
+    """Événement de l'historique d'un job (statut, module, métriques)"""
+    id: int
+    created_at: datetime
+    event_type: str = Field(..., description="status, module_start, module_end, module_skipped, metrics")
+    module: Optional[str] = None
+    status: Optional[str] = None
+    duration_s: Optional[float] = Field(None, description="Durée en secondes (fin de module ou de job)")
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+
+class JobEventListResponse(BaseModel):
+    """Historique des événements d'un job"""
+    job_id: str
+    events: List[JobEvent]
+    next_after: Optional[int] = Field(None, description="Valeur after pour la page suivante (None si dernière page)")
 
 
 # ============================================================================
@@ -220,6 +239,33 @@ class DeduplicatedGene(BaseModel):
     priority: Optional[str] = Field(None, description="Priorité calculée: CRITICAL, HIGH, MEDIUM")
 
 
+class GenePage(BaseModel):
+    """Page de gènes dédupliqués filtrés et triés côté serveur"""
+    job_id: str
+    total: int = Field(..., description="Nombre de gènes correspondant aux filtres")
+    count: int = Field(..., description="Nombre de gènes dans cette page")
+    next_cursor: Optional[str] = Field(None, description="Curseur de la page suivante (None si dernière page)")
+    genes: List[DeduplicatedGene]
+
+
+class TableColumn(BaseModel):
+    """Colonne d'un fichier tabulaire converti"""
+    name: str
+    type: str = Field(..., description="number ou text")
+
+
+class TablePage(BaseModel):
+    """Page d'un fichier TSV interrogé côté serveur (projection, filtres, tri)"""
+    job_id: str
+    path: str
+    columns: List[TableColumn]
+    total_rows: int = Field(..., description="Nombre de lignes du fichier")
+    total: int = Field(..., description="Nombre de lignes correspondant aux filtres")
+    count: int = Field(..., description="Nombre de lignes dans cette page")
+    next_cursor: Optional[str] = Field(None, description="Curseur de la page suivante (None si dernière page)")
+    rows: List[List[Any]] = Field(..., description="Valeurs dans l'ordre de `columns`")
+
+
 class DeduplicationStats(BaseModel):
     """Statistiques de déduplication"""
     total_raw: int = Field(..., description="Nombre total de gènes avant déduplication")
@@ -277,6 +323,48 @@ class AnalysisResults(BaseModel):
     completed_at: datetime
 
 
+# ============================================================================
+# INDEX DES GÈNES (recherche inter-échantillons)
+# ============================================================================
+
+class GeneSampleHit(BaseModel):
+    """Occurrence d'un gène dans un échantillon"""
+    job_id: str
+    sample_id: str
+    gene: str
+    identity: Optional[float] = None
+    coverage: Optional[float] = None
+    priority: Optional[str] = None
+    source: Optional[str] = None
+    resistance: Optional[str] = None
+    subclass: Optional[str] = None
+    element_type: Optional[str] = None
+    completed_at: Optional[datetime] = None
+
+
+class GeneSamplesResponse(BaseModel):
+    """Réponse pour la recherche des échantillons portant un gène"""
+    query: str
+    match: str = Field(..., description="Type de correspondance: exact ou prefix")
+    total: int
+    num_samples: int
+    hits: List[GeneSampleHit]
+
+
+class IndexedGene(BaseModel):
+    """Gène présent dans l'index inter-échantillons"""
+    gene: str
+    num_samples: int
+    num_hits: int
+    max_identity: Optional[float] = None
+
+
+class IndexedGeneListResponse(BaseModel):
+    """Réponse pour la liste des gènes indexés"""
+    total: int
+    genes: List[IndexedGene]
+
+
 class ErrorResponse(BaseModel):
     """Réponse d'erreur standard"""
     detail: str
@@ -3,8 +3,11 @@ Parser pour les fichiers de résultats du pipeline ARG
 """
 import csv
 import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Iterable
 import logging
 import re
 
@@ -14,99 +17,33 @@ logger = logging.getLogger(__name__)
 
 
 # ===== CLASSIFICATION UNIQUE DE PRIORITÉ (OMS/CDC) =====
-# Source de vérité utilisée par le backend, le frontend et le rapport HTML
-
-CRITICAL_CLASSES = [
-    'carbapenem', 'polymyxin', 'colistin', 'glycopeptide', 'vancomycin',
-    'oxazolidinone', 'linezolid', 'lipopeptide', 'daptomycin', 'tigecycline'
-]
-HIGH_CLASSES = [
-    'cephalosporin', 'fluoroquinolone', 'quinolone', 'macrolide',
-    'aminoglycoside', 'beta-lactam', 'penicillin'
-]
-MEDIUM_CLASSES = [
-    'tetracycline', 'phenicol', 'chloramphenicol', 'sulfonamide', 'sulphonamide',
-    'trimethoprim', 'rifamycin', 'rifampicin', 'fosfomycin', 'nitroimidazole',
-    'nitrofuran', 'fusidic', 'mupirocin', 'streptogramin'
-]
-CRITICAL_GENES_KW = [
-    'ndm', 'kpc', 'vim', 'imp', 'oxa-48', 'oxa-23', 'oxa-24', 'oxa-58', 'oxa-181',
-    'mcr-1', 'mcr-2', 'mcr-3', 'mcr-4', 'mcr-5', 'mcr-6', 'mcr-7', 'mcr-8', 'mcr-9', 'mcr-10', 'mcr',
-    'vana', 'vanb', 'vanc', 'vand', 'vane', 'vancomycin',
-    'meca', 'mecc', 'methicillin', 'mrsa',
-    'optra', 'cfr', 'poxta',
-    'daptomycin'
-]
-HIGH_GENES_KW = [
-    'ctx-m', 'ctxm', 'tem', 'shv', 'esbl', 'cmy', 'dha', 'acc',
-    'qnra', 'qnrb', 'qnrs', 'qnrd', 'qnr', 'gyra', 'parc', "aac(6')-ib-cr",
-    'erma', 'ermb', 'ermc', 'erm(', 'mefa', 'mef(', 'mph(',
-    'aac(', 'aph(', 'ant(', 'arma', 'rmta', 'rmtb', 'rmtc', 'npma'
-]
-
-
-def classify_priority(gene_data: dict) -> str:
+# Source de vérité partagée avec le rapport HTML : python/arg_priority.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "python"))
+from arg_priority import classify_priority  # noqa: E402
+
+
+def classify_priorities(genes: Iterable[ARGGene]) -> None:
     """
-    Classifie la priorité d'un gène ARG selon les standards OMS/CDC.
-    SOURCE UNIQUE DE VÉRITÉ - utilisée partout.
+    Calcule en une seule passe la priorité de tous les gènes détectés
 
     Args:
-        gene_data: dict avec les clés gene, product, resistance, subclass, coverage, identity
-
-    Returns:
-        'CRITICAL', 'HIGH' ou 'MEDIUM'
+        genes: Gènes ARGGene (tous outils confondus), mis à jour en place
     """
-    resistance = (gene_data.get('resistance') or '').lower()
-    subclass = (gene_data.get('subclass') or '').lower()
-    gene_name = (gene_data.get('gene') or '').lower()
-    product = (gene_data.get('product') or '').lower()
-    combined = f"{resistance} {subclass} {gene_name} {product}"
-
-    coverage = float(gene_data.get('coverage') or 0)
-    identity = float(gene_data.get('identity') or 0)
-
-    score = 0
-
-    # 1. Score basé sur la classe d'antibiotique
-    for kw in CRITICAL_CLASSES:
-        if kw in combined:
-            score += 4
-            break
-    else:
-        for kw in HIGH_CLASSES:
-            if kw in combined:
-                score += 3
-                break
-        else:
-            for kw in MEDIUM_CLASSES:
-                if kw in combined:
-                    score += 2
-                    break
-            else:
-                score = 1
-
-    # 2. Bonus gènes critiques (+2)
-    for kw in CRITICAL_GENES_KW:
-        if kw in gene_name or kw in product:
-            score += 2
-            break
-
-    # 3. Bonus gènes haute priorité (+1, seulement si pas encore CRITICAL)
-    if score < 5:
-        for kw in HIGH_GENES_KW:
-            if kw in gene_name or kw in product:
-                score += 1
-                break
+    for gene in genes:
+        gene.priority = classify_priority({
+            'gene': gene.gene,
+            'product': gene.product,
+            'resistance': gene.resistance,
+            'subclass': gene.subclass,
+            'coverage': gene.coverage,
+            'identity': gene.identity,
+        })
 
-    # 4. Bonus qualité de détection
-    if coverage >= 95 and identity >= 95:
-        score += 1
 
-    if score >= 5:
-        return 'CRITICAL'
-    if score >= 3:
-        return 'HIGH'
-    return 'MEDIUM'
+# Pool borné partagé pour parser les sorties des outils en parallèle
+# (hors de l'event loop, les parsers sont bloquants)
+PARSER_WORKERS = int(os.environ.get("PARSER_WORKERS", "5"))
+_parser_pool = ThreadPoolExecutor(max_workers=PARSER_WORKERS, thread_name_prefix="output-parser")
 
 
 class OutputParser:
@@ -819,48 +756,54 @@ class OutputParser:
         """
         Parse tous les outils de détection ARG disponibles
 
+        Les parsers de chaque outil s'exécutent en parallèle dans le pool
+        borné du module ; la priorité est ensuite calculée en une passe.
+
         Returns:
             Dict[str, DetectionResults]: Résultats par outil
         """
-        results = {}
+        parsed = self._run_parsers({
+            'resfinder': self.parse_resfinder,
+            'amrfinderplus': self.parse_amrfinderplus,  # tous les types
+            'card': self.parse_card,
+            'vfdb': self.parse_vfdb,  # Virulence
+            'ncbi': self.parse_ncbi,
+        })
+        results = {name: detection for name, detection in parsed.items() if detection}
+
+        # Calculer la priorité pour tous les gènes de tous les outils
+        classify_priorities(
+            gene for detection in results.values() for gene in detection.genes
+        )
 
-        # Parser ResFinder
-        resfinder = self.parse_resfinder()
-        if resfinder:
-            results['resfinder'] = resfinder
-
-        # Parser AMRFinderPlus (tous les types)
-        amrfinder = self.parse_amrfinderplus()
-        if amrfinder:
-            results['amrfinderplus'] = amrfinder
-
-        # Parser CARD
-        card = self.parse_card()
-        if card:
-            results['card'] = card
-
-        # Parser VFDB (Virulence)
-        vfdb = self.parse_vfdb()
-        if vfdb:
-            results['vfdb'] = vfdb
-
-        # Parser NCBI
-        ncbi = self.parse_ncbi()
-        if ncbi:
-            results['ncbi'] = ncbi
-
-        # Calculer la priorité pour chaque gène de chaque outil
-        for tool_name, detection in results.items():
-            for gene in detection.genes:
-                gene.priority = classify_priority({
-                    'gene': gene.gene,
-                    'product': gene.product,
-                    'resistance': gene.resistance,
-                    'subclass': gene.subclass,
-                    'coverage': gene.coverage,
-                    'identity': gene.identity,
-                })
+        return results
+
+    @staticmethod
+    def _run_parsers(parsers: Dict[str, Callable[[], Optional[DetectionResults]]]) -> Dict[str, Optional[DetectionResults]]:
+        """
+        Exécute des parsers d'outils en parallèle dans le pool partagé
+
+        Args:
+            parsers: Dict nom → méthode de parsing (sans argument)
 
+        Returns:
+            Dict nom → résultat, dans l'ordre des parsers fournis
+
+        Raises:
+            Exception: Première erreur d'un parser, une fois tous terminés
+                (pas de résultats partiels, qui seraient mis en cache)
+        """
+        futures = {name: _parser_pool.submit(parser) for name, parser in parsers.items()}
+        results = {}
+        error = None
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f"Erreur parsing {name}: {e}")
+                error = error or e
+        if error:
+            raise error
         return results
 
     def get_unique_resistance_types(
@@ -1012,6 +955,13 @@ class OutputParser:
 
         # Priorité 2: fallback sur parsing direct (si rapport pas encore généré)
         logger.info("Fallback: parsing direct des fichiers TSV")
+        parsed = self._run_parsers({
+            'amrfinderplus': self.parse_amrfinderplus,
+            'resfinder': self.parse_resfinder,
+            'card': self.parse_card,
+            'vfdb': self.parse_vfdb,
+            'ncbi': self.parse_ncbi,
+        })
         all_genes = []
         by_source = {}
         stats = {
@@ -1021,8 +971,8 @@ class OutputParser:
             'duplicates_removed': 0
         }
 
-        # 1. Parser AMRFinderPlus (source principale)
-        amrfinder = self.parse_amrfinderplus()
+        # 1. AMRFinderPlus (source principale)
+        amrfinder = parsed['amrfinderplus']
         if amrfinder and amrfinder.genes:
             for gene in amrfinder.genes:
                 gene_dict = {
@@ -1048,8 +998,8 @@ class OutputParser:
             stats['total_raw'] += len(amrfinder.genes)
             logger.info(f"Dédup: {len(amrfinder.genes)} gènes AMRFinderPlus ajoutés")
 
-        # 2. Parser ResFinder (fusionner si match, sinon ajouter)
-        resfinder = self.parse_resfinder()
+        # 2. ResFinder (fusionner si match, sinon ajouter)
+        resfinder = parsed['resfinder']
         if resfinder and resfinder.genes:
             added = 0
             merged = 0
@@ -1099,8 +1049,8 @@ class OutputParser:
             stats['duplicates_removed'] += merged
             logger.info(f"Dédup: ResFinder - {added} ajoutés, {merged} fusionnés")
 
-        # 3. Parser CARD (ajouter si unique)
-        card = self.parse_card()
+        # 3. CARD (ajouter si unique)
+        card = parsed['card']
         if card and card.genes:
             added = 0
             for gene in card.genes:
@@ -1138,8 +1088,8 @@ class OutputParser:
             stats['duplicates_removed'] += len(card.genes) - added
             logger.info(f"Dédup: CARD - {added} ajoutés, {len(card.genes) - added} doublons")
 
-        # 4. Parser VFDB (ajouter si unique - Virulence)
-        vfdb = self.parse_vfdb()
+        # 4. VFDB (ajouter si unique - Virulence)
+        vfdb = parsed['vfdb']
         if vfdb and vfdb.genes:
             added = 0
             for gene in vfdb.genes:
@@ -1176,8 +1126,8 @@ class OutputParser:
             stats['duplicates_removed'] += len(vfdb.genes) - added
             logger.info(f"Dédup: VFDB - {added} ajoutés, {len(vfdb.genes) - added} doublons")
 
-        # 5. Parser NCBI (ajouter si unique)
-        ncbi = self.parse_ncbi()
+        # 5. NCBI (ajouter si unique)
+        ncbi = parsed['ncbi']
         if ncbi and ncbi.genes:
             added = 0
             for gene in ncbi.genes:
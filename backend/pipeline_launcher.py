@@ -80,10 +80,17 @@ class PipelineLauncher:
         # Par défaut, considérer comme SRA
         return InputType.SRA
 
+    def get_output_dir(self, sample_id: str, run_number: int) -> Path:
+        """Répertoire de sortie d'un run ({work_dir}/outputs/{sample_id}_{run_number})"""
+        return self.work_dir / "outputs" / f"{sample_id}_{run_number}"
+
     def get_next_run_number(self, sample_id: str) -> int:
         """
         Détermine le prochain numéro de run pour un sample_id
 
+        Repli utilisé uniquement si aucun numéro n'est fourni à launch()
+        (l'API attribue les numéros via Database.allocate_run_number).
+
         Scanne le répertoire outputs/ pour trouver les runs existants
         au format exact {sample_id}_{entier} et retourne max+1.
         Les anciens formats (ex: SRR_v3.2_20260128_124016) sont ignorés.
@@ -123,7 +130,9 @@ class PipelineLauncher:
         prokka_mode: str = "auto",
         prokka_genus: Optional[str] = None,
         prokka_species: Optional[str] = None,
-        force: bool = True
+        force: bool = True,
+        run_number: Optional[int] = None,
+        db_dir: Optional[str] = None
     ) -> str:
         """
         Construit la commande bash complète pour lancer le pipeline
@@ -135,6 +144,8 @@ class PipelineLauncher:
             prokka_genus: Genre (si mode custom)
             prokka_species: Espèce (si mode custom)
             force: Mode non-interactif
+            run_number: Numéro de run imposé (le pipeline ne scanne plus outputs/)
+            db_dir: Répertoire des bases (versions épinglées pour ce job)
 
         Returns:
             str: Commande bash complète
@@ -154,6 +165,12 @@ class PipelineLauncher:
             if prokka_species:
                 cmd_parts.append(f"--prokka-species {shlex.quote(prokka_species)}")
 
+        if run_number is not None:
+            cmd_parts.append(f"--run-number {int(run_number)}")
+
+        if db_dir:
+            cmd_parts.append(f"--db-dir {shlex.quote(str(db_dir))}")
+
         if force:
             cmd_parts.append("--force")
 
@@ -175,6 +192,8 @@ class PipelineLauncher:
         prokka_genus: Optional[str] = None,
         prokka_species: Optional[str] = None,
         force: bool = True,
+        run_number: Optional[int] = None,
+        db_dir: Optional[str] = None,
         on_complete: Optional[Callable] = None
     ) -> Dict[str, Any]:
         """
@@ -187,6 +206,8 @@ class PipelineLauncher:
             prokka_genus: Genre (si custom)
             prokka_species: Espèce (si custom)
             force: Mode non-interactif
+            run_number: Numéro de run réservé (sinon scan de outputs/)
+            db_dir: Répertoire des bases (versions épinglées pour ce job)
             on_complete: Callback optionnel appelé à la fin (async function)
 
         Returns:
@@ -199,7 +220,8 @@ class PipelineLauncher:
         """
         # Détecter type d'input et run number
         input_type = self.detect_input_type(sample_id)
-        run_number = self.get_next_run_number(sample_id)
+        if run_number is None:
+            run_number = self.get_next_run_number(sample_id)
 
         # Construire commande
         command = self.build_command(
@@ -208,7 +230,9 @@ class PipelineLauncher:
             prokka_mode=prokka_mode,
             prokka_genus=prokka_genus,
             prokka_species=prokka_species,
-            force=force
+            force=force,
+            run_number=run_number,
+            db_dir=db_dir
         )
 
         logger.info(f"Lancement pipeline pour {sample_id} (run {run_number})")
@@ -235,7 +259,7 @@ class PipelineLauncher:
             "command": command,
             "input_type": input_type.value,
             "run_number": run_number,
-            "output_dir": str(self.work_dir / "outputs" / f"{sample_id}_{run_number}")
+            "output_dir": str(self.get_output_dir(sample_id, run_number))
         }
 
     async def _monitor_completion(
@@ -276,8 +300,7 @@ class PipelineLauncher:
         Returns:
             Path vers le fichier log ou None si non trouvé
         """
-        output_dir = self.work_dir / "outputs" / f"{sample_id}_{run_number}"
-        logs_dir = output_dir / "logs"
+        logs_dir = self.get_output_dir(sample_id, run_number) / "logs"
 
         if not logs_dir.exists():
             return None
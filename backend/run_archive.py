@@ -0,0 +1,224 @@
+"""
+Export en streaming des répertoires de run (zip ou tar.gz)
+
+L'archive est écrite par un thread dédié dans un tube borné (_ArchivePipe) et
+envoyée au client au fil de l'eau : aucun fichier temporaire, et la mémoire
+utilisée est plafonnée à PIPE_CHUNKS × CHUNK_SIZE par téléchargement, quelle
+que soit la taille du run. Si le client se déconnecte, le thread d'écriture
+est interrompu à l'écriture suivante.
+
+Le même chemin sert à l'export d'un run et à l'export groupé de plusieurs
+runs (un dossier par run dans l'archive).
+"""
+import asyncio
+import gzip
+import io
+import os
+import queue
+import shutil
+import tarfile
+import threading
+import zipfile
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Formats supportés : (type MIME, extension du nom de fichier)
+ARCHIVE_FORMATS = {
+    "zip": ("application/zip", ".zip"),
+    "tar.gz": ("application/gzip", ".tar.gz"),
+}
+
+# Taille des blocs envoyés au client et lus dans les fichiers
+CHUNK_SIZE = 256 * 1024
+
+# Nombre de blocs en attente entre le thread d'écriture et le client
+PIPE_CHUNKS = 8
+
+# Niveau de compression (6 : bon compromis débit / taille, 9 est ~3x plus lent)
+COMPRESS_LEVEL = 6
+
+# Fichiers déjà compressés : stockés tels quels dans le zip
+STORED_EXTENSIONS = {'.gz', '.bz2', '.xz', '.zst', '.zip', '.png', '.jpg', '.jpeg', '.pdf'}
+
+
+class ArchiveCancelled(Exception):
+    """Le client a abandonné le téléchargement"""
+
+
+class _ArchivePipe(io.RawIOBase):
+    """
+    Flux en écriture seule, non seekable, relié à une file bornée
+
+    write() regroupe les octets en blocs de CHUNK_SIZE et bloque quand la
+    file est pleine (contre-pression du client). Le dernier élément de la
+    file est None (fin) ou l'exception du thread d'écriture.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.queue: "queue.Queue" = queue.Queue(maxsize=PIPE_CHUNKS)
+        self.cancelled = threading.Event()
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.cancelled.is_set():
+            raise ArchiveCancelled()
+        self._buffer += data
+        if len(self._buffer) >= CHUNK_SIZE:
+            self._send(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def _send(self, item):
+        while True:
+            try:
+                self.queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self.cancelled.is_set():
+                    raise ArchiveCancelled()
+
+    def finish(self, error: Optional[BaseException] = None):
+        """Envoie le reste du tampon puis la fin du flux (ou l'erreur)"""
+        try:
+            if error is None and self._buffer:
+                self._send(bytes(self._buffer))
+            self._send(error)
+        except ArchiveCancelled:
+            # Personne ne lit plus : vider la file pour débloquer le lecteur éventuel
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait(None)
+        self._buffer.clear()
+
+
+def iter_run_files(root: Path, categories: Optional[List[str]] = None) -> Iterator[Tuple[Path, str]]:
+    """
+    Parcourt les fichiers d'un run dans un ordre stable
+
+    Args:
+        root: Répertoire du run
+        categories: Dossiers de premier niveau à inclure ("root" = fichiers
+            à la racine du run), None = tout le run
+
+    Yields:
+        (chemin absolu, chemin relatif au run)
+    """
+    wanted = set(categories) if categories else None
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        abs_dir = root / rel_dir if rel_dir else root
+        try:
+            with os.scandir(abs_dir) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            logger.warning(f"Archive: lecture impossible de {abs_dir}: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if wanted is None or rel_dir or entry.name in wanted:
+                    subdirs.append(rel_path)
+            elif entry.is_file(follow_symlinks=False):
+                if wanted is None or rel_dir or "root" in wanted:
+                    yield Path(entry.path), rel_path
+        # Pile : empiler à l'envers pour parcourir dans l'ordre alphabétique
+        stack.extend(reversed(subdirs))
+
+
+def _write_zip(pipe: _ArchivePipe, sources: List[Tuple[Path, str]], categories: Optional[List[str]]):
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=COMPRESS_LEVEL, allowZip64=True) as archive:
+        for root, prefix in sources:
+            for path, rel_path in iter_run_files(root, categories):
+                info = zipfile.ZipInfo.from_file(path, f"{prefix}/{rel_path}")
+                if path.suffix.lower() in STORED_EXTENSIONS:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    info._compresslevel = COMPRESS_LEVEL
+                # ZIP64 activé par zipfile d'après info.file_size (> 4 Go)
+                with open(path, 'rb') as src, archive.open(info, 'w') as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+def _write_tar_gz(pipe: _ArchivePipe, sources: List[Tuple[Path, str]], categories: Optional[List[str]]):
+    # tarfile en mode flux ('w|gz') compresse au niveau 9 : gzip explicite à la place
+    with gzip.GzipFile(fileobj=pipe, mode='wb', compresslevel=COMPRESS_LEVEL) as gz, \
+            tarfile.open(fileobj=gz, mode='w|', bufsize=CHUNK_SIZE) as archive:
+        for root, prefix in sources:
+            for path, rel_path in iter_run_files(root, categories):
+                with open(path, 'rb') as src:
+                    info = archive.gettarinfo(arcname=f"{prefix}/{rel_path}", fileobj=src)
+                    archive.addfile(info, src)
+
+
+_WRITERS = {
+    "zip": _write_zip,
+    "tar.gz": _write_tar_gz,
+}
+
+
+def _produce(pipe: _ArchivePipe, archive_format: str, sources: List[Tuple[Path, str]],
+             categories: Optional[List[str]]):
+    """Corps du thread d'écriture"""
+    error = None
+    try:
+        _WRITERS[archive_format](pipe, sources, categories)
+    except ArchiveCancelled:
+        logger.info("Archive: téléchargement interrompu par le client")
+    except Exception as e:
+        logger.error(f"Archive: erreur pendant l'écriture: {e}")
+        error = e
+    pipe.finish(error)
+
+
+async def stream_archive(
+    sources: List[Tuple[Path, str]],
+    archive_format: str = "zip",
+    categories: Optional[List[str]] = None
+) -> AsyncIterator[bytes]:
+    """
+    Génère une archive de un ou plusieurs runs, bloc par bloc
+
+    Args:
+        sources: (répertoire du run, dossier correspondant dans l'archive)
+        archive_format: "zip" ou "tar.gz"
+        categories: Dossiers de premier niveau à inclure (None = tout)
+
+    Yields:
+        Blocs de l'archive (au plus CHUNK_SIZE octets environ)
+    """
+    if archive_format not in _WRITERS:
+        raise ValueError(f"Format d'archive inconnu: {archive_format}")
+
+    pipe = _ArchivePipe()
+    writer = threading.Thread(
+        target=_produce, args=(pipe, archive_format, sources, categories),
+        name="archive-writer", daemon=True
+    )
+    writer.start()
+    try:
+        while True:
+            item = await asyncio.to_thread(pipe.queue.get)
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                # Couper la connexion plutôt que d'envoyer une archive tronquée valide
+                raise RuntimeError("Archive incomplète") from item
+            yield item
+    finally:
+        pipe.cancelled.set()
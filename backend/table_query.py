@@ -0,0 +1,378 @@
+"""
+Moteur de requêtes sur les gros fichiers TSV d'un run
+
+Un TSV (BLAST, AMRFinderPlus, RGI, Snippy...) est converti une seule fois
+en base SQLite mise en cache (clé : chemin + taille + mtime), puis chaque
+requête (projection, filtres, tri, pagination par curseur) s'exécute côté
+serveur : une table BLAST de 500k lignes est explorable sans être envoyée
+au navigateur. Les valeurs numériques sont stockées comme nombres (tri et
+comparaisons numériques) ; un index est créé à la demande sur les colonnes
+triées.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Répertoire des tables converties (données du pipeline, hors de l'arborescence source)
+TABLE_CACHE_DIR = Path(os.environ.get(
+    "TABLE_CACHE_DIR", Path(__file__).resolve().parent.parent / "pipeline" / "data" / "table_cache"
+))
+
+# Nombre maximum de tables gardées en cache (les moins récemment utilisées sont supprimées)
+TABLE_CACHE_MAX_FILES = int(os.environ.get("TABLE_CACHE_MAX_FILES", "64"))
+
+# Extensions acceptées (fichiers tabulés)
+TABLE_EXTENSIONS = {'.tsv', '.tab', '.txt', '.vcf'}
+
+# Lignes insérées par transaction lors de la conversion
+IMPORT_BATCH = 5000
+
+# Colonnes BLAST -outfmt 6 (fichiers sans en-tête à 12 colonnes)
+BLAST_OUTFMT6_COLUMNS = [
+    'qseqid', 'sseqid', 'pident', 'length', 'mismatch', 'gapopen',
+    'qstart', 'qend', 'sstart', 'send', 'evalue', 'bitscore'
+]
+
+# Opérateurs de filtre : nom → fragment SQL
+FILTER_OPERATORS = {
+    'eq': '= ?',
+    'ne': '!= ?',
+    'lt': '< ?',
+    'le': '<= ?',
+    'gt': '> ?',
+    'ge': '>= ?',
+    'contains': "LIKE ? ESCAPE '\\'",
+    'startswith': "LIKE ? ESCAPE '\\'",
+}
+
+_NUMBER = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+
+
+class TableQueryError(ValueError):
+    """Paramètre de requête invalide (colonne inconnue, opérateur...)"""
+
+
+# ----------------------------------------------------------------------------
+# Conversion TSV → SQLite
+# ----------------------------------------------------------------------------
+
+def _header(first_fields: List[str], header: Optional[bool]) -> Tuple[List[str], bool]:
+    """
+    Noms des colonnes et présence d'une ligne d'en-tête
+
+    En mode automatique (header=None), la première ligne est un en-tête sauf
+    si la moitié de ses champs sont des nombres (BLAST -outfmt 6, etc.).
+    """
+    if header is None:
+        numeric = sum(1 for f in first_fields if _NUMBER.match(f.strip()))
+        header = numeric * 2 < len(first_fields)
+
+    if header:
+        names = [f.strip().lstrip('#').strip() for f in first_fields]
+    elif len(first_fields) == len(BLAST_OUTFMT6_COLUMNS):
+        names = list(BLAST_OUTFMT6_COLUMNS)
+    else:
+        names = [f"col{i + 1}" for i in range(len(first_fields))]
+
+    # Noms vides ou dupliqués → suffixe numérique
+    seen: Dict[str, int] = {}
+    unique = []
+    for i, name in enumerate(names):
+        name = name or f"col{i + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 1
+        unique.append(name)
+    return unique, header
+
+
+def _build_table(source: Path, target: Path, header: Optional[bool]):
+    """Convertit un TSV en base SQLite (écrite à côté puis renommée)"""
+    tmp = target.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+
+        with open(source, 'r', encoding='utf-8', errors='replace', newline='') as f:
+            first = None
+            for line in f:
+                line = line.rstrip('\r\n')
+                # Méta-données en tête (VCF "##...") ignorées, "#CHROM..." est l'en-tête
+                if line and not line.startswith('##'):
+                    first = line.split('\t')
+                    break
+            if first is None:
+                first = []
+            names, has_header = _header(first, header) if first else ([], True)
+            width = len(names)
+
+            # Affinité NUMERIC : SQLite stocke les nombres comme INTEGER/REAL
+            # (tri et comparaisons numériques), le reste comme texte
+            columns_sql = ', '.join(f'c{i} NUMERIC' for i in range(width)) or 'c0'
+            conn.execute(f"CREATE TABLE rows ({columns_sql})")
+            insert = f"INSERT INTO rows VALUES ({', '.join('?' for _ in range(width)) or 'NULL'})"
+
+            def padded(fields: List[str]) -> List[str]:
+                # Lignes incomplètes ou trop longues ramenées à la largeur de l'en-tête
+                return fields if len(fields) == width else (fields + [''] * width)[:width]
+
+            batch = [] if has_header or not first else [padded(first)]
+            row_count = 0
+            for line in f:
+                line = line.rstrip('\r\n')
+                if not line or line.startswith('#'):
+                    continue
+                batch.append(padded(line.split('\t')))
+                if len(batch) >= IMPORT_BATCH:
+                    conn.executemany(insert, batch)
+                    row_count += len(batch)
+                    batch.clear()
+            if batch:
+                conn.executemany(insert, batch)
+                row_count += len(batch)
+
+        # Type de colonne : "number" si toutes les cellules non vides sont numériques
+        types = []
+        if width:
+            counts = conn.execute("SELECT " + ", ".join(
+                f"SUM(typeof(c{i}) = 'text' AND c{i} != ''), SUM(c{i} != '')" for i in range(width)
+            ) + " FROM rows").fetchone()
+            for i in range(width):
+                text_cells, filled = counts[2 * i] or 0, counts[2 * i + 1] or 0
+                types.append("number" if filled and not text_cells else "text")
+
+        conn.execute("CREATE TABLE meta (position INTEGER, name TEXT, type TEXT)")
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?, ?)",
+            [(i, name, types[i]) for i, name in enumerate(names)]
+        )
+        conn.execute("CREATE TABLE info (row_count INTEGER)")
+        conn.execute("INSERT INTO info VALUES (?)", (row_count,))
+        conn.commit()
+    except BaseException:
+        conn.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    conn.close()
+    os.replace(tmp, target)
+
+
+_build_locks: Dict[str, threading.Lock] = {}
+_build_locks_guard = threading.Lock()
+# Tables en cours de lecture (open_table) : jamais supprimées par le nettoyage
+_readers: Dict[Path, int] = {}
+
+
+def _in_use() -> set:
+    with _build_locks_guard:
+        return set(_readers)
+
+
+def _prune_cache(keep: Path):
+    """Supprime les tables les moins récemment utilisées au-delà de TABLE_CACHE_MAX_FILES"""
+    files = []
+    for path in TABLE_CACHE_DIR.glob("*.sqlite"):
+        try:
+            files.append((path.stat().st_atime, path))
+        except FileNotFoundError:
+            continue
+    files.sort(reverse=True)
+    busy = _in_use()
+    for _, stale in files[TABLE_CACHE_MAX_FILES:]:
+        if stale != keep and stale not in busy:
+            stale.unlink(missing_ok=True)
+
+
+def _cache_key(source: Path, header: Optional[bool]) -> Tuple[str, Path]:
+    """Préfixe (chemin + mode d'en-tête) et chemin en cache de la version courante d'un TSV"""
+    stat_result = source.stat()
+    path_key = hashlib.sha1(str(source.resolve()).encode()).hexdigest()[:20]
+    header_key = {None: 'a', True: 'h', False: 'n'}[header]
+    prefix = f"{path_key}_{header_key}"
+    return prefix, TABLE_CACHE_DIR / f"{prefix}_{stat_result.st_size}_{stat_result.st_mtime_ns}.sqlite"
+
+
+def _ensure_table(source: Path, header: Optional[bool], prefix: str, target: Path) -> Path:
+    if target.exists():
+        try:
+            os.utime(target)  # Ordre LRU
+            return target
+        except FileNotFoundError:
+            pass  # Supprimée entre-temps : reconvertie ci-dessous
+
+    with _build_locks_guard:
+        lock = _build_locks.setdefault(prefix, threading.Lock())
+    with lock:
+        if target.exists():
+            return target
+        TABLE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        busy = _in_use()
+        for old in TABLE_CACHE_DIR.glob(f"{prefix}_*.sqlite"):
+            if old not in busy:
+                old.unlink(missing_ok=True)
+        logger.info(f"📊 Conversion de {source.name} en table interrogeable")
+        _build_table(source, target, header)
+        _prune_cache(target)
+    return target
+
+
+def get_table(source: Path, header: Optional[bool] = None) -> Path:
+    """
+    Base SQLite d'un TSV, convertie au premier appel puis servie depuis le cache
+
+    Un fichier modifié (taille ou mtime) est reconverti ; l'ancienne version
+    est supprimée (sauf si elle est encore lue, voir open_table).
+    """
+    prefix, target = _cache_key(source, header)
+    return _ensure_table(source, header, prefix, target)
+
+
+@contextmanager
+def open_table(source: Path, header: Optional[bool] = None) -> Iterator[Path]:
+    """
+    get_table pour une lecture : la table n'est pas supprimée par le
+    nettoyage du cache (autre requête) tant que le bloc with n'est pas terminé
+    """
+    prefix, target = _cache_key(source, header)
+    with _build_locks_guard:
+        _readers[target] = _readers.get(target, 0) + 1
+    try:
+        yield _ensure_table(source, header, prefix, target)
+    finally:
+        with _build_locks_guard:
+            _readers[target] -= 1
+            if not _readers[target]:
+                del _readers[target]
+
+
+# ----------------------------------------------------------------------------
+# Requêtes
+# ----------------------------------------------------------------------------
+
+def parse_filter(expression: str) -> Tuple[str, str, str]:
+    """Découpe un filtre "colonne:opérateur:valeur" (la valeur peut contenir ':')"""
+    parts = expression.split(':', 2)
+    if len(parts) != 3 or parts[1] not in FILTER_OPERATORS:
+        raise TableQueryError(
+            f"Filtre invalide '{expression}' (format colonne:opérateur:valeur, "
+            f"opérateurs: {', '.join(FILTER_OPERATORS)})"
+        )
+    return parts[0], parts[1], parts[2]
+
+
+def _like_escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def query_table(
+    table_path: Path,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Tuple[str, str, str]]] = None,
+    sort: Optional[str] = None,
+    descending: bool = False,
+    after: Optional[tuple] = None,
+    limit: int = 100
+) -> Dict[str, Any]:
+    """
+    Projection, filtres, tri et pagination (keyset) sur une table convertie
+
+    Args:
+        table_path: Base SQLite renvoyée par get_table
+        columns: Colonnes renvoyées (None = toutes)
+        filters: (colonne, opérateur, valeur) combinés par AND
+        sort: Colonne de tri (None = ordre du fichier)
+        descending: Tri décroissant
+        after: Curseur (valeur de tri, numéro de ligne) de la dernière ligne de la page précédente
+        limit: Taille de page
+
+    Returns:
+        Dict avec columns (nom, type), total_rows, total (filtré), rows et next (curseur ou None)
+    """
+    conn = sqlite3.connect(table_path, timeout=30)
+    try:
+        meta = conn.execute("SELECT name, type FROM meta ORDER BY position").fetchall()
+        total_rows = conn.execute("SELECT row_count FROM info").fetchone()[0]
+        if not meta:
+            return {"columns": [], "total_rows": 0, "total": 0, "rows": [], "next": None}
+        positions = {name: i for i, (name, _) in enumerate(meta)}
+        types = dict(meta)
+
+        def column(name: str) -> str:
+            if name not in positions:
+                raise TableQueryError(f"Colonne inconnue: {name}")
+            return f"c{positions[name]}"
+
+        selected = columns or [name for name, _ in meta]
+        select_sql = ', '.join(column(name) for name in selected)
+
+        conditions: List[str] = []
+        params: List[Any] = []
+        for name, op, value in filters or []:
+            if op == 'contains':
+                conditions.append(f"CAST({column(name)} AS TEXT) {FILTER_OPERATORS[op]}")
+                params.append(f"%{_like_escape(value)}%")
+            elif op == 'startswith':
+                conditions.append(f"CAST({column(name)} AS TEXT) {FILTER_OPERATORS[op]}")
+                params.append(f"{_like_escape(value)}%")
+            else:
+                # La valeur est convertie par l'affinité NUMERIC de la colonne
+                conditions.append(f"{column(name)} {FILTER_OPERATORS[op]}")
+                params.append(value)
+                if op in ('lt', 'le', 'gt', 'ge') and _NUMBER.match(value.strip()):
+                    # Cellules texte (vides, NA...) exclues des comparaisons numériques
+                    conditions.append(f"typeof({column(name)}) != 'text'")
+
+        where = " AND ".join(conditions) or "1"
+        if conditions:
+            total = conn.execute(f"SELECT COUNT(*) FROM rows WHERE {where}", params).fetchone()[0]
+        else:
+            total = total_rows
+
+        sort_expr = column(sort) if sort else "rowid"
+        if sort:
+            # Index créé une fois par colonne triée (conservé dans le cache)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{sort_expr} ON rows ({sort_expr})")
+            conn.commit()
+
+        page_where = where
+        page_params = list(params)
+        if after is not None:
+            op = "<" if descending else ">"
+            page_where += f" AND ({sort_expr} {op} ? OR ({sort_expr} = ? AND rowid > ?))"
+            page_params.extend([after[0], after[0], after[1]])
+
+        direction = "DESC" if descending else "ASC"
+        rows = conn.execute(
+            f"""
+            SELECT {select_sql}, {sort_expr}, rowid FROM rows
+            WHERE {page_where}
+            ORDER BY {sort_expr} {direction}, rowid ASC
+            LIMIT ?
+            """,
+            page_params + [limit + 1]
+        ).fetchall()
+    finally:
+        conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    width = len(selected)
+    return {
+        "columns": [{"name": name, "type": types[name]} for name in selected],
+        "total_rows": total_rows,
+        "total": total,
+        "rows": [list(row[:width]) for row in rows],
+        "next": (rows[-1][width], rows[-1][width + 1]) if has_more and rows else None,
+    }
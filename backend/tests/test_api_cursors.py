@@ -0,0 +1,48 @@
+"""
+Curseurs de pagination : un curseur mal formé ou du mauvais type est refusé
+en 400 avant d'atteindre la base (asyncpg rejette un paramètre de mauvais type)
+"""
+import base64
+import json
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+
+def _cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("sort, key", [
+    ("identity", ["abc", 1]),       # texte pour une colonne numérique
+    ("priority", [0.5, 1]),         # réel pour une colonne entière
+    ("gene", [12, 1]),              # nombre pour une colonne texte
+    ("identity", [99.0, "1"]),      # ordinal non entier
+    ("identity", [99.0, True]),
+])
+def test_gene_cursor_type_checked(client, sort, key):
+    response = client.get(f"/api/results/job/genes?sort={sort}&cursor={_cursor(key)}")
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("key", [
+    [["a"], 1],                     # liste : refusée par sqlite3 (500)
+    [{"a": 1}, 1],
+    [True, 1],
+    [1.5, True],                    # numéro de ligne booléen
+    [1.5, "2"],
+])
+def test_table_cursor_type_checked(client, key):
+    response = client.get(f"/api/jobs/job/tables/hits.tsv?cursor={_cursor(key)}")
+    assert response.status_code == 400
+
+
+def test_malformed_cursor(client):
+    assert client.get("/api/results/job/genes?cursor=%%%").status_code == 400
+    assert client.get(f"/api/jobs?cursor={_cursor(['not-a-date', 'x'])}").status_code == 400
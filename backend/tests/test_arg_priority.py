@@ -0,0 +1,65 @@
+"""
+Classification de priorité partagée (python/arg_priority.py) : niveaux
+attendus des implémentations d'origine du backend et du rapport HTML
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "python"))
+
+from arg_priority import classify_priority  # noqa: E402
+from generate_arg_report import classify_gravity  # noqa: E402
+
+HIGH_QUALITY = {"coverage": 100.0, "identity": 99.5}
+LOW_QUALITY = {"coverage": 60.0, "identity": 99.5}
+
+
+# gène, champs, qualité, niveau backend (sans class), niveau rapport (avec class)
+CASES = [
+    ("blaKPC-2", {"product": "carbapenem-hydrolyzing class A beta-lactamase KPC-2",
+                  "resistance": "CARBAPENEM", "class": "BETA-LACTAM"},
+     HIGH_QUALITY, "CRITICAL", "CRITICAL"),
+    ("blaKPC-2", {"product": "carbapenem-hydrolyzing class A beta-lactamase KPC-2",
+                  "resistance": "CARBAPENEM", "class": "BETA-LACTAM"},
+     LOW_QUALITY, "CRITICAL", "CRITICAL"),
+    ("mcr-1.1", {"product": "phosphoethanolamine--lipid A transferase MCR-1.1",
+                 "resistance": "COLISTIN", "class": "COLISTIN"},
+     LOW_QUALITY, "CRITICAL", "CRITICAL"),
+    # Classe HIGH + gène HIGH : CRITICAL seulement si détection très confiante
+    ("aac(6')-Ib-cr", {"product": "aminoglycoside N-acetyltransferase AAC(6')-Ib-cr",
+                       "resistance": "AMINOGLYCOSIDE/QUINOLONE", "class": "AMINOGLYCOSIDE"},
+     HIGH_QUALITY, "CRITICAL", "CRITICAL"),
+    ("aac(6')-Ib-cr", {"product": "aminoglycoside N-acetyltransferase AAC(6')-Ib-cr",
+                       "resistance": "AMINOGLYCOSIDE/QUINOLONE", "class": "AMINOGLYCOSIDE"},
+     LOW_QUALITY, "HIGH", "HIGH"),
+    ("tet(A)", {"product": "tetracycline efflux MFS transporter Tet(A)",
+                "resistance": "TETRACYCLINE", "class": "TETRACYCLINE"},
+     HIGH_QUALITY, "HIGH", "HIGH"),
+    ("tet(A)", {"product": "tetracycline efflux MFS transporter Tet(A)",
+                "resistance": "TETRACYCLINE", "class": "TETRACYCLINE"},
+     LOW_QUALITY, "MEDIUM", "MEDIUM"),
+    ("orf42", {"product": "hypothetical protein", "resistance": "", "class": ""},
+     HIGH_QUALITY, "MEDIUM", "MEDIUM"),
+    # Classe connue seulement par le champ class : ignorée par le backend
+    ("oqxB", {"product": "multidrug efflux RND transporter permease subunit OqxB",
+              "resistance": "", "class": "QUINOLONE"},
+     LOW_QUALITY, "MEDIUM", "HIGH"),
+    ("oqxB", {"product": "multidrug efflux RND transporter permease subunit OqxB",
+              "resistance": "", "class": "QUINOLONE"},
+     HIGH_QUALITY, "MEDIUM", "HIGH"),
+]
+
+
+@pytest.mark.parametrize("gene, fields, quality, backend_level, report_level", CASES)
+def test_priority_levels(gene, fields, quality, backend_level, report_level):
+    gene_data = {"gene": gene, "subclass": "", **fields, **quality}
+    assert classify_priority(gene_data) == backend_level
+    assert classify_gravity(gene_data)[0] == report_level
+
+
+def test_missing_fields():
+    # Champs absents ou None (JSON de gènes classifiés) : classe inconnue
+    assert classify_priority({"gene": None, "coverage": None}) == "MEDIUM"
+    assert classify_gravity({"gene": "blaNDM-1", "class": "CARBAPENEM"}) == ("CRITICAL", "FF4444")
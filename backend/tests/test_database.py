@@ -0,0 +1,135 @@
+"""
+Tests de l'interface Database (SQLite, et PostgreSQL si TEST_DATABASE_URL)
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from conftest import run
+from database_postgres import translate_placeholders
+from models import JobStatus
+
+
+def test_translate_placeholders():
+    assert translate_placeholders("SELECT * FROM t WHERE a = ? AND b = ?") == \
+        "SELECT * FROM t WHERE a = $1 AND b = $2"
+    # Les ? entre quotes ne sont pas des paramètres
+    assert translate_placeholders("SELECT '?', 'l''?' FROM t WHERE a = ?") == \
+        "SELECT '?', 'l''?' FROM t WHERE a = $1"
+
+
+def test_jobs_keyset_pagination(database):
+    async def scenario():
+        await database.initialize()
+        try:
+            job_ids = [await database.create_job(f"SAMPLE{i}") for i in range(5)]
+            assert await database.update_job_status(
+                job_ids[0], JobStatus.RUNNING, started_at=datetime.now(), pid=1234
+            )
+            job = await database.get_job(job_ids[0])
+            assert job["status"] == JobStatus.RUNNING.value and job["pid"] == 1234
+            assert await database.count_jobs() == 5
+
+            first = await database.get_jobs(limit=2)
+            last = first[-1]
+            created_at = last["created_at"]
+            if not isinstance(created_at, datetime):
+                created_at = datetime.fromisoformat(str(created_at))
+            rest = await database.get_jobs(limit=10, before=(created_at, last["id"]))
+            aware = await database.get_jobs(limit=10, before=(created_at.astimezone(timezone.utc), last["id"]))
+            assert [j["id"] for j in aware] == [j["id"] for j in rest]
+            seen = [j["id"] for j in first + rest]
+            assert sorted(seen) == sorted(job_ids) and len(set(seen)) == 5
+        finally:
+            await database.close()
+
+    run(scenario())
+
+
+def test_gene_index_queries(database):
+    async def scenario():
+        await database.initialize()
+        try:
+            job_id = await database.create_job("SAMPLE1")
+            completed_at = datetime.now().replace(microsecond=0)
+            genes = [
+                {"gene": "blaNDM-1", "identity": 100.0, "coverage": 100.0, "priority": "CRITICAL",
+                 "resistance": "Carbapenem", "source": "AMRFinderPlus", "sources": ["AMRFinderPlus", "CARD"]},
+                {"gene": "tet(A)", "identity": 98.5, "coverage": 90.0, "priority": "MEDIUM",
+                 "resistance": "Tetracycline", "source": "ResFinder", "sources": ["ResFinder"]},
+                {"gene": "blaNDM-5", "identity": 99.0, "coverage": 100.0, "priority": "CRITICAL",
+                 "resistance": "Carbapenem", "source": "CARD", "sources": ["CARD"]},
+            ]
+            assert await database.index_job_genes(job_id, "SAMPLE1", completed_at, genes) == 3
+            assert await database.is_job_genes_indexed(job_id)
+
+            hits = await database.search_gene_samples("blandm", prefix=True)
+            assert sorted(h["gene"] for h in hits) == ["blaNDM-1", "blaNDM-5"]
+            hits = await database.search_gene_samples(
+                "blaNDM-1", since=completed_at - timedelta(days=1), resistance_class="carbapenem"
+            )
+            assert [h["gene"] for h in hits] == ["blaNDM-1"]
+            assert await database.search_gene_samples("blaNDM-1", since=completed_at + timedelta(days=1)) == []
+            # Date avec fuseau (?since=...Z) : convertie en heure locale
+            since_utc = (completed_at - timedelta(hours=1)).astimezone(timezone.utc)
+            assert len(await database.search_gene_samples("blaNDM-1", since=since_utc)) == 1
+
+            # Pagination par curseur (valeur de tri, ordinal) sur une colonne numérique
+            page = await database.query_job_genes(job_id, sort="identity", descending=True, limit=2)
+            assert page["total"] == 3
+            assert [g["gene"] for g in page["genes"]] == ["blaNDM-1", "blaNDM-5"]
+            page = await database.query_job_genes(
+                job_id, sort="identity", descending=True, after=page["next"], limit=2
+            )
+            assert [g["gene"] for g in page["genes"]] == ["tet(A)"] and page["next"] is None
+
+            page = await database.query_job_genes(job_id, sources=["CARD"])
+            assert page["total"] == 2
+
+            # Échec d'indexation enregistré, effacé par une indexation réussie
+            failed_id = await database.create_job("SAMPLE2")
+            assert await database.get_gene_index_failure(failed_id) is None
+            await database.record_gene_index_failure(failed_id, "fichier illisible")
+            await database.record_gene_index_failure(failed_id, "toujours illisible")
+            failure = await database.get_gene_index_failure(failed_id)
+            assert failure["error"] == "toujours illisible"
+            assert datetime.fromisoformat(str(failure["failed_at"])) <= datetime.now()
+            assert not await database.is_job_genes_indexed(failed_id)
+            await database.index_job_genes(failed_id, "SAMPLE2", completed_at, genes[:1])
+            assert await database.get_gene_index_failure(failed_id) is None
+        finally:
+            await database.close()
+
+    run(scenario())
+
+
+def test_db_download_tasks(database):
+    async def scenario():
+        await database.initialize()
+        try:
+            await database.save_db_download_task("card", {"status": "downloading", "progress": 10})
+            await database.save_db_download_task("card", {"status": "completed", "progress": 100})
+            await database.save_db_download_task("kma", {"status": "failed", "error": "x"})
+            tasks = await database.list_db_download_tasks()
+            assert tasks == {
+                "card": {"status": "completed", "progress": 100},
+                "kma": {"status": "failed", "error": "x"},
+            }
+        finally:
+            await database.close()
+
+    run(scenario())
+
+
+def test_allocate_run_number_concurrent(database):
+    async def scenario():
+        await database.initialize()
+        try:
+            job_id = await database.create_job("SAMPLE1")
+            await database.update_job_status(job_id, JobStatus.RUNNING, run_number=4)
+            numbers = await asyncio.gather(*(database.allocate_run_number("SAMPLE1") for _ in range(8)))
+            assert sorted(numbers) == list(range(5, 13))
+            assert await database.allocate_run_number("SAMPLE2") == 1
+        finally:
+            await database.close()
+
+    run(scenario())
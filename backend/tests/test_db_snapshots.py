@@ -0,0 +1,65 @@
+"""
+Tests des versions de bases de référence (db_snapshots.py)
+"""
+import os
+
+from db_snapshots import SnapshotStore
+
+
+def _build(store, key, content):
+    version = store.new_version(key)
+    (version / "data.txt").write_text(content)
+    return version
+
+
+def test_activate_prunes_old_versions_but_not_builds(tmp_path):
+    store = SnapshotStore(tmp_path)
+    first = _build(store, "card", "v1")
+    store.activate("card", "card_db", first)
+    assert (tmp_path / "card_db" / "data.txt").read_text() == "v1"
+
+    building = _build(store, "card", "v2")       # Mise à jour en cours
+    second = _build(store, "card", "v3")
+    store.activate("card", "card_db", second)
+    assert not first.exists()
+    assert building.exists()                     # Protégée par son marqueur
+    assert (tmp_path / "card_db" / "data.txt").read_text() == "v3"
+
+    store.discard(building)
+    assert store.versions("card") == [second.name]
+
+
+def test_interrupted_build_removed_at_startup(tmp_path):
+    store = SnapshotStore(tmp_path)
+    current = _build(store, "card", "v1")
+    store.activate("card", "card_db", current)
+    leftover = _build(store, "card", "v2")      # Coupée par un arrêt brutal
+
+    assert store.prune() == []
+    assert store.prune(interrupted=True) == [leftover]
+    assert store.versions("card") == [current.name]
+    assert [p.name for p in (tmp_path / ".snapshots" / "card").iterdir()
+            if p.name.startswith(".")] == []
+
+
+def test_unmarked_newer_version_removed(tmp_path):
+    """Version plus récente que la courante sans marqueur : orpheline"""
+    store = SnapshotStore(tmp_path)
+    current = _build(store, "card", "v1")
+    store.activate("card", "card_db", current)
+    orphan = tmp_path / ".snapshots" / "card" / "99991231-235959"
+    orphan.mkdir()
+    assert store.prune() == [orphan]
+
+
+def test_pinned_version_kept_until_release(tmp_path):
+    store = SnapshotStore(tmp_path)
+    first = _build(store, "card", "v1")
+    store.activate("card", "card_db", first)
+    pin_dir = store.pin("job1", {"card": "card_db"})
+    store.set_pin_pid("job1", os.getpid())
+    second = _build(store, "card", "v2")
+    store.activate("card", "card_db", second)
+    assert first.exists() and (pin_dir / "card_db" / "data.txt").read_text() == "v1"
+    store.release("job1")
+    assert not first.exists()
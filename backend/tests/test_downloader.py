@@ -0,0 +1,222 @@
+"""
+Tests du téléchargeur (downloader.py) contre un serveur HTTP local
+
+Le serveur sert une archive tar.gz, avec ou sans support des Range, et
+peut couper les connexions après un nombre d'octets donné.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import tarfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import downloader
+from conftest import run
+from downloader import DownloadError, download_and_extract
+
+
+def _archive(members) -> bytes:
+    """Archive tar.gz en mémoire ({nom: contenu})"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+# Contenu aléatoire (incompressible) : l'archive fait ~3 Mo
+FILES = {
+    "card.json": os.urandom(2 * 1024 * 1024),
+    "data/protein_fasta_protein_homolog_model.fasta": os.urandom(1024 * 1024 + 123),
+}
+DATA = _archive(FILES)
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+# asyncio.sleep est raccourci pendant les tests (attentes de reprise)
+_sleep = asyncio.sleep
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        config = self.server.config
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/redirect"):
+            self.send_response(302)
+            self.send_header("Location", "/data")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body_source = config["data"]
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        config["requests"].append(range_header)
+        start, end, status = 0, len(body_source) - 1, 200
+        if range_header and config["ranges"] and (not if_range or if_range == config["etag"]):
+            first, last = range_header.split("=")[1].split("-")
+            start, status = int(first), 206
+            end = int(last) if last else len(body_source) - 1
+        body = body_source[start:end + 1]
+
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", config["etag"])
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body_source)}")
+        self.end_headers()
+        try:
+            if config["drops"] > 0 and len(body) > config["drop_after"]:
+                config["drops"] -= 1
+                self.wfile.write(body[:config["drop_after"]])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            for i in range(0, len(body), 65536):
+                self.wfile.write(body[i:i + 65536])
+                if config["delay"]:
+                    time.sleep(config["delay"])
+        except OSError:
+            pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.config = {
+        "data": DATA, "ranges": True, "etag": '"v1"', "drops": 0, "drop_after": 0,
+        "delay": 0, "requests": [],
+    }
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.base_url = f"http://127.0.0.1:{httpd.server_port}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    """Attentes de reprise raccourcies"""
+    async def no_backoff(delay, *args, **kwargs):
+        await _sleep(min(delay, 0.01), *args, **kwargs)
+
+    monkeypatch.setattr(downloader.asyncio, "sleep", no_backoff)
+
+
+def _installed(dest):
+    return {
+        str(path.relative_to(dest)): path.read_bytes()
+        for path in dest.rglob("*") if path.is_file()
+    }
+
+
+def test_extracts_while_downloading(server, tmp_path):
+    dest = tmp_path / "card_db"
+    dest.mkdir()
+    (dest / "card.json").write_text("ancienne version")
+    events = []
+    result = run(download_and_extract(
+        f"{server.base_url}/redirect", dest, checksum=f"sha256:{SHA256}",
+        progress=lambda *args: events.append(args)
+    ))
+    assert _installed(dest) == FILES
+    assert result["size"] == len(DATA) and result["files"] == 2
+    assert result["extracted_bytes"] == sum(len(c) for c in FILES.values())
+    assert events and events[-1][0] == len(DATA) and events[-1][3] > 0
+    assert sorted(os.listdir(dest)) == ["card.json", "data"]  # Pas de répertoire .extract-*
+
+
+def test_resumes_after_dropped_connections(server, tmp_path):
+    server.config.update(drops=3, drop_after=300000)
+    result = run(download_and_extract(f"{server.base_url}/data", tmp_path, checksum=SHA256))
+    assert result["checksum"] == f"sha256:{SHA256}"
+    assert server.config["drops"] == 0
+    # Reprises par Range à l'offset atteint, pas depuis le début
+    assert any(r and not r.startswith("bytes=0-") for r in server.config["requests"])
+    assert _installed(tmp_path) == FILES
+
+
+def test_server_without_ranges_fails_cleanly(server, tmp_path):
+    (tmp_path / "card.json").write_text("ancienne version")
+    # La première coupure touche la requête de sondage, la seconde le téléchargement
+    server.config.update(ranges=False, drops=2, drop_after=300000)
+    with pytest.raises(DownloadError, match="Reprise refusée"):
+        run(download_and_extract(f"{server.base_url}/data", tmp_path))
+    assert os.listdir(tmp_path) == ["card.json"]
+
+
+def test_changed_file_fails_cleanly(server, tmp_path):
+    server.config.update(drops=1, drop_after=300000)
+    server.config["etag"] = '"v1"'
+
+    # Le validateur change après la coupure : le serveur renvoie tout (200)
+    original = _Handler.do_GET
+
+    def change_after_first(handler):
+        if handler.headers.get("If-Range"):
+            server.config["etag"] = '"v2"'
+        original(handler)
+
+    _Handler.do_GET = change_after_first
+    try:
+        with pytest.raises(DownloadError, match="Reprise refusée"):
+            run(download_and_extract(f"{server.base_url}/data", tmp_path))
+    finally:
+        _Handler.do_GET = original
+    assert os.listdir(tmp_path) == []
+
+
+def test_checksum_mismatch_keeps_current_content(server, tmp_path):
+    (tmp_path / "card.json").write_text("ancienne version")
+    with pytest.raises(DownloadError, match="Somme de contrôle"):
+        run(download_and_extract(f"{server.base_url}/data", tmp_path, checksum="md5:00"))
+    assert os.listdir(tmp_path) == ["card.json"]
+    assert (tmp_path / "card.json").read_text() == "ancienne version"
+
+
+def test_parent_path_member_rejected(server, tmp_path):
+    server.config["data"] = _archive({"../evil.txt": b"x"})
+    dest = tmp_path / "db"
+    with pytest.raises(DownloadError, match="Archive invalide"):
+        run(download_and_extract(f"{server.base_url}/data", dest))
+    assert not (tmp_path / "evil.txt").exists()
+    assert os.listdir(dest) == []
+
+
+def test_absolute_path_member_stays_inside(server, tmp_path):
+    outside = tmp_path / "outside.txt"
+    server.config["data"] = _archive({str(outside): b"x"})
+    dest = tmp_path / "db"
+    try:
+        run(download_and_extract(f"{server.base_url}/data", dest))
+    except DownloadError:
+        pass  # Refus : acceptable aussi
+    assert not outside.exists()
+
+
+def test_corrupt_archive(server, tmp_path):
+    server.config["data"] = os.urandom(200000)
+    with pytest.raises(DownloadError, match="Archive invalide"):
+        run(download_and_extract(f"{server.base_url}/data", tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_http_error(server, tmp_path):
+    with pytest.raises(DownloadError, match="HTTP 404"):
+        run(download_and_extract(f"{server.base_url}/missing", tmp_path))
@@ -0,0 +1,52 @@
+"""
+Tests du scanner incrémental de manifeste (file_manifest.py)
+"""
+import os
+import time
+
+import file_manifest
+from file_manifest import ManifestScanner
+
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_incremental_scan(tmp_path):
+    (tmp_path / "01_qc").mkdir()
+    (tmp_path / "01_qc" / "report.html").write_text("<html>")
+    scanner = ManifestScanner(str(tmp_path))
+    changed, removed = scanner.scan()
+    assert [e["relative_path"] for e in changed] == ["01_qc/report.html"] and removed == []
+
+    (tmp_path / "run.log").write_text("start\n")
+    (tmp_path / "01_qc" / "report.html").unlink()
+    changed, removed = scanner.scan()
+    assert [e["relative_path"] for e in changed] == ["run.log"]
+    assert removed == ["01_qc/report.html"]
+    assert scanner.scan() == ([], [])
+
+
+def test_idle_file_growth_detected(tmp_path, monkeypatch):
+    """Un log inactif depuis plus de ACTIVE_WINDOW qui reprend est re-staté"""
+    monkeypatch.setattr(file_manifest, "IDLE_RESTAT_EVERY", 3)
+    log = tmp_path / "02_assembly" / "spades.log"
+    log.parent.mkdir()
+    log.write_text("k21\n")
+    _age(log, 600)
+    scanner = ManifestScanner(str(tmp_path))
+    scanner.scan()
+
+    # Ajout de lignes : le mtime du répertoire ne change pas
+    dir_mtime = log.parent.stat().st_mtime_ns
+    with open(log, "a") as f:
+        f.write("k33\n")
+    _age(log, 300)
+    assert log.parent.stat().st_mtime_ns == dir_mtime
+
+    sizes = []
+    for _ in range(3):
+        changed, _ = scanner.scan()
+        sizes += [e["size"] for e in changed]
+    assert sizes == [8]
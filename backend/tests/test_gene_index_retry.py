@@ -0,0 +1,36 @@
+"""
+Échec d'indexation des gènes : retenté après GENE_INDEX_RETRY_SECONDS ou si
+le répertoire de sortie a changé, sans attendre un redémarrage
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def main_module():
+    import main
+    return main
+
+
+def test_recent_failure_not_retried(main_module, tmp_path):
+    job = {"id": "job", "output_dir": str(tmp_path)}
+    failure = {"error": "illisible", "failed_at": datetime.now().isoformat()}
+    os.utime(tmp_path, (0, 0))
+    assert not main_module._gene_index_retry_due(job, failure)
+    # Sorties absentes : pas de mtime, on attend le délai
+    assert not main_module._gene_index_retry_due({"id": "job", "output_dir": None}, failure)
+
+
+def test_old_failure_retried(main_module, tmp_path):
+    job = {"id": "job", "output_dir": str(tmp_path / "absent")}
+    failed_at = datetime.now() - timedelta(seconds=main_module.GENE_INDEX_RETRY_SECONDS + 1)
+    assert main_module._gene_index_retry_due(job, {"error": "illisible", "failed_at": failed_at})
+
+
+def test_output_dir_changed_retried(main_module, tmp_path):
+    job = {"id": "job", "output_dir": str(tmp_path)}
+    failed_at = datetime.now() - timedelta(seconds=10)
+    (tmp_path / "arg_results.tsv").write_text("gene\n")
+    assert main_module._gene_index_retry_due(job, {"error": "illisible", "failed_at": str(failed_at)})
@@ -0,0 +1,80 @@
+"""
+Tests de l'index .fai (genome_index.py) : jamais écrit dans le répertoire du run
+"""
+import os
+
+import pytest
+
+import genome_index
+from genome_index import fetch_sequence
+
+
+@pytest.fixture(autouse=True)
+def fai_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(genome_index, "FAI_CACHE_DIR", tmp_path / "fai_cache")
+    genome_index._cache.clear()
+    return tmp_path / "fai_cache"
+
+
+def _fasta(path, contigs):
+    with open(path, "w") as f:
+        for name, seq in contigs.items():
+            f.write(f">{name} description\n")
+            for i in range(0, len(seq), 10):
+                f.write(seq[i:i + 10] + "\n")
+    return path
+
+
+def test_index_written_to_cache_not_run_dir(tmp_path, fai_cache):
+    run_dir = tmp_path / "run"
+    run_dir.mkdir()
+    fasta = _fasta(run_dir / "contigs.fasta", {"c1": "ACGT" * 10, "c2": "TTGA" * 5})
+    region = fetch_sequence(fasta, "c1", 9, 20)
+    assert region["sequence"] == ("ACGT" * 10)[8:20]
+    assert os.listdir(run_dir) == ["contigs.fasta"]
+    assert len(list(fai_cache.glob("*.fai"))) == 1
+
+    # Index relu depuis le cache ; une nouvelle version du FASTA remplace l'ancien
+    genome_index._cache.clear()
+    assert fetch_sequence(fasta, "c2")["sequence"] == "TTGA" * 5
+    _fasta(fasta, {"c1": "GGCC" * 12})
+    genome_index._cache.clear()
+    assert fetch_sequence(fasta, "c1", 1, 4)["sequence"] == "GGCC"
+    assert len(list(fai_cache.glob("*.fai"))) == 1
+
+
+def test_existing_fai_reused(tmp_path, fai_cache):
+    fasta = _fasta(tmp_path / "contigs.fasta", {"c1": "ACGT" * 10})
+    # .fai samtools fourni avec le run
+    (tmp_path / "contigs.fasta.fai").write_text("c1\t40\t16\t10\t11\n")
+    assert fetch_sequence(fasta, "c1", 1, 4)["sequence"] == "ACGT"
+    assert not fai_cache.exists()
+
+
+def test_features_with_contig_spanning_region(tmp_path):
+    """Un feature region couvrant tout le contig : résultats exacts, classe de longueur séparée"""
+    import random
+    from genome_index import get_gff_index, query_features
+
+    rng = random.Random(1)
+    features = [("region", 1, 100000)]
+    for i in range(2000):
+        begin = rng.randint(1, 99000)
+        features.append(("CDS", begin, begin + rng.randint(50, 900)))
+    gff = tmp_path / "annot.gff"
+    with open(gff, "w") as f:
+        f.write("##gff-version 3\n")
+        for i, (kind, begin, stop) in enumerate(features):
+            f.write(f"ctg1\tsrc\t{kind}\t{begin}\t{stop}\t.\t+\t.\tID=f{i}\n")
+
+    for begin, stop in [(1, 10), (5000, 5100), (50000, 52000), (99990, 100000)]:
+        result = query_features(gff, "ctg1", begin, stop, limit=10000)
+        expected = sorted((b, k) for k, b, e in features if b <= stop and e >= begin)
+        assert sorted((f["start"], f["type"]) for f in result["features"]) == expected
+        assert result["total"] == len(expected)
+        assert [f["start"] for f in result["features"]] == sorted(f["start"] for f in result["features"])
+
+    # Le feature de 100 kb n'allonge pas la fenêtre de recherche des CDS
+    classes = get_gff_index(gff).contigs["ctg1"]
+    assert max(length for _, _, _, length in classes[:-1]) <= 1024
+    assert classes[-1][0] == [1]
@@ -0,0 +1,64 @@
+"""
+ETag et requêtes conditionnelles : les réponses JSON (compressibles en gzip)
+portent un ETag faible, les fichiers servis tels quels un ETag fort
+"""
+import pytest
+
+
+@pytest.fixture(scope="module")
+def main_module():
+    import main
+    return main
+
+
+def _request(if_none_match=None):
+    from starlette.requests import Request
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_job_etag_is_weak(main_module):
+    job = {"id": "job", "status": "COMPLETED", "completed_at": "2026-01-30T14:30:00"}
+    etag = main_module.job_etag(job, "results", False)
+    assert etag.startswith('W/"')
+    assert main_module.job_etag({**job, "status": "RUNNING"}, "results") is None
+    # Le client renvoie l'ETag reçu, avec ou sans W/
+    assert main_module.etag_matches(_request(etag), etag)
+    assert main_module.etag_matches(_request(etag.removeprefix("W/")), etag)
+    assert not main_module.etag_matches(_request('W/"autre"'), etag)
+
+
+def test_file_etag_is_strong(main_module, tmp_path):
+    path = tmp_path / "report.html"
+    path.write_text("<html></html>")
+    etag = main_module.file_etag(path.stat())
+    assert etag.startswith('"')
+    assert main_module.etag_matches(_request(f"W/{etag}, \"x\""), etag)
+    # Les routes de fichiers ne passent pas par le gzip
+    assert main_module._RAW_FILE_ROUTE.match("/api/jobs/abc/files/download/report.html")
+    assert main_module._RAW_FILE_ROUTE.match("/api/jobs/abc/files/serve/report.html")
+
+
+@pytest.mark.parametrize("ncbi_info, cached", [(None, False), ({"organism": "Escherichia coli"}, True)])
+def test_results_without_taxonomy_not_cached(main_module, monkeypatch, tmp_path, ncbi_info, cached):
+    """Un échec NCBI (taxonomie None) ne doit pas être figé un an dans le navigateur"""
+    from fastapi import Response
+    from conftest import run
+
+    job = {"id": "job", "status": "COMPLETED", "completed_at": "2026-01-30T14:30:00",
+           "output_dir": str(tmp_path), "sample_id": "SRR1", "input_type": "sra"}
+
+    async def get_job(job_id):
+        return job
+
+    class Results:
+        taxonomy = None
+
+    monkeypatch.setattr(main_module.db, "get_job", get_job)
+    monkeypatch.setattr(main_module, "_build_job_results", lambda job, include_genes: Results())
+    monkeypatch.setattr(main_module.OutputParser, "fetch_ncbi_organism", lambda self, *args: ncbi_info)
+
+    response = Response()
+    run(main_module.get_job_results("job", _request(), response, include_genes=False))
+    assert ("etag" in response.headers) is cached
+    assert (response.headers["cache-control"] == main_module.IMMUTABLE_CACHE_CONTROL) is cached
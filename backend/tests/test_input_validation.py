@@ -0,0 +1,116 @@
+"""
+Tests de la validation des fichiers d'entrée en une passe (input_validation.py)
+"""
+import gzip
+
+import pytest
+
+import input_validation
+from input_validation import SequenceValidator, launch_errors, validate_file
+
+
+def _validate(data: bytes, block_size: int = 7) -> dict:
+    """Alimente le validateur par petits blocs : les coupures tombent partout"""
+    validator = SequenceValidator()
+    for i in range(0, len(data), block_size):
+        validator.update(data[i:i + block_size])
+    return validator.result()
+
+
+FASTQ = b"@r1\nACGTAC\n+\nIIIIII\n@r2\nGGCCNN\n+r2\nIIIIII\n"
+FASTA = b">contig1 desc\nACGTACGTAC\nGGCC\n>contig2\nNNNNAT\n"
+
+
+@pytest.mark.parametrize("block_size", [1, 3, 7, 1024])
+def test_fastq_record_split_across_blocks(block_size):
+    stats = _validate(FASTQ, block_size)
+    assert stats["valid"], stats["errors"]
+    assert (stats["format"], stats["kind"]) == ("fastq", "reads")
+    assert stats["records"] == 2 and stats["total_bases"] == 12
+    assert stats["n_percent"] == round(2 * 100 / 12, 2)
+
+
+def test_fasta_statistics():
+    stats = _validate(FASTA)
+    assert stats["valid"] and stats["format"] == "fasta"
+    assert stats["records"] == 2 and stats["total_bases"] == 20
+    assert (stats["min_length"], stats["max_length"], stats["n50"]) == (6, 14, 14)
+    assert stats["kind"] == "assembly"
+    # Assemblage de 20 pb : accepté mais signalé
+    assert any("très court" in w for w in stats["warnings"])
+    assert launch_errors(stats) == []
+
+
+def test_crlf_line_endings():
+    assert _validate(FASTA.replace(b"\n", b"\r\n")) == _validate(FASTA)
+    stats = _validate(FASTQ.replace(b"\n", b"\r\n"), 5)
+    assert stats["valid"] and stats["total_bases"] == 12
+
+
+def test_multi_member_gzip(tmp_path):
+    # bgzip et `cat a.gz b.gz` : plusieurs membres gzip à la suite
+    data = gzip.compress(FASTA) + gzip.compress(b">contig3\nACGT\n")
+    stats = _validate(data, 5)
+    assert stats["valid"] and stats["compressed"]
+    assert stats["records"] == 3 and stats["total_bases"] == 24
+
+    path = tmp_path / "contigs.fasta.gz"
+    path.write_bytes(data + b"\0" * 16)  # Bourrage en fin de fichier
+    assert validate_file(path)["records"] == 3
+    assert launch_errors(validate_file(path)) == ["Le fichier local doit être un FASTA non compressé"]
+
+
+def test_truncated_gzip():
+    data = gzip.compress(FASTQ * 50)
+    stats = _validate(data[:len(data) // 2])
+    assert not stats["valid"]
+    assert "tronquée" in stats["errors"][0]
+
+    corrupted = bytearray(data)
+    corrupted[20:30] = b"\xff" * 10
+    stats = _validate(bytes(corrupted))
+    assert not stats["valid"]
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"@r1\nACGT\nIIII\n@r2\nACGT\n+\nIIII\n", "séparateur '+'"),
+    (b"@r1\nACGT\n+\nIII\n", "3 qualités pour 4 bases"),
+    (b"@r1\nACGT\n+\nIIII\n@r2\nACG", "incomplet"),
+    (b"r1\nACGT\n+\nIIII\n", "Format non reconnu"),
+    (b">a\nACGT\n>b\nAC1T\n", "Caractères invalides"),
+])
+def test_malformed_records(data, message):
+    for block_size in (1, 4, 1024):
+        stats = _validate(data, block_size)
+        assert not stats["valid"]
+        assert message in stats["errors"][0]
+        assert launch_errors(stats) == stats["errors"]
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"", "Aucune séquence"),
+    (b"\n\n", "Aucune séquence"),
+    (b">", "Séquences vides"),
+])
+def test_empty_file(data, message, tmp_path):
+    stats = _validate(data)
+    assert not stats["valid"] and stats["total_bases"] == 0
+    assert message in stats["errors"][0]
+    path = tmp_path / "empty.fasta"
+    path.write_bytes(data)
+    assert not validate_file(path)["valid"]
+
+
+def test_fasta_of_short_reads_refused(monkeypatch):
+    monkeypatch.setattr(input_validation, "READS_MIN_RECORDS", 100)
+    reads = b"".join(b">read%d\n%s\n" % (i, b"ACGT" * 25) for i in range(101))
+    stats = _validate(reads, 4096)
+    assert stats["valid"] and stats["kind"] == "reads"
+    assert stats["n50"] == 100
+    assert "ressemble à des reads" in launch_errors(stats)[0]
+
+
+def test_fastq_refused_at_launch():
+    assert launch_errors(_validate(FASTQ)) == [
+        "Le fichier local doit être un assemblage FASTA (reads FASTQ non supportés)"
+    ]
@@ -0,0 +1,44 @@
+"""
+Tests du cache des tables converties (table_query.py)
+"""
+import pytest
+
+import table_query
+from table_query import open_table, query_table
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(table_query, "TABLE_CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(table_query, "TABLE_CACHE_MAX_FILES", 1)
+    return tmp_path / "cache"
+
+
+def _tsv(path, rows):
+    path.write_text("gene\tidentity\n" + "".join(f"g{i}\t{i}\n" for i in range(rows)))
+    return path
+
+
+def test_table_in_use_survives_pruning(tmp_path, cache_dir):
+    first = _tsv(tmp_path / "a.tsv", 3)
+    with open_table(first) as table:
+        # Conversion d'un autre fichier : le cache dépasse TABLE_CACHE_MAX_FILES
+        with open_table(_tsv(tmp_path / "b.tsv", 2)):
+            pass
+        assert table.exists()
+        assert query_table(table, sort="identity", descending=True)["rows"][0] == ["g2", 2]
+    # Plus lue : supprimée au prochain nettoyage
+    with open_table(_tsv(tmp_path / "c.tsv", 1)):
+        pass
+    assert len(list(cache_dir.glob("*.sqlite"))) == 1
+    assert not table.exists()
+
+
+def test_modified_file_is_reconverted(tmp_path, cache_dir):
+    source = _tsv(tmp_path / "a.tsv", 3)
+    with open_table(source) as old:
+        _tsv(source, 5)
+        with open_table(source) as new:
+            assert new != old and old.exists()
+            assert query_table(new)["total_rows"] == 5
+    assert query_table(old)["total_rows"] == 3
@@ -0,0 +1,81 @@
+"""
+Tests du stockage adressé par contenu (uploads.py)
+"""
+import hashlib
+import os
+import threading
+
+import uploads
+from uploads import ContentStore, ResumableUploadStore
+
+
+def _ingest(store, data: bytes, filename: str):
+    tmp_path = store.temp_path(filename)
+    tmp_path.write_bytes(data)
+    return store.ingest(tmp_path, hashlib.sha256(data).hexdigest(), filename)
+
+
+def test_deduplication_and_release(tmp_path):
+    store = ContentStore(tmp_path)
+    first = _ingest(store, b">a\nACGT\n", "a.fasta")
+    second = _ingest(store, b">a\nACGT\n", "b.fasta")
+    assert not first["deduplicated"] and second["deduplicated"]
+    assert store.lookup(first["sha256"])["references"] == 2
+    assert (store.names_dir / "a.fasta").read_text() == first["sha256"]
+    assert not store.release("a.fasta")
+    assert store.release("b.fasta")
+    assert not store.lookup(first["sha256"])["exists"]
+    assert list(store.names_dir.iterdir()) == []
+
+
+def test_release_without_recorded_hash(tmp_path):
+    """Nom créé avant .store/names : contenu retrouvé par son inode"""
+    store = ContentStore(tmp_path)
+    stored = _ingest(store, b">a\nACGT\n", "a.fasta")
+    _ingest(store, b">b\nTTTT\n", "b.fasta")
+    (store.names_dir / "a.fasta").unlink()
+    assert store.release("a.fasta")
+    assert not store.lookup(stored["sha256"])["exists"]
+    assert store.lookup(hashlib.sha256(b">b\nTTTT\n").hexdigest())["exists"]
+
+
+def test_garbage_collection_never_sees_unnamed_content(tmp_path):
+    """Le ramasse-miettes tourne en continu pendant les ingest/release"""
+    store = ContentStore(tmp_path)
+    stop = threading.Event()
+
+    def collect():
+        while not stop.is_set():
+            store.collect_garbage(0)
+
+    collector = threading.Thread(target=collect)
+    collector.start()
+    try:
+        for i in range(200):
+            data = os.urandom(64)
+            stored = _ingest(store, data, f"r{i}.fasta")
+            assert (tmp_path / stored["filename"]).exists()
+            store.release(stored["filename"])
+            # Contenu dédupliqué dont le dernier nom vient d'être libéré
+            _ingest(store, data, f"s{i}.fasta")
+            assert (tmp_path / f"s{i}.fasta").read_bytes() == data
+    finally:
+        stop.set()
+        collector.join()
+
+
+def test_declared_hash_dedup_is_opt_in(tmp_path, monkeypatch):
+    store = ContentStore(tmp_path)
+    data = b">a\nACGT\n"
+    _ingest(store, data, "a.fasta")
+    resumable = ResumableUploadStore(store)
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    # Par défaut le hash annoncé ne dispense pas d'envoyer le contenu
+    assert not uploads.RESUMABLE_UPLOAD_DEDUP
+    upload = resumable.create("b.fasta", len(data), sha256=sha256)
+    assert not upload["completed"] and upload["offset"] == 0
+
+    monkeypatch.setattr(uploads, "RESUMABLE_UPLOAD_DEDUP", True)
+    upload = resumable.create("c.fasta", len(data), sha256=sha256)
+    assert upload["completed"] and upload["deduplicated"]
@@ -0,0 +1,592 @@
+"""
+Réception des fichiers uploadés (FASTA/FASTQ) en streaming
+
+Le corps de la requête est écrit sur disque par blocs de UPLOAD_CHUNK_SIZE
+au fur et à mesure de sa réception, le SHA-256 et la taille étant calculés
+dans la même passe : la mémoire utilisée par upload est constante, quelle
+que soit la taille du fichier. Le fichier est écrit sous un nom temporaire
+(.part) puis renommé atomiquement : un fichier visible dans le répertoire
+d'uploads est toujours complet.
+
+ResumableUploadStore ajoute un protocole reprenable (type tus) pour les
+liaisons instables : création, envoi de blocs à un offset (PATCH), lecture
+de l'offset courant (HEAD) ; un transfert interrompu reprend là où il s'est
+arrêté. Les uploads partiels abandonnés sont supprimés après
+RESUMABLE_UPLOAD_TTL secondes.
+
+ContentStore range chaque fichier reçu par son SHA-256 (.store/) ; les noms
+visibles dans le répertoire d'uploads sont des liens physiques vers ce
+contenu. Un fichier déjà connu n'occupe pas de place supplémentaire, un
+nom déjà pris par un autre contenu n'est jamais écrasé, et le nombre de
+liens de l'inode sert de compteur de références. Le ramasse-miettes
+supprime les contenus dont le seul lien restant est celui du store : il
+s'exécute sous le même verrou que le rangement et la création de noms,
+pour ne jamais voir un contenu entre sa publication et son premier nom.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+ALLOWED_EXTENSIONS = {'.fasta', '.fa', '.fna', '.fastq', '.fq', '.fasta.gz', '.fastq.gz', '.fa.gz', '.fq.gz'}
+
+# Taille des blocs écrits sur disque (et hachés)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Taille maximale d'un upload (octets, défaut: 20 Go)
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", str(20 * 1024 ** 3)))
+
+# Délai après lequel un upload reprenable inactif est supprimé (secondes, défaut: 24 h)
+RESUMABLE_UPLOAD_TTL = int(os.environ.get("RESUMABLE_UPLOAD_TTL", str(24 * 3600)))
+
+# Déduplication sur le SHA-256 annoncé à la création d'un upload reprenable
+# (désactivée par défaut : le hash annoncé n'est pas vérifié)
+RESUMABLE_UPLOAD_DEDUP = os.environ.get("RESUMABLE_UPLOAD_DEDUP", "false").lower() in ("1", "true", "yes")
+
+
+class UploadError(Exception):
+    """Upload refusé ; status_code est le code HTTP à renvoyer"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def safe_upload_filename(filename: str) -> str:
+    """
+    Valide l'extension et nettoie le nom d'un fichier uploadé
+
+    Raises:
+        UploadError: Nom manquant ou extension non supportée
+    """
+    if not filename:
+        raise UploadError("Nom de fichier manquant")
+    lowered = filename.lower()
+    if not any(lowered.endswith(ext) for ext in ALLOWED_EXTENSIONS):
+        raise UploadError(
+            "Format non supporté. Extensions acceptées : .fasta, .fa, .fna, .fastq, .fq (et .gz)"
+        )
+    # Nettoyer le nom de fichier (sécurité)
+    return re.sub(r'[^a-zA-Z0-9._-]', '_', os.path.basename(filename))
+
+
+def _write_block(f, hasher, block: bytes, validator=None):
+    f.write(block)
+    hasher.update(block)
+    if validator is not None:
+        validator.update(block)
+
+
+def _too_large(max_size: int) -> UploadError:
+    return UploadError(f"Fichier trop volumineux (maximum {max_size // (1024 ** 2)} Mo)", status_code=413)
+
+
+async def _copy_stream(
+    chunks: AsyncIterator[bytes], f, hasher, max_bytes: int, error: UploadError, validator=None
+) -> int:
+    """
+    Écrit et hache un flux par blocs de UPLOAD_CHUNK_SIZE
+
+    Les octets reçus sont toujours écrits, même si le flux s'interrompt
+    (utile à la reprise) ; `error` est levée si le flux dépasse max_bytes.
+    `validator` (input_validation.SequenceValidator) reçoit les mêmes blocs.
+
+    Returns:
+        Nombre d'octets écrits
+    """
+    written = 0
+    buffer = bytearray()
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if written + len(buffer) + len(chunk) > max_bytes:
+                raise error
+            buffer += chunk
+            if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                # Écriture et hachage hors de la boucle d'événements
+                await asyncio.to_thread(_write_block, f, hasher, bytes(buffer), validator)
+                written += len(buffer)
+                buffer.clear()
+    finally:
+        if buffer:
+            await asyncio.to_thread(_write_block, f, hasher, bytes(buffer), validator)
+            written += len(buffer)
+    return written
+
+
+def _fsync_close(f):
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+
+def _split_extension(filename: str) -> Tuple[str, str]:
+    """Sépare le nom et l'extension acceptée (y compris .gz) : reads.fastq.gz → (reads, .fastq.gz)"""
+    lowered = filename.lower()
+    for ext in sorted(ALLOWED_EXTENSIONS, key=len, reverse=True):
+        if lowered.endswith(ext):
+            return filename[:-len(ext)], filename[-len(ext):]
+    stem, ext = os.path.splitext(filename)
+    return stem, ext
+
+
+class ContentStore:
+    """
+    Stockage des uploads adressé par contenu (SHA-256) avec déduplication
+
+    Le contenu est rangé dans .store/ab/abcdef... en lecture seule ; chaque
+    nom du répertoire d'uploads est un lien physique vers ce fichier. Le
+    nombre de liens de l'inode moins un est le nombre de noms qui le
+    référencent : quand le dernier nom est supprimé, le contenu l'est aussi.
+    Le hash de chaque nom est noté dans .store/names/{nom} : la suppression
+    d'un nom retrouve son contenu sans parcourir le store.
+    """
+
+    def __init__(self, upload_dir: Path):
+        self.upload_dir = upload_dir
+        self.store_dir = upload_dir / ".store"
+        self.tmp_dir = self.store_dir / "tmp"
+        self.names_dir = self.store_dir / "names"
+        # Sérialise ingest/link/release (threads) avec collect_garbage
+        self._lock = threading.Lock()
+
+    def blob_path(self, sha256: str) -> Path:
+        if not re.fullmatch(r'[0-9a-f]{64}', sha256 or ''):
+            raise UploadError("SHA-256 invalide")
+        return self.store_dir / sha256[:2] / sha256
+
+    def lookup(self, sha256: str) -> Dict[str, Any]:
+        """Présence, taille et nombre de références d'un contenu"""
+        try:
+            stat_result = self.blob_path(sha256).stat()
+        except FileNotFoundError:
+            return {"sha256": sha256, "exists": False, "size": None, "references": 0}
+        return {
+            "sha256": sha256,
+            "exists": True,
+            "size": stat_result.st_size,
+            "references": stat_result.st_nlink - 1,
+        }
+
+    def temp_path(self, name: str) -> Path:
+        """Chemin temporaire sur le même système de fichiers que le store (renommage atomique)"""
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        return self.tmp_dir / f"{name}.{uuid.uuid4().hex[:8]}.part"
+
+    def ingest(self, tmp_path: Path, sha256: str, filename: str) -> Dict[str, Any]:
+        """
+        Range un fichier complet dans le store et lui donne un nom visible
+
+        Si le contenu est déjà connu, le fichier temporaire est supprimé et
+        seul un nouveau lien est créé.
+
+        Returns:
+            Dict avec filename, path, size, sha256 et deduplicated
+        """
+        blob = self.blob_path(sha256)
+        with self._lock:
+            deduplicated = blob.exists()
+            if deduplicated:
+                tmp_path.unlink(missing_ok=True)
+            else:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                os.chmod(tmp_path, 0o444)  # Partagé par plusieurs noms : jamais modifié en place
+                os.replace(tmp_path, blob)
+            return {**self._link(blob, sha256, filename), "deduplicated": deduplicated}
+
+    def link(self, sha256: str, filename: str) -> Dict[str, Any]:
+        """
+        Crée (ou retrouve) un nom visible pour un contenu du store
+
+        Un nom existant qui désigne un autre contenu n'est jamais écrasé :
+        le nom reçoit alors un suffixe dérivé du hash (reads.3fa9c2d1.fastq.gz).
+
+        Raises:
+            UploadError: Contenu inconnu (404)
+        """
+        blob = self.blob_path(sha256)
+        with self._lock:
+            return self._link(blob, sha256, filename)
+
+    def _link(self, blob: Path, sha256: str, filename: str) -> Dict[str, Any]:
+        if not blob.exists():
+            raise UploadError("Contenu inconnu", status_code=404)
+
+        stem, ext = _split_extension(filename)
+        candidates = [filename, f"{stem}.{sha256[:8]}{ext}"]
+        candidates += [f"{stem}.{sha256[:8]}_{i}{ext}" for i in range(2, 100)]
+        for name in candidates:
+            dest = self.upload_dir / name
+            try:
+                os.link(blob, dest)
+            except FileExistsError:
+                if os.path.samefile(dest, blob):
+                    break  # Même nom, même contenu : rien à faire
+                continue
+            break
+        else:
+            raise UploadError("Aucun nom disponible pour ce fichier", status_code=409)
+        self.names_dir.mkdir(parents=True, exist_ok=True)
+        (self.names_dir / name).write_text(sha256)
+
+        return {
+            "filename": name,
+            "path": str(dest),
+            "size": blob.stat().st_size,
+            "sha256": sha256,
+        }
+
+    def release(self, filename: str) -> bool:
+        """
+        Supprime un nom visible ; le contenu est supprimé s'il n'est plus référencé
+
+        Returns:
+            True si le contenu lui-même a été supprimé
+        """
+        name = os.path.basename(filename)
+        path = self.upload_dir / name
+        if name.startswith('.') or not path.is_file():
+            raise UploadError("Fichier inconnu", status_code=404)
+        with self._lock:
+            stat_result = path.stat()
+            path.unlink()
+            record = self.names_dir / name
+            try:
+                sha256 = record.read_text().strip()
+                record.unlink()
+            except FileNotFoundError:
+                sha256 = None
+            if stat_result.st_nlink != 2:
+                return False
+            # Il ne reste que l'entrée du store : celle du hash noté, sinon
+            # (nom antérieur à .store/names) la retrouver par son inode
+            if sha256 and re.fullmatch(r'[0-9a-f]{64}', sha256):
+                candidates = [self.blob_path(sha256)]
+            else:
+                candidates = self.store_dir.glob("??/*")
+            for blob in candidates:
+                try:
+                    blob_stat = blob.stat()
+                except FileNotFoundError:
+                    continue
+                if (blob_stat.st_ino, blob_stat.st_dev) == (stat_result.st_ino, stat_result.st_dev):
+                    blob.unlink()
+                    return True
+            return False
+
+    def collect_garbage(self, cutoff: float) -> int:
+        """Supprime les contenus plus référencés par aucun nom et les temporaires anciens"""
+        removed = 0
+        with self._lock:
+            for blob in self.store_dir.glob("??/*"):
+                try:
+                    if blob.stat().st_nlink == 1:
+                        blob.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+            # Hash notés de noms supprimés hors de release()
+            if self.names_dir.exists():
+                for record in self.names_dir.iterdir():
+                    if not (self.upload_dir / record.name).exists():
+                        record.unlink(missing_ok=True)
+        if self.tmp_dir.exists():
+            for part_path in self.tmp_dir.glob("*.part"):
+                try:
+                    if part_path.stat().st_mtime < cutoff:
+                        part_path.unlink(missing_ok=True)
+                        removed += 1
+                except FileNotFoundError:
+                    continue  # Rangé dans le store entre-temps
+        return removed
+
+
+async def save_stream(
+    chunks: AsyncIterator[bytes],
+    store: ContentStore,
+    filename: str,
+    max_size: int = MAX_UPLOAD_SIZE,
+    validator=None
+) -> Dict[str, Any]:
+    """
+    Écrit un flux d'octets dans le store (temporaire .part puis renommage atomique)
+
+    Args:
+        chunks: Blocs reçus (request.stream() ou lecture d'un UploadFile)
+        store: Store adressé par contenu
+        filename: Nom visible souhaité (déjà nettoyé)
+        max_size: Taille maximale acceptée
+        validator: SequenceValidator alimenté pendant l'écriture (optionnel)
+
+    Returns:
+        Dict avec filename, path, size, sha256 et deduplicated
+
+    Raises:
+        UploadError: Fichier vide (400) ou trop volumineux (413)
+    """
+    tmp_path = store.temp_path(filename)
+    hasher = hashlib.sha256()
+    f = open(tmp_path, 'wb')
+    try:
+        size = await _copy_stream(chunks, f, hasher, max_size, _too_large(max_size), validator)
+        if size == 0:
+            raise UploadError("Fichier vide")
+        await asyncio.to_thread(_fsync_close, f)
+        return await asyncio.to_thread(store.ingest, tmp_path, hasher.hexdigest(), filename)
+    except BaseException:
+        # Erreur, fichier refusé ou client déconnecté : pas de fichier partiel visible
+        f.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+async def iter_upload_file(upload_file) -> AsyncIterator[bytes]:
+    """Lit un UploadFile (multipart) par blocs de UPLOAD_CHUNK_SIZE"""
+    while True:
+        chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _hash_file(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(UPLOAD_CHUNK_SIZE)
+            if not block:
+                break
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class ResumableUploadStore:
+    """
+    Uploads reprenables (sous-ensemble du protocole tus 1.0 : core, creation, termination)
+
+    Chaque upload est un fichier {id}.part et son état {id}.json dans
+    state_dir ; l'offset courant est la taille du .part (source de vérité,
+    y compris après un redémarrage). Une fois complet, le fichier est rangé
+    dans le ContentStore (renommage atomique ou déduplication).
+    """
+
+    def __init__(self, store: ContentStore, ttl_seconds: int = RESUMABLE_UPLOAD_TTL):
+        self.store = store
+        self.upload_dir = store.upload_dir
+        self.state_dir = store.upload_dir / ".resumable"
+        self.ttl_seconds = ttl_seconds
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # id → (offset, sha256 en cours) : évite de relire le fichier à la fin
+        self._hashers: Dict[str, Tuple[int, Any]] = {}
+
+    def _paths(self, upload_id: str) -> Tuple[Path, Path]:
+        if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+            raise UploadError("Upload inconnu", status_code=404)
+        return self.state_dir / f"{upload_id}.json", self.state_dir / f"{upload_id}.part"
+
+    def _save_info(self, info: Dict[str, Any]):
+        info_path, _ = self._paths(info['id'])
+        tmp_path = info_path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(info))
+        os.replace(tmp_path, info_path)
+
+    def create(
+        self,
+        filename: str,
+        length: int,
+        sha256: Optional[str] = None,
+        max_size: int = MAX_UPLOAD_SIZE
+    ) -> Dict[str, Any]:
+        """
+        Déclare un nouvel upload de `length` octets
+
+        Avec RESUMABLE_UPLOAD_DEDUP=true, si le SHA-256 annoncé correspond à
+        un contenu déjà stocké de même taille, l'upload est terminé
+        immédiatement (aucun octet à envoyer). Ce raccourci fait confiance au
+        client : connaître le hash et la taille d'un contenu suffit pour lui
+        donner un nom.
+
+        Raises:
+            UploadError: Nom/extension invalide (400), taille nulle (400) ou trop grande (413)
+        """
+        safe_filename = safe_upload_filename(filename)
+        if length <= 0:
+            raise UploadError("Fichier vide")
+        if length > max_size:
+            raise _too_large(max_size)
+
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        info = {
+            "id": uuid.uuid4().hex,
+            "filename": safe_filename,
+            "length": length,
+            "created_at": now,
+            "updated_at": now,
+            "completed": False,
+            "path": None,
+            "sha256": None,
+            "deduplicated": False,
+        }
+
+        known = self.store.lookup(sha256) if sha256 and RESUMABLE_UPLOAD_DEDUP else None
+        if known and known['exists'] and known['size'] == length:
+            try:
+                linked = self.store.link(sha256, safe_filename)
+            except UploadError as e:
+                if e.status_code != 404:
+                    raise
+                linked = None  # Supprimé entre-temps par le ramasse-miettes : upload normal
+            if linked:
+                info.update(completed=True, deduplicated=True, **linked)
+                info.pop('size')
+                self._save_info(info)
+                logger.info(f"Upload dédupliqué (contenu déjà présent) : {linked['path']}")
+                return {**info, "offset": length}
+
+        _, part_path = self._paths(info['id'])
+        part_path.touch()
+        self._save_info(info)
+        return {**info, "offset": 0}
+
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        """
+        État d'un upload avec son offset courant
+
+        Raises:
+            UploadError: Upload inconnu ou expiré (404)
+        """
+        info_path, part_path = self._paths(upload_id)
+        try:
+            info = json.loads(info_path.read_text())
+        except (OSError, ValueError):
+            raise UploadError("Upload inconnu ou expiré", status_code=404)
+        if info['completed']:
+            offset = info['length']
+        else:
+            try:
+                offset = part_path.stat().st_size
+            except OSError:
+                raise UploadError("Upload inconnu ou expiré", status_code=404)
+        return {**info, "offset": offset}
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """
+        Ajoute un bloc à l'offset courant ; termine l'upload quand il est complet
+
+        Les octets reçus avant une coupure sont conservés : le client relit
+        l'offset (HEAD) et reprend à partir de là.
+
+        Raises:
+            UploadError: Offset incorrect ou transfert concurrent (409),
+                dépassement de la taille déclarée (413), upload inconnu (404)
+        """
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        if lock.locked():
+            raise UploadError("Un transfert est déjà en cours pour cet upload", status_code=409)
+
+        async with lock:
+            info = self.get(upload_id)
+            if info['completed']:
+                raise UploadError("Upload déjà terminé", status_code=409)
+            if offset != info['offset']:
+                raise UploadError(
+                    f"Offset incorrect ({offset}), offset courant: {info['offset']}", status_code=409
+                )
+
+            _, part_path = self._paths(upload_id)
+            hashed_offset, hasher = self._hashers.get(upload_id, (0, hashlib.sha256()))
+            if hashed_offset != offset:
+                hasher = None  # Haché incomplet (redémarrage...) : relu à la fin
+            tracked = hasher or hashlib.sha256()
+
+            f = open(part_path, 'ab')
+            written = 0
+            try:
+                written = await _copy_stream(
+                    chunks, f, tracked, info['length'] - offset,
+                    UploadError("Données au-delà de la taille déclarée (Upload-Length)", status_code=413)
+                )
+            finally:
+                f.close()
+                new_offset = offset + written
+                if hasher is not None:
+                    self._hashers[upload_id] = (new_offset, tracked)
+                info['updated_at'] = time.time()
+                self._save_info({k: v for k, v in info.items() if k != 'offset'})
+
+            if new_offset == info['length']:
+                info = await asyncio.to_thread(self._complete, info, hasher)
+            return {**info, "offset": new_offset}
+
+    def _complete(self, info: Dict[str, Any], hasher) -> Dict[str, Any]:
+        _, part_path = self._paths(info['id'])
+        with open(part_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        sha256 = hasher.hexdigest() if hasher is not None else _hash_file(part_path)
+        stored = self.store.ingest(part_path, sha256, info['filename'])
+        self._hashers.pop(info['id'], None)
+
+        info = {k: v for k, v in info.items() if k != 'offset'}
+        info.update(
+            completed=True, filename=stored['filename'], path=stored['path'], sha256=sha256,
+            deduplicated=stored['deduplicated'], updated_at=time.time()
+        )
+        self._save_info(info)
+        logger.info(f"Upload reprenable terminé : {stored['path']} ({info['length']} bytes, sha256 {sha256[:12]})")
+        return info
+
+    def delete(self, upload_id: str):
+        """Abandonne un upload (le fichier final d'un upload terminé est conservé)"""
+        info_path, part_path = self._paths(upload_id)
+        if not info_path.exists():
+            raise UploadError("Upload inconnu ou expiré", status_code=404)
+        part_path.unlink(missing_ok=True)
+        info_path.unlink(missing_ok=True)
+        self._hashers.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+
+    def collect_garbage(self) -> int:
+        """
+        Supprime les uploads inactifs depuis plus de ttl_seconds
+
+        Concerne les uploads reprenables partiels (et l'état des uploads
+        terminés), les .part orphelins d'uploads directs interrompus et les
+        contenus du store qui ne sont plus référencés par aucun nom.
+
+        Returns:
+            Nombre d'uploads supprimés
+        """
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        if self.state_dir.exists():
+            for info_path in self.state_dir.glob("*.json"):
+                upload_id = info_path.stem
+                if upload_id in self._locks and self._locks[upload_id].locked():
+                    continue
+                try:
+                    updated_at = json.loads(info_path.read_text()).get('updated_at', 0)
+                except (OSError, ValueError):
+                    updated_at = 0
+                if updated_at < cutoff:
+                    self.delete(upload_id)
+                    removed += 1
+            for part_path in self.state_dir.glob("*.part"):
+                if not part_path.with_suffix('.json').exists() and part_path.stat().st_mtime < cutoff:
+                    part_path.unlink(missing_ok=True)
+        for part_path in self.upload_dir.glob(".*.part"):
+            if part_path.stat().st_mtime < cutoff:
+                part_path.unlink(missing_ok=True)
+                removed += 1
+        return removed + self.store.collect_garbage(cutoff)
@@ -111,6 +111,7 @@ show_help() {
     echo "  -t, --threads N      Nombre de threads (défaut: 8)"
     echo "  -w, --workdir PATH   Répertoire de travail"
     echo "  -f, --force, -y      Mode non-interactif (accepte automatiquement)"
+    echo "  --run-number N       Numéro de run imposé (attribué par l'API, évite le scan de outputs/)"
     echo ""
     echo "OPTIONS PROKKA (annotation):"
     echo "  --prokka-mode MODE   Mode d'annotation Prokka:"
@@ -144,6 +145,8 @@ PROKKA_MODE="${PROKKA_MODE:-auto}"
 # Variables pour Prokka (peuvent être définies par l'utilisateur)
 PROKKA_GENUS=""
 PROKKA_SPECIES=""
+# Numéro de run imposé (--run-number), sinon calculé par get_next_run_number
+RUN_NUMBER_ARG=""
 
 while [[ $# -gt 0 ]]; do
     case $1 in
@@ -179,6 +182,14 @@ while [[ $# -gt 0 ]]; do
             PROKKA_SPECIES="$2"
             shift 2
             ;;
+        --run-number)
+            RUN_NUMBER_ARG="$2"
+            if [[ ! "$RUN_NUMBER_ARG" =~ ^[1-9][0-9]*$ ]]; then
+                echo "❌ Numéro de run invalide: $RUN_NUMBER_ARG (entier >= 1 attendu)"
+                exit 1
+            fi
+            shift 2
+            ;;
         -*)
             echo "Option inconnue: $1"
             show_help
@@ -389,8 +400,12 @@ get_next_run_number() {
     echo "$((max_run + 1))"
 }
 
-# Déterminer le numéro d'essai
-RUN_NUMBER=$(get_next_run_number "$SAMPLE_ID")
+# Déterminer le numéro d'essai (réservé par l'API si --run-number est fourni)
+if [[ -n "$RUN_NUMBER_ARG" ]]; then
+    RUN_NUMBER="$RUN_NUMBER_ARG"
+else
+    RUN_NUMBER=$(get_next_run_number "$SAMPLE_ID")
+fi
 RESULTS_VERSION="${RESULTS_VERSION:-${RUN_NUMBER}}"
 
 # Timestamp pour les logs (conservé pour traçabilité interne)
@@ -975,13 +990,14 @@ setup_kma_database() {
         return 1
     fi
 
-    # Vérifier si la base existe déjà
-    if [[ -f "$kma_db_dir/resfinder.name" ]]; then
+    # Base gérée par l'interface web (version liée, éventuellement utilisée
+    # par d'autres analyses) : jamais modifiée sur place
+    if [[ -L "$kma_db_dir" ]] && [[ -f "$kma_db_dir/resfinder.name" ]]; then
         log_info "Base KMA existante trouvée: $kma_db_dir/resfinder"
         return 0
     fi
 
-    log_info "Création de la base de données KMA..."
+    log_info "Création / mise à jour de la base de données KMA..."
     mkdir -p "$kma_db_dir"
 
     # Récupérer le chemin des bases abricate (abricate est dans abricate_env)
@@ -1016,24 +1032,43 @@ setup_kma_database() {
 
     log_info "  Bases abricate trouvées: $abricate_db"
 
-    # Créer les index KMA pour chaque base
+    # Créer les index KMA pour chaque base, en parallèle ; un index dont les
+    # séquences source n'ont pas changé (empreinte sha256) est conservé
+    local pids=() names=()
     for db_name in resfinder card ncbi; do
         local seq_file="$abricate_db/$db_name/sequences"
+        local stamp_file="$kma_db_dir/${db_name}.sources.sha256"
 
         if [[ -f "$seq_file" ]]; then
-            log_info "  Indexation KMA: $db_name..."
-            kma index -i "$seq_file" -o "$kma_db_dir/$db_name" 2>> "$LOG_FILE"
-
-            if [[ -f "$kma_db_dir/${db_name}.name" ]]; then
-                log_success "  Base KMA créée: $db_name"
-            else
-                log_warn "  Échec création base KMA: $db_name"
+            local seq_hash=$(sha256sum "$seq_file" | cut -d' ' -f1)
+            if [[ -f "$kma_db_dir/${db_name}.name" ]] && [[ "$(cat "$stamp_file" 2>/dev/null)" == "$seq_hash" ]]; then
+                log_info "  Index KMA à jour: $db_name"
+                continue
             fi
+
+            log_info "  Indexation KMA: $db_name..."
+            (
+                rm -f "$stamp_file"
+                kma index -i "$seq_file" -o "$kma_db_dir/$db_name" 2>> "$LOG_FILE" \
+                    && [[ -f "$kma_db_dir/${db_name}.name" ]] \
+                    && echo "$seq_hash" > "$stamp_file"
+            ) &
+            pids+=($!)
+            names+=("$db_name")
         else
             log_warn "  Séquences non trouvées: $db_name"
         fi
     done
 
+    local i
+    for i in "${!pids[@]}"; do
+        if wait "${pids[$i]}"; then
+            log_success "  Base KMA créée: ${names[$i]}"
+        else
+            log_warn "  Échec création base KMA: ${names[$i]}"
+        fi
+    done
+
     return 0
 }
 
@@ -1733,6 +1768,12 @@ setup_abricate_dbs() {
                 conda deactivate 2>/dev/null || true
             fi
 
+            # Rafraîchir les index KMA construits depuis ces bases (seuls ceux
+            # dont les séquences ont changé sont recalculés)
+            if [[ -d "$DB_DIR/kma_db" ]] && command -v kma > /dev/null 2>&1; then
+                setup_kma_database || true
+            fi
+
             return 0
         else
             echo "⚠️  Les bases semblent installées mais ne sont pas listées"
@@ -0,0 +1,152 @@
+"""
+Classification de priorité des gènes ARG - standards OMS CIA 2024 / CDC
+SOURCE UNIQUE DE VÉRITÉ partagée par le backend (output_parser.py)
+et le rapport HTML (generate_arg_report.py)
+
+Les listes de mots-clés sont compilées une seule fois en expressions
+régulières (alternation) et le score est mémoïsé : reclasser des dizaines
+de milliers de gènes ne refait les recherches que pour les combinaisons inédites.
+"""
+
+import re
+from functools import lru_cache
+
+# === Classes d'antibiotiques par priorité OMS/CDC ===
+
+# Dernier recours / Menace urgente CDC (score +4)
+CRITICAL_CLASSES = [
+    'carbapenem', 'polymyxin', 'colistin', 'glycopeptide', 'vancomycin',
+    'oxazolidinone', 'linezolid', 'lipopeptide', 'daptomycin', 'tigecycline'
+]
+# CIA Priorité 1 / Menace sérieuse CDC (score +3)
+HIGH_CLASSES = [
+    'cephalosporin', 'fluoroquinolone', 'quinolone', 'macrolide',
+    'aminoglycoside', 'beta-lactam', 'penicillin'
+]
+# CIA Priorité 2 / Menace préoccupante (score +2)
+MEDIUM_CLASSES = [
+    'tetracycline', 'phenicol', 'chloramphenicol', 'sulfonamide', 'sulphonamide',
+    'trimethoprim', 'rifamycin', 'rifampicin', 'fosfomycin', 'nitroimidazole',
+    'nitrofuran', 'fusidic', 'mupirocin', 'streptogramin'
+]
+
+# === Gènes critiques spécifiques (bonus +2) ===
+CRITICAL_GENES_KW = [
+    # Carbapénémases
+    'ndm', 'kpc', 'vim', 'imp', 'oxa-48', 'oxa-23', 'oxa-24', 'oxa-58', 'oxa-181',
+    # Colistine/Polymyxines
+    'mcr-1', 'mcr-2', 'mcr-3', 'mcr-4', 'mcr-5', 'mcr-6', 'mcr-7', 'mcr-8', 'mcr-9', 'mcr-10', 'mcr',
+    # Glycopeptides (Vancomycine)
+    'vana', 'vanb', 'vanc', 'vand', 'vane', 'vancomycin',
+    # MRSA
+    'meca', 'mecc', 'methicillin', 'mrsa',
+    # Linézolide
+    'optra', 'cfr', 'poxta',
+    # Daptomycine
+    'daptomycin'
+]
+
+# === Gènes à haute priorité (bonus +1) ===
+HIGH_GENES_KW = [
+    # ESBL
+    'ctx-m', 'ctxm', 'tem', 'shv', 'esbl', 'cmy', 'dha', 'acc',
+    # Fluoroquinolones
+    'qnra', 'qnrb', 'qnrs', 'qnrd', 'qnr', 'gyra', 'parc', "aac(6')-ib-cr",
+    # Macrolides
+    'erma', 'ermb', 'ermc', 'erm(', 'mefa', 'mef(', 'mph(',
+    # Aminosides
+    'aac(', 'aph(', 'ant(', 'arma', 'rmta', 'rmtb', 'rmtc', 'npma'
+]
+
+# Couleurs d'affichage par niveau (rapport HTML)
+PRIORITY_COLORS = {
+    'CRITICAL': 'FF4444',  # Rouge
+    'HIGH': 'FF9933',      # Orange
+    'MEDIUM': '4499FF',    # Bleu
+}
+
+# Seuil de détection "très confiante" (coverage ET identity)
+HIGH_QUALITY_THRESHOLD = 95
+
+
+def _compile_keywords(keywords):
+    """Compile une liste de sous-chaînes en une seule alternation regex"""
+    return re.compile('|'.join(re.escape(kw) for kw in keywords))
+
+
+_CRITICAL_CLASSES_RE = _compile_keywords(CRITICAL_CLASSES)
+_HIGH_CLASSES_RE = _compile_keywords(HIGH_CLASSES)
+_MEDIUM_CLASSES_RE = _compile_keywords(MEDIUM_CLASSES)
+_CRITICAL_GENES_RE = _compile_keywords(CRITICAL_GENES_KW)
+_HIGH_GENES_RE = _compile_keywords(HIGH_GENES_KW)
+
+
+@lru_cache(maxsize=65536)
+def _priority_score(gene, product, resistance, subclass, class_name, high_quality):
+    """
+    Score de gravité mémoïsé (clé: champs texte bruts + seau qualité)
+
+    Méthodologie:
+    - Score basé sur la classe d'antibiotique (OMS/CDC)
+    - Bonus pour gènes critiques spécifiques
+    - Bonus pour qualité de détection (coverage/identity)
+    """
+    gene_name = gene.lower()
+    product = product.lower()
+    combined = f"{class_name} {resistance} {subclass} {gene_name} {product}".lower()
+
+    # 1. Score basé sur la classe d'antibiotique
+    if _CRITICAL_CLASSES_RE.search(combined):
+        score = 4
+    elif _HIGH_CLASSES_RE.search(combined):
+        score = 3
+    elif _MEDIUM_CLASSES_RE.search(combined):
+        score = 2
+    else:
+        score = 1  # Classe inconnue
+
+    # 2. Bonus gènes critiques (+2)
+    if _CRITICAL_GENES_RE.search(gene_name) or _CRITICAL_GENES_RE.search(product):
+        score += 2
+
+    # 3. Bonus gènes haute priorité (+1, seulement si pas encore CRITICAL)
+    if score < 5 and (_HIGH_GENES_RE.search(gene_name) or _HIGH_GENES_RE.search(product)):
+        score += 1
+
+    # 4. Bonus qualité de détection
+    if high_quality:
+        score += 1
+
+    return score
+
+
+def classify_priority(gene_data, use_class=False):
+    """
+    Classifie la priorité d'un gène ARG selon les standards OMS/CDC.
+
+    Args:
+        gene_data: dict avec les clés gene, product, resistance, subclass,
+            class (optionnelle), coverage, identity
+        use_class: inclure le champ class dans la recherche de classe
+            d'antibiotique (rapport HTML) ; le backend ne l'utilise pas
+
+    Returns:
+        'CRITICAL', 'HIGH' ou 'MEDIUM'
+    """
+    coverage = float(gene_data.get('coverage') or 0)
+    identity = float(gene_data.get('identity') or 0)
+
+    score = _priority_score(
+        gene_data.get('gene') or '',
+        gene_data.get('product') or '',
+        gene_data.get('resistance') or '',
+        gene_data.get('subclass') or '',
+        (gene_data.get('class') or '') if use_class else '',
+        coverage >= HIGH_QUALITY_THRESHOLD and identity >= HIGH_QUALITY_THRESHOLD,
+    )
+
+    if score >= 5:
+        return 'CRITICAL'
+    if score >= 3:
+        return 'HIGH'
+    return 'MEDIUM'
@@ -10,6 +10,8 @@ import json
 from datetime import datetime
 from collections import defaultdict
 
+from arg_priority import classify_priority, PRIORITY_COLORS
+
 def classify_resistance_type(gene_data):
     """Classifie le type de résistance: Acquis (mobile) vs Mutation (chromosomique)
 
@@ -59,124 +61,17 @@ def classify_gravity(gene_data):
     Classifie la gravité d'un gène ARG (CRITICAL, HIGH, MEDIUM)
     Basé sur les standards OMS CIA 2024 et CDC Antibiotic Resistance Threats
 
-    Méthodologie:
+    Méthodologie (voir arg_priority.py, partagé avec le backend):
     - Score basé sur la classe d'antibiotique (OMS/CDC)
     - Bonus pour gènes critiques spécifiques
     - Bonus pour qualité de détection (coverage/identity)
+
+    Returns:
+        tuple: (gravity, color)
     """
+    gravity = classify_priority(gene_data, use_class=True)
+    return gravity, PRIORITY_COLORS[gravity]
 
-    # Utiliser TOUS les champs disponibles pour une détection maximale
-    class_name = (gene_data.get('class', '') or '').lower()
-    resistance = (gene_data.get('resistance', '') or '').lower()
-    subclass = (gene_data.get('subclass', '') or '').lower()
-    gene_name = (gene_data.get('gene', '') or '').lower()
-    product = (gene_data.get('product', '') or '').lower()
-    coverage = float(gene_data.get('coverage', 0) or 0)
-    identity = float(gene_data.get('identity', 0) or 0)
-
-    combined = f"{class_name} {resistance} {subclass} {gene_name} {product}"
-
-    # === Classes d'antibiotiques par priorité OMS/CDC ===
-
-    # Dernier recours / Menace urgente CDC (score +4)
-    critical_classes = [
-        'carbapenem', 'polymyxin', 'colistin', 'glycopeptide', 'vancomycin',
-        'oxazolidinone', 'linezolid', 'lipopeptide', 'daptomycin', 'tigecycline'
-    ]
-
-    # CIA Priorité 1 / Menace sérieuse CDC (score +3)
-    high_classes = [
-        'cephalosporin', 'fluoroquinolone', 'quinolone', 'macrolide',
-        'aminoglycoside', 'beta-lactam', 'penicillin'
-    ]
-
-    # CIA Priorité 2 / Menace préoccupante (score +2)
-    medium_classes = [
-        'tetracycline', 'phenicol', 'chloramphenicol', 'sulfonamide', 'sulphonamide',
-        'trimethoprim', 'rifamycin', 'rifampicin', 'fosfomycin', 'nitroimidazole',
-        'nitrofuran', 'fusidic', 'mupirocin', 'streptogramin'
-    ]
-
-    # === Gènes critiques spécifiques (bonus +2) ===
-    critical_genes = [
-        # Carbapénémases
-        'ndm', 'kpc', 'vim', 'imp', 'oxa-48', 'oxa-23', 'oxa-24', 'oxa-58', 'oxa-181',
-        # Colistine/Polymyxines
-        'mcr-1', 'mcr-2', 'mcr-3', 'mcr-4', 'mcr-5', 'mcr-6', 'mcr-7', 'mcr-8', 'mcr-9', 'mcr-10', 'mcr',
-        # Glycopeptides (Vancomycine)
-        'vana', 'vanb', 'vanc', 'vand', 'vane', 'vancomycin',
-        # MRSA
-        'meca', 'mecc', 'methicillin', 'mrsa',
-        # Linézolide
-        'optra', 'cfr', 'poxta',
-        # Daptomycine
-        'daptomycin'
-    ]
-
-    # === Gènes à haute priorité (bonus +1) ===
-    high_genes = [
-        # ESBL
-        'ctx-m', 'ctxm', 'tem', 'shv', 'esbl', 'cmy', 'dha', 'acc',
-        # Fluoroquinolones
-        'qnra', 'qnrb', 'qnrs', 'qnrd', 'qnr', 'gyra', 'parc', 'aac(6\')-ib-cr',
-        # Macrolides
-        'erma', 'ermb', 'ermc', 'erm(', 'mefa', 'mef(', 'mph(',
-        # Aminosides
-        'aac(', 'aph(', 'ant(', 'arma', 'rmta', 'rmtb', 'rmtc', 'npma'
-    ]
-
-    # === Calcul du score de gravité ===
-    severity_score = 0
-
-    # 1. Score basé sur la classe d'antibiotique
-    class_found = False
-    for keyword in critical_classes:
-        if keyword in combined:
-            severity_score += 4
-            class_found = True
-            break
-
-    if not class_found:
-        for keyword in high_classes:
-            if keyword in combined:
-                severity_score += 3
-                class_found = True
-                break
-
-    if not class_found:
-        for keyword in medium_classes:
-            if keyword in combined:
-                severity_score += 2
-                class_found = True
-                break
-
-    if not class_found:
-        severity_score = 1  # Classe inconnue
-
-    # 2. Bonus pour gènes critiques spécifiques
-    for crit_gene in critical_genes:
-        if crit_gene in gene_name or crit_gene in product:
-            severity_score += 2
-            break
-
-    # 3. Bonus pour gènes à haute priorité spécifiques
-    if severity_score < 5:
-        for high_gene in high_genes:
-            if high_gene in gene_name or high_gene in product:
-                severity_score += 1
-                break
-
-    # 4. Bonus pour qualité de détection
-    if coverage >= 95 and identity >= 95:
-        severity_score += 1  # Détection très confiante
-
-    # === Classification finale ===
-    if severity_score >= 5:
-        return 'CRITICAL', 'FF4444'  # Rouge
-    elif severity_score >= 3:
-        return 'HIGH', 'FF9933'       # Orange
-    else:
-        return 'MEDIUM', '4499FF'     # Bleu
 
 def parse_amrfinder(tsv_file):
     """Parse fichier AMRFinder+ (avec support virulence et stress via --plus)"""